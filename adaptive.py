@@ -0,0 +1,89 @@
+# adaptive.py
+# Kontroler loop-tertutup untuk PROCESS_EVERY_N dan IMGSZ.
+# Masukan: latency capture->keputusan alert (ms), suhu CPU / status throttling,
+# dan kecepatan jalan dari GPS. Keluaran: (imgsz, process_n) berikutnya.
+#
+# Aturan:
+#  - terlalu lambat / terlalu panas  -> turunkan beban (IMGSZ turun dulu,
+#    kalau sudah minimum baru lewati lebih banyak frame)
+#  - longgar dan dingin              -> naikkan kualitas (kurangi skip dulu,
+#    baru IMGSZ naik)
+#  - jalan cepat: skip frame dibatasi supaya keputusan tetap segar;
+#    diam/pelan: boleh skip lebih banyak
+# Perubahan butuh kondisi yang sama beberapa periode berturut-turut (hysteresis).
+
+THERMAL_PATH  = "/sys/class/thermal/thermal_zone0/temp"
+THROTTLE_PATH = "/sys/devices/platform/soc/soc:firmware/get_throttled"
+
+def read_cpu_temp(path=THERMAL_PATH):
+    try:
+        with open(path) as f:
+            return int(f.read().strip()) / 1000.0
+    except Exception:
+        return None
+
+def read_throttled(path=THROTTLE_PATH):
+    """True kalau firmware Pi sedang men-throttle (bit 2) atau kena soft temp limit (bit 3)."""
+    try:
+        with open(path) as f:
+            return bool(int(f.read().strip(), 16) & 0xC)
+    except Exception:
+        return None
+
+class AdaptiveController:
+    def __init__(self, target_ms=150.0, sizes=(320, 384, 416, 480), max_skip=4,
+                 temp_hot=75.0, temp_ok=68.0, fast_kmh=4.0, slow_kmh=1.0, patience=2):
+        self.target_ms = target_ms
+        self.sizes = tuple(sorted(sizes))
+        self.max_skip = max_skip
+        self.temp_hot, self.temp_ok = temp_hot, temp_ok
+        self.fast_kmh, self.slow_kmh = fast_kmh, slow_kmh
+        self.patience = patience
+        self._down = 0
+        self._up = 0
+        self.reason = "init"
+
+    def _skip_cap(self, speed_kmh):
+        if speed_kmh is None:
+            return self.max_skip
+        if speed_kmh >= self.fast_kmh:
+            return min(2, self.max_skip)
+        if speed_kmh <= self.slow_kmh:
+            return self.max_skip
+        return min(3, self.max_skip)
+
+    def step(self, imgsz, process_n, latency_ms, temp_c=None, throttled=None, speed_kmh=None):
+        """Satu langkah kontrol; kembalikan (imgsz, process_n) baru."""
+        sizes = self.sizes
+        # IMGSZ manual yang tidak ada di tangga -> pakai anak tangga terdekat
+        si = min(range(len(sizes)), key=lambda i: abs(sizes[i] - imgsz))
+        cap = self._skip_cap(speed_kmh)
+        n = min(max(1, process_n), cap)
+
+        hot = bool(throttled) or (temp_c is not None and temp_c >= self.temp_hot)
+        cool = not throttled and (temp_c is None or temp_c <= self.temp_ok)
+        slow = latency_ms is not None and latency_ms > self.target_ms * 1.1
+        fast = latency_ms is not None and latency_ms < self.target_ms * 0.7
+
+        if hot or slow:
+            self._down, self._up = self._down + 1, 0
+        elif fast and cool:
+            self._up, self._down = self._up + 1, 0
+        else:
+            self._down = self._up = 0
+
+        if self._down >= self.patience:
+            self._down = 0
+            self.reason = "hot" if hot else "slow"
+            if si > 0:
+                si -= 1
+            elif n < cap:
+                n += 1
+        elif self._up >= self.patience:
+            self._up = 0
+            self.reason = "headroom"
+            if n > 1:
+                n -= 1
+            elif si < len(sizes) - 1:
+                si += 1
+        return sizes[si], n
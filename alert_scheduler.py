@@ -0,0 +1,120 @@
+# alert_scheduler.py
+# Penjadwal alert antara detektor dan AudioEngine.
+#  - prioritas: danger ("depan") > arah ("kiri"/"kanan")
+#  - cooldown per-jenis + jeda global minimum antar alert
+#  - trigger berulang untuk jenis yang masih antre digabung (coalesce)
+#  - tiap alert punya deadline; yang sudah basi dibuang, tidak pernah diputar
+#  - counter emitted / suppressed / coalesced / dropped untuk /metrics; suppressed/coalesced
+#    dihitung sekali per jendela cooldown / per entri antre, bukan per panggilan submit
+#    (detektor memanggil submit tiap sampel ultrasonik & tiap frame selama bahaya masih ada)
+#  - clock bisa diganti (replay offline memakai waktu video, lihat replay.py + pump())
+import time, threading
+
+class AlertScheduler:
+    def __init__(self, audio, priorities=None, cooldown=2.5, cooldowns=None, global_gap=0.8,
+                 max_age=0.6, max_ages=None, clock=time.perf_counter):
+        self.audio = audio
+        self.clock = clock
+        self.priorities = priorities or {"depan": 2}
+        self.cooldown = cooldown
+        self.cooldowns = cooldowns or {}
+        self.global_gap = global_gap
+        self.max_age = max_age
+        self.max_ages = max_ages or {}
+        self.cond = threading.Condition()
+        self.pending = {}          # kind -> (t_trigger, deadline)
+        self.last_emit = {}        # kind -> waktu mulai diputar
+        self._supp_for = {}        # kind -> last_emit yang suppressed-nya sudah dihitung
+        self._coalesced = set()    # kind antre yang coalesced-nya sudah dihitung
+        self.last_any = float("-inf")   # clock replay mulai dari 0: alert pertama jangan ditahan global_gap
+        self.last_kind = None
+        self.counts = {"emitted": 0, "suppressed": 0, "coalesced": 0, "dropped": 0}
+        self.by_kind = {}
+
+    def prio(self, kind):
+        return self.priorities.get(kind, 1)
+
+    def start(self):
+        threading.Thread(target=self._worker, daemon=True).start()
+        return self
+
+    def submit(self, kind:str, t_trigger=None):
+        """Non-blocking; dipanggil dari thread inferensi/sensor."""
+        now = self.clock()
+        t_trigger = now if t_trigger is None else t_trigger
+        with self.cond:
+            last = self.last_emit.get(kind, -1e9)
+            if now - last < self.cooldowns.get(kind, self.cooldown):
+                if self._supp_for.get(kind) != last:
+                    self._supp_for[kind] = last
+                    self._count("suppressed", kind)
+                return False
+            if kind in self.pending:
+                if kind not in self._coalesced:
+                    self._coalesced.add(kind)
+                    self._count("coalesced", kind)
+                return True
+            self.pending[kind] = (t_trigger, t_trigger + self.max_ages.get(kind, self.max_age))
+            self.cond.notify()
+            return True
+
+    def _count(self, what, kind):
+        self.counts[what] += 1
+        k = self.by_kind.setdefault(kind, {"emitted": 0, "suppressed": 0, "coalesced": 0, "dropped": 0})
+        k[what] += 1
+
+    def _pick(self):
+        """Pilih alert yang boleh diputar sekarang -> (kind, t_trigger) atau (None, detik tunggu).
+        Dipanggil dengan self.cond terkunci."""
+        if not self.pending:
+            return None, 0.5
+        now = self.clock()
+        for kind in [k for k, (_, dl) in self.pending.items() if now > dl]:
+            del self.pending[kind]
+            self._coalesced.discard(kind)
+            self._count("dropped", kind)
+        if not self.pending:
+            return None, 0.5
+        kind = max(self.pending, key=lambda k: (self.prio(k), -self.pending[k][0]))
+        cur = self.audio.current()
+        # jeda global hanya boleh dilompati alert yang lebih penting dari yang terakhir
+        gap_ok = (now - self.last_any >= self.global_gap
+                  or self.prio(kind) > self.prio(self.last_kind))
+        busy = cur is not None and self.prio(kind) <= self.prio(cur)
+        if not gap_ok or busy:
+            return None, 0.02
+        self._coalesced.discard(kind)
+        return kind, self.pending.pop(kind)[0]
+
+    def _play(self, kind, t_trig):
+        ok = self.audio.play(kind, t_trig)
+        with self.cond:
+            if ok:
+                self.last_emit[kind] = self.last_any = self.clock()
+                self.last_kind = kind
+                self._count("emitted", kind)
+            else:
+                self._count("dropped", kind)
+        return ok
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                kind, arg = self._pick()
+                if kind is None:
+                    self.cond.wait(arg)
+                    continue
+            self._play(kind, arg)
+
+    def pump(self):
+        """Satu putaran penjadwalan tanpa thread (replay offline). Return jenis yang diputar atau None."""
+        with self.cond:
+            kind, arg = self._pick()
+        if kind is None or not self._play(kind, arg):
+            return None
+        return kind
+
+    def stats(self):
+        with self.cond:
+            return dict(self.counts, pending=sorted(self.pending), last=self.last_kind,
+                        by_kind={k: dict(v) for k, v in self.by_kind.items()})
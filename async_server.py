@@ -0,0 +1,278 @@
+# async_server.py
+# Server HTTP asyncio (SERVER=async) sebagai pengganti Flask dev server threaded=True.
+#  - /video (MJPEG), /events (SSE) dan /snapshot dilayani coroutine yang membaca
+#    buffer bersama (FrameHub / StatePusher) -> viewer tidak memegang thread OS
+#  - route lain (dashboard, /metrics, /set, ...) diteruskan ke app Flask (WSGI)
+#    lewat thread pool kecil, jadi logika route tetap satu tempat
+#  - batas jumlah koneksi & stream; klien lambat: antrian per-klien kecil, frame
+#    lama dibuang, dan koneksi diputus kalau socket tidak bisa ditulis send_timeout detik
+#  - request (header + body) harus lengkap dalam keepalive detik, else koneksi ditutup
+import asyncio, io, signal, sys
+from http import HTTPStatus
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, parse_qs
+
+def _reason(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return ""
+
+class _AsyncSub:
+    """Subscriber FrameHub/StatePusher yang hidup di event loop.
+    put() dipanggil dari thread produsen; antrian hanya disentuh oleh loop."""
+    def __init__(self, loop, maxlen):
+        self.loop = loop
+        self.q = deque(maxlen=maxlen)
+        self.ev = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, chunk, full=None):
+        try:
+            self.loop.call_soon_threadsafe(self._put, chunk, full)
+        except RuntimeError:
+            pass     # loop sudah ditutup
+
+    def _put(self, chunk, full):
+        if len(self.q) == self.q.maxlen:
+            if full is not None:
+                # SSE: delta tidak boleh hilang sebagian -> ganti dengan snapshot penuh
+                self.q.clear()
+                chunk = full
+            else:
+                self.dropped += 1
+        self.q.append(chunk)
+        self.ev.set()
+
+    async def get(self, timeout):
+        if not self.q:
+            self.ev.clear()
+            try:
+                await asyncio.wait_for(self.ev.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.q.popleft() if self.q else None
+
+class AsyncServer:
+    def __init__(self, wsgi_app, hub, pusher, snapshot_fn, h264=None, max_conns=32, max_streams=16,
+                 send_timeout=10.0, queue=2, wsgi_threads=4, keepalive=15.0):
+        self.wsgi_app = wsgi_app
+        self.hub = hub
+        self.h264 = h264
+        self.pusher = pusher
+        self.snapshot_fn = snapshot_fn      # () -> bytes JPEG atau None
+        self.max_conns = max_conns
+        self.max_streams = max_streams
+        self.send_timeout = send_timeout
+        self.queue = queue
+        self.keepalive = keepalive
+        self.pool = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix="wsgi")
+        self.loop = None
+        self.conns = 0
+        self.streams = 0
+        self.counts = {"requests": 0, "rejected": 0, "slow_closed": 0, "idle_closed": 0, "errors": 0}
+
+    # ---- HTTP dasar ----
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise ValueError("header terlalu besar")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for ln in lines[1:]:
+            if ":" in ln:
+                k, v = ln.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        n = int(headers.get("content-length") or 0)
+        if n > 1 << 20:
+            raise ValueError("body terlalu besar")
+        body = await reader.readexactly(n) if n else b""
+        return method, target, version, headers, body
+
+    def _head(self, status, headers):
+        out = [f"HTTP/1.1 {status} {_reason(status)}\r\n"]
+        out += [f"{k}: {v}\r\n" for k, v in headers]
+        out.append("\r\n")
+        return "".join(out).encode("latin-1")
+
+    async def _send(self, writer, data):
+        writer.write(data)
+        await asyncio.wait_for(writer.drain(), self.send_timeout)
+
+    async def _simple(self, writer, status, body, ctype="text/plain; charset=utf-8", close=True):
+        hdr = [("Content-Type", ctype), ("Content-Length", str(len(body))), ("Cache-Control", "no-store")]
+        if close:
+            hdr.append(("Connection", "close"))
+        await self._send(writer, self._head(status, hdr) + body)
+
+    # ---- koneksi ----
+    async def _client(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        writer.transport.set_write_buffer_limits(high=256 * 1024)
+        self.conns += 1
+        try:
+            if self.conns > self.max_conns:
+                self.counts["rejected"] += 1
+                await self._simple(writer, 503, b"too many connections")
+                return
+            while True:
+                try:
+                    # keep-alive idle / header dikirim sepotong-sepotong (slowloris) tidak boleh
+                    # memegang slot max_conns selamanya
+                    method, target, version, headers, body = await asyncio.wait_for(
+                        self._read_request(reader), self.keepalive)
+                except asyncio.TimeoutError:
+                    self.counts["idle_closed"] += 1
+                    return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except ValueError as e:
+                    await self._simple(writer, 413 if "besar" in str(e) else 400, str(e).encode())
+                    return
+                self.counts["requests"] += 1
+                path, _, query = target.partition("?")
+                keep = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if path in ("/video", "/events"):
+                    await self._stream(writer, path)
+                    return
+                if path == "/video.mp4" and self.h264 is not None:
+                    await self._stream_fmp4(writer, parse_qs(query).get("q", ["auto"])[0])
+                    return
+                if path == "/snapshot":
+                    jpg = await self.loop.run_in_executor(self.pool, self.snapshot_fn)
+                    if jpg is None:
+                        await self._simple(writer, 503, b"no frame yet", close=not keep)
+                    else:
+                        await self._simple(writer, 200, jpg, "image/jpeg", close=not keep)
+                else:
+                    status, hdrs, data = await self.loop.run_in_executor(
+                        self.pool, self._call_wsgi, method, path, query, headers, body, sock)
+                    hdrs = [(k, v) for k, v in hdrs if k.lower() not in ("content-length", "connection")]
+                    hdrs.append(("Content-Length", str(len(data))))
+                    if not keep:
+                        hdrs.append(("Connection", "close"))
+                    await self._send(writer, self._head(status, hdrs) + data)
+                if not keep:
+                    return
+        except asyncio.TimeoutError:
+            self.counts["slow_closed"] += 1
+        except ConnectionError:
+            pass     # klien menutup koneksi
+        except asyncio.CancelledError:
+            pass     # shutdown; task selesai normal supaya asyncio tidak mencetak traceback
+        except Exception as e:
+            self.counts["errors"] += 1
+            print("[WARN] async server:", e)
+        finally:
+            self.conns -= 1
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    async def _stream(self, writer, path):
+        if self.streams >= self.max_streams:
+            self.counts["rejected"] += 1
+            await self._simple(writer, 503, b"too many streams")
+            return
+        video = path == "/video"
+        src = self.hub if video else self.pusher
+        sub = _AsyncSub(self.loop, self.queue if video else 16)
+        ctype = "multipart/x-mixed-replace; boundary=frame" if video else "text/event-stream"
+        self.streams += 1
+        src.subscribe(sub)
+        try:
+            await self._send(writer, self._head(200, [("Content-Type", ctype), ("Cache-Control", "no-store"),
+                                                      ("X-Accel-Buffering", "no"), ("Connection", "close")]))
+            while True:
+                chunk = await sub.get(self.keepalive)
+                if chunk is None:
+                    if video:
+                        continue
+                    chunk = b": ka\n\n"
+                await self._send(writer, chunk)
+        finally:
+            src.unsubscribe(sub)
+            self.streams -= 1
+
+    async def _stream_fmp4(self, writer, tier):
+        if self.streams >= self.max_streams:
+            self.counts["rejected"] += 1
+            await self._simple(writer, 503, b"too many streams")
+            return
+        ev = asyncio.Event()
+        loop = self.loop
+        # antrian & adaptasi tier diurus H264Hub; loop cukup dibangunkan saat ada fragmen
+        sub = self.h264.subscribe(tier, on_data=lambda: loop.call_soon_threadsafe(ev.set))
+        self.streams += 1
+        try:
+            await self._send(writer, self._head(200, [("Content-Type", "video/mp4"), ("Cache-Control", "no-store"),
+                                                      ("X-Codec", self.h264.codec_string(sub.tier)),
+                                                      ("Connection", "close")]))
+            while True:
+                chunk = sub.pop()
+                if chunk is None:
+                    ev.clear()
+                    if sub.q:
+                        continue
+                    try:
+                        await asyncio.wait_for(ev.wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._send(writer, chunk)
+        finally:
+            self.h264.unsubscribe(sub)
+            self.streams -= 1
+
+    # ---- jembatan WSGI (dijalankan di thread pool) ----
+    def _call_wsgi(self, method, path, query, headers, body, sock):
+        peer = sock.getpeername() if sock else ("", 0)
+        env = {
+            "REQUEST_METHOD": method, "SCRIPT_NAME": "", "PATH_INFO": unquote(path),
+            "QUERY_STRING": query, "SERVER_NAME": "navi", "SERVER_PORT": "0",
+            "SERVER_PROTOCOL": "HTTP/1.1", "REMOTE_ADDR": peer[0],
+            "CONTENT_TYPE": headers.get("content-type", ""), "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr, "wsgi.multithread": True, "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for k, v in headers.items():
+            if k not in ("content-type", "content-length"):
+                env["HTTP_" + k.upper().replace("-", "_")] = v
+        res = {}
+
+        def start_response(status, hdrs, exc_info=None):
+            res["status"], res["headers"] = int(status.split(" ", 1)[0]), hdrs
+        it = self.wsgi_app(env, start_response)
+        try:
+            data = b"".join(it)
+        finally:
+            if hasattr(it, "close"):
+                it.close()
+        return res["status"], res["headers"], data
+
+    # ---- run ----
+    def stats(self):
+        return dict(self.counts, mode="async", conns=self.conns, streams=self.streams,
+                    max_conns=self.max_conns, max_streams=self.max_streams)
+
+    async def _main(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        srv = await asyncio.start_server(self._client, host, port, limit=16 * 1024, backlog=64)
+        print(f"[OK ] Async server di http://{host}:{port} (maks {self.max_conns} koneksi, {self.max_streams} stream)")
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, stop.set)
+        async with srv:
+            await stop.wait()      # stream yang masih jalan dibatalkan oleh asyncio.run
+
+    def serve(self, host="0.0.0.0", port=5000):
+        """Blok sampai SIGINT/SIGTERM, lalu kembali ke pemanggil untuk cleanup."""
+        try:
+            asyncio.run(self._main(host, port))
+        finally:
+            self.pool.shutdown(wait=False)
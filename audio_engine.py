@@ -0,0 +1,251 @@
+# audio_engine.py
+# Mesin audio in-process untuk klip peringatan (kiri/kanan/depan/...).
+#  - semua klip di AUDIO_DIR di-decode SEKALI saat start ke PCM s16le mono 44.1 kHz
+#  - satu output stream yang terus hidup, buffer kecil & tetap:
+#      aplay  : satu proses `aplay -t raw` yang di-feed blok 10 ms lewat stdin
+#      pygame : mixer.Sound dari buffer PCM, diputar di satu Channel khusus
+#  - prioritas: klip berprioritas lebih tinggi memotong klip yang sedang jalan
+#  - latency trigger -> sampel pertama diukur per alert
+import os, time, wave, threading, subprocess
+from collections import deque
+
+RATE = 44100
+SAMPLE_BYTES = 2          # s16le mono
+EXTS = ("wav","WAV","mp3","MP3","ogg","OGG","wap","WAP")   # urutan = preferensi
+
+def _to_mono_s16(raw:bytes, channels:int, width:int, rate:int):
+    import numpy as np
+    if width == 1:
+        a = (np.frombuffer(raw, np.uint8).astype(np.int16) - 128) << 8
+    elif width == 2:
+        a = np.frombuffer(raw, "<i2")
+    elif width == 4:
+        a = (np.frombuffer(raw, "<i4") >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"sample width {width} tidak didukung")
+    if channels > 1:
+        a = a.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != RATE and len(a):
+        n = int(len(a) * RATE / rate)
+        a = np.interp(np.linspace(0, len(a) - 1, n), np.arange(len(a)), a).astype(np.int16)
+    return a.astype("<i2").tobytes()
+
+def _decode_av(path:str):
+    import av
+    out = []
+    with av.open(path) as c:
+        rs = av.AudioResampler(format="s16", layout="mono", rate=RATE)
+        for frame in c.decode(audio=0):
+            for f in rs.resample(frame):
+                out.append(bytes(f.planes[0])[: f.samples * SAMPLE_BYTES])
+        for f in rs.resample(None):
+            out.append(bytes(f.planes[0])[: f.samples * SAMPLE_BYTES])
+    return b"".join(out)
+
+def decode_clip(path:str):
+    """File audio -> PCM s16le mono 44.1 kHz (bytes)."""
+    try:
+        with wave.open(path, "rb") as w:
+            return _to_mono_s16(w.readframes(w.getnframes()), w.getnchannels(), w.getsampwidth(), w.getframerate())
+    except (wave.Error, EOFError):
+        return _decode_av(path)     # mp3/ogg/.wap (3gp/aac)
+
+def load_clips(audio_dir:str):
+    clips = {}
+    try:
+        names = os.listdir(audio_dir)
+    except Exception as e:
+        print(f"[WARN] AUDIO_DIR {audio_dir} tidak bisa dibaca:", e)
+        return clips
+    by_kind = {}
+    for n in names:
+        kind, _, ext = n.rpartition(".")
+        if kind and ext in EXTS:
+            by_kind.setdefault(kind, []).append(ext)
+    for kind, exts in by_kind.items():
+        for ext in sorted(exts, key=EXTS.index):
+            path = os.path.join(audio_dir, f"{kind}.{ext}")
+            try:
+                clips[kind] = decode_clip(path)
+                break
+            except Exception as e:
+                print(f"[WARN] gagal decode {path}:", e)
+    return clips
+
+class AudioEngine:
+    def __init__(self, audio_dir="sounds", method="aplay", priorities=None, block_ms=10, buffer_ms=40,
+                 fallbacks=None):
+        self.audio_dir = audio_dir
+        self.method = method.lower()
+        self.priorities = priorities or {"depan": 2}
+        self.fallbacks = fallbacks or {}   # jenis -> klip pengganti kalau <jenis>.wav tidak ada
+        self.block = int(RATE * block_ms / 1000) * SAMPLE_BYTES
+        self.buffer_ms = buffer_ms
+        self.clips = {}
+        self.lock = threading.Lock()
+        self._pending = None         # (kind, pcm, t_trigger) -> diambil feeder di batas blok
+        self._cur_kind = None
+        self._cur_end = 0.0          # pygame: perkiraan waktu klip selesai
+        self._proc = None
+        self._pg = None
+        self.latencies = deque(maxlen=100)
+        self.played = 0
+        self.preempted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.ready = False
+        self.on_latency = None       # callback(ms) per alert, mis. histogram telemetri
+
+    # ---- setup ----
+    def start(self):
+        t0 = time.perf_counter()
+        self.clips = load_clips(self.audio_dir)
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"[OK ] Audio: {len(self.clips)} klip di-decode ({', '.join(sorted(self.clips))}) dalam {ms:.0f} ms")
+        if self.method == "pygame":
+            self._start_pygame()
+        else:
+            self._start_aplay()
+            threading.Thread(target=self._aplay_feeder, daemon=True).start()
+        self.ready = True
+        return self
+
+    def _start_aplay(self):
+        """Buka aplay sebelum feeder jalan: gagal di sini -> raise, ready tetap False."""
+        try:
+            self._proc = self._open_aplay()
+        except FileNotFoundError:
+            raise RuntimeError("aplay tidak ditemukan")
+        try:
+            # perangkat ALSA tidak bisa dibuka -> aplay langsung keluar
+            code = self._proc.wait(0.2)
+        except subprocess.TimeoutExpired:
+            return
+        self._proc = None
+        raise RuntimeError(f"aplay keluar saat membuka perangkat (exit {code})")
+
+    def _start_pygame(self):
+        import pygame
+        block_frames = self.block // SAMPLE_BYTES
+        pygame.mixer.pre_init(RATE, -16, 1, block_frames)
+        pygame.mixer.init()
+        pygame.mixer.set_reserved(1)
+        self._pg = {"ch": pygame.mixer.Channel(0),
+                    "snd": {k: pygame.mixer.Sound(buffer=v) for k, v in self.clips.items()}}
+        self.buffer_ms = block_frames * 1000.0 / RATE
+
+    def _open_aplay(self):
+        return subprocess.Popen(
+            ["aplay", "-q", "-t", "raw", "-f", "S16_LE", "-r", str(RATE), "-c", "1",
+             f"--buffer-time={int(self.buffer_ms*1000)}", "-"],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _aplay_feeder(self):
+        silence = bytes(self.block)
+        pcm, pos = None, 0
+        while True:
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self._proc = self._open_aplay()
+                while True:
+                    with self.lock:
+                        pend, self._pending = self._pending, None
+                    if pend is not None:
+                        kind, pcm, t_trig = pend
+                        pos = 0
+                    if pcm is not None and pos < len(pcm):
+                        chunk = memoryview(pcm)[pos:pos+self.block]
+                        if pos == 0:
+                            # blok pertama masuk ke ALSA; + buffer perangkat = sampel pertama terdengar
+                            self._latency((time.perf_counter() - t_trig) * 1000 + self.buffer_ms)
+                        pos += len(chunk)
+                        self._proc.stdin.write(chunk)
+                    else:
+                        if pcm is not None:
+                            pcm = None
+                            with self.lock:
+                                self._cur_kind = None
+                        self._proc.stdin.write(silence)
+            except FileNotFoundError:
+                print("[WARN] aplay tidak ditemukan; audio dimatikan")
+                self.ready = False
+                return
+            except Exception as e:
+                self.errors += 1
+                print("[WARN] aplay stream gagal:", e)
+                try:
+                    self._proc.kill()
+                except Exception:
+                    pass
+                self._proc = None
+                pcm = None
+                with self.lock:
+                    self._cur_kind = None
+                time.sleep(1.0)
+
+    def _latency(self, ms):
+        self.latencies.append(ms)
+        if self.on_latency:
+            self.on_latency(ms)
+
+    # ---- API ----
+    def _clip(self, kind):
+        """Nama klip untuk jenis alert (klip sendiri, else fallback) atau None."""
+        if kind in self.clips:
+            return kind
+        alt = self.fallbacks.get(kind)
+        return alt if alt in self.clips else None
+
+    def has(self, kind:str):
+        return self._clip(kind) is not None
+
+    def current(self):
+        with self.lock:
+            if self._pg is not None and self._cur_kind and time.perf_counter() >= self._cur_end:
+                self._cur_kind = None
+            return self._cur_kind
+
+    def play(self, kind:str, t_trigger=None):
+        """Putar klip; return False kalau ditolak (klip lain berprioritas >= sedang jalan)."""
+        t_trigger = time.perf_counter() if t_trigger is None else t_trigger
+        clip = self._clip(kind)
+        pcm = self.clips.get(clip) if clip else None
+        if pcm is None or not self.ready:
+            return False
+        cur = self.current()
+        prio = self.priorities.get(kind, 1)
+        with self.lock:
+            if cur is not None:
+                if prio <= self.priorities.get(cur, 1):
+                    self.rejected += 1
+                    return False
+                self.preempted += 1
+            self._cur_kind = kind
+            self.played += 1
+            if self._pg is None:
+                self._pending = (kind, pcm, t_trigger)
+                return True
+            self._cur_end = time.perf_counter() + len(pcm) / (RATE * SAMPLE_BYTES)
+        try:
+            ch = self._pg["ch"]
+            ch.stop()
+            ch.play(self._pg["snd"][clip])
+            self._latency((time.perf_counter() - t_trigger) * 1000 + self.buffer_ms)
+        except Exception as e:
+            self.errors += 1
+            print("[WARN] pygame audio gagal:", e)
+        return True
+
+    def stats(self):
+        lat = list(self.latencies)
+        return {
+            "method": self.method,
+            "clips": sorted(self.clips),
+            "playing": self.current(),
+            "played": self.played,
+            "preempted": self.preempted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "latency_ms_last": (round(lat[-1], 1) if lat else None),
+            "latency_ms_avg": (round(sum(lat) / len(lat), 1) if lat else None),
+        }
@@ -0,0 +1,190 @@
+# capture.py
+# Mesin capture kamera: grab() terus-menerus di thread sendiri, retrieve() hanya untuk frame terpakai.
+#  - banyak driver V4L2 mengabaikan CAP_PROP_BUFFERSIZE=1; frame lama di antrian driver dikuras
+#    (grab tanpa retrieve) sampai yang didapat frame segar -> inferensi tidak lagi jalan di frame
+#    ratusan ms lalu
+#  - retrieve/decode hanya saat slot keluaran kosong (konsumen sudah mengambil frame sebelumnya),
+#    jadi tidak ada decode yang dibuang
+#  - mode "reduced": MJPEG mentah (CONVERT_RGB=0) di-decode langsung ke 1/2, 1/4 atau 1/8 (skala
+#    DCT libjpeg; simplejpeg, fallback cv2.IMREAD_REDUCED_COLOR_*), skala terkecil yang masih >= IMGSZ.
+#    Skala M/8 lain (mis. 3/4) justru lebih lambat dari decode penuh, jadi tidak dipakai; artinya
+#    hanya kamera dengan lebar >= 2x IMGSZ yang diuntungkan (1280x720 @ IMGSZ <= 640,
+#    640x480 @ IMGSZ <= 320). Resolusi lain tetap decode penuh.
+#  - FramePool: buffer numpy dialokasikan sekali dan dipakai ulang; buffer dianggap bebas kalau
+#    tidak ada lagi referensi di luar pool (view/crop ikut menahan buffer), jadi aman tanpa release()
+#  - umur frame: timestamp buffer V4L2 (CLOCK_MONOTONIC) kalau tersedia, kalau tidak waktu grab()
+import sys, time, threading
+import cv2
+import numpy as np
+
+try:
+    import simplejpeg
+except Exception:
+    simplejpeg = None
+
+class FramePool:
+    def __init__(self, size=6):
+        self.size = size
+        self.bufs = []
+        self.shape = None
+        self.lock = threading.Lock()
+        self.counts = {"reused": 0, "allocated": 0, "misses": 0}
+
+    def acquire(self, shape):
+        """Buffer bebas dengan shape ini; pool penuh & semua dipakai -> alokasi baru (miss)."""
+        with self.lock:
+            if shape != self.shape:
+                self.bufs, self.shape = [], shape
+            for b in self.bufs:
+                # referensi: list pool + variabel loop + argumen getrefcount
+                if sys.getrefcount(b) <= 3:
+                    self.counts["reused"] += 1
+                    return b
+            b = np.empty(shape, np.uint8)
+            if len(self.bufs) < self.size:
+                self.bufs.append(b)
+                self.counts["allocated"] += 1
+            else:
+                self.counts["misses"] += 1
+            return b
+
+    def stats(self):
+        with self.lock:
+            busy = sum(1 for b in self.bufs if sys.getrefcount(b) > 3)
+        return dict(self.counts, size=len(self.bufs), busy=busy)
+
+IMREAD_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                8: cv2.IMREAD_REDUCED_COLOR_8}
+
+def _fourcc(cap):
+    v = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return "".join(chr((v >> 8 * i) & 0xFF) for i in range(4)) if v > 0 else ""
+
+class CaptureEngine:
+    def __init__(self, cap, out, pool_size=6, decode="cv2", target=(0, 0), stale_ms=50.0, max_drain=8,
+                 on_frame=None, on_error=None):
+        self.cap = cap
+        self.out = out                   # LatestSlot: put((frame_id, t_frame, frame))
+        self.pool = FramePool(pool_size)
+        self.target = target             # (w, h) minimum hasil decode reduced
+        self.stale_s = stale_ms / 1000.0
+        self.max_drain = max_drain
+        self.on_frame = on_frame         # on_frame(ms_retrieve) per frame terpakai
+        self.on_error = on_error
+        self.mode = "cv2"
+        self.counts = {"grabbed": 0, "retrieved": 0, "drained": 0, "skipped": 0, "decode_errors": 0}
+        self.shape = None
+        self.factor = None               # skala decode reduced (1 = penuh), dipilih dari frame pertama
+        self._ts_ok = None               # None = belum dicek, True/False = timestamp buffer bisa dipakai
+        self._stop = False
+        if decode == "reduced":
+            self._enable_reduced()
+
+    def _enable_reduced(self):
+        if _fourcc(self.cap) != "MJPG":
+            print(f"[WARN] decode reduced butuh MJPG (fourcc {_fourcc(self.cap) or '?'}), pakai decode OpenCV")
+            return
+        self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self.mode = "simplejpeg" if simplejpeg is not None else "imdecode"
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def close(self):
+        self._stop = True
+
+    # ---- waktu frame ----
+    def _frame_time(self, t_grab):
+        """Waktu frame di domain perf_counter: timestamp buffer V4L2 kalau masuk akal, else t_grab."""
+        if self._ts_ok is False:
+            return t_grab
+        ts = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        age = time.monotonic() - ts
+        ok = 0.0 <= age < 2.0
+        if self._ts_ok is None and self.counts["grabbed"] > 5:
+            self._ts_ok = ok
+        return t_grab - age if ok else t_grab
+
+    # ---- decode ----
+    def _retrieve(self):
+        if self.mode == "cv2":
+            buf = self.pool.acquire(self.shape) if self.shape else None
+            ok, frame = self.cap.retrieve(buf) if buf is not None else self.cap.retrieve()
+            if ok and frame is not None and self.shape is None:
+                self.shape = frame.shape
+            return frame if ok else None
+        ok, raw = self.cap.retrieve()
+        if not ok or raw is None:
+            return None
+        if raw.ndim == 3:
+            # driver tetap mengirim BGR (CONVERT_RGB diabaikan) -> kembali ke jalur biasa
+            print("[WARN] kamera tidak mengirim MJPEG mentah, decode reduced dimatikan")
+            self.mode = "cv2"
+            self.shape = raw.shape
+            return raw
+        raw = raw.reshape(-1)            # 1xN -> N (view), simplejpeg butuh buffer 1-D
+        try:
+            if self.factor is None:
+                self._pick_factor(raw)
+            if self.mode == "simplejpeg":
+                return simplejpeg.decode_jpeg(raw, "BGR", min_width=self.shape[1], min_height=0,
+                                              buffer=self.pool.acquire(self.shape))
+            return cv2.imdecode(raw, IMREAD_FLAGS[self.factor])
+        except Exception:
+            self.counts["decode_errors"] += 1
+            return None
+
+    def _pick_factor(self, raw):
+        """Faktor 8/4/2 terbesar yang hasilnya masih >= target; 1 = decode penuh."""
+        if self.mode == "simplejpeg":
+            H, W = simplejpeg.decode_jpeg_header(raw)[:2]
+        else:
+            H, W = cv2.imdecode(raw, cv2.IMREAD_COLOR).shape[:2]
+        tw, th = self.target
+        self.factor = next((f for f in (8, 4, 2) if W // f >= tw and H // f >= th), 1)
+        # ceil = ukuran keluaran libjpeg; untuk simplejpeg juga min_width yang memilih skala 1/f
+        self.shape = (-(-H // self.factor), -(-W // self.factor), 3)
+        if self.factor == 1:
+            print(f"[INFO] decode reduced: {W}x{H} terlalu kecil untuk target lebar {tw} "
+                  f"(perlu >= {2 * tw}), tetap decode penuh")
+        else:
+            print(f"[OK ] decode reduced 1/{self.factor}: {W}x{H} -> {self.shape[1]}x{self.shape[0]}")
+
+    # ---- loop ----
+    def run(self):
+        frame_id = 0
+        drained = 0
+        while not self._stop:
+            t0 = time.perf_counter()
+            if not self.cap.grab():
+                if self.on_error:
+                    self.on_error("camera_read")
+                time.sleep(0.1)
+                continue
+            t_grab = time.perf_counter()
+            self.counts["grabbed"] += 1
+            t_frame = self._frame_time(t_grab)
+            # frame sudah menunggu di antrian driver -> buang, ambil yang berikutnya
+            stale = (t_grab - t_frame > self.stale_s) if self._ts_ok else (t_grab - t0 < 0.002)
+            if stale and drained < self.max_drain:
+                drained += 1
+                self.counts["drained"] += 1
+                continue
+            drained = 0
+            if self.out.pending():
+                self.counts["skipped"] += 1      # konsumen masih sibuk: jangan decode sia-sia
+                continue
+            frame = self._retrieve()
+            if frame is None:
+                continue
+            t1 = time.perf_counter()
+            self.counts["retrieved"] += 1
+            if self.on_frame:
+                self.on_frame((t1 - t_grab) * 1000.0)
+            self.out.put((frame_id, t_frame, frame))
+            frame_id += 1
+
+    def stats(self):
+        return dict(self.counts, mode=self.mode, factor=self.factor, shape=(list(self.shape) if self.shape else None),
+                    pool=self.pool.stats())
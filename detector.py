@@ -0,0 +1,200 @@
+# detector.py
+# Backend inferensi YOLO yang bisa dipilih lewat env INFER_BACKEND:
+#   torch    -> best_pothole.pt via Ultralytics (PyTorch CPU)
+#   onnx     -> best_pothole.onnx via onnxruntime langsung (jumlah thread bisa diatur)
+#   openvino -> best_pothole_openvino_model/ via Ultralytics (runtime OpenVINO)
+#   ncnn     -> best_pothole_ncnn_model/ via Ultralytics (runtime NCNN)
+# Semua backend mengembalikan list (x1,y1,x2,y2,conf) dalam koordinat frame asli,
+# format yang sama dengan yang dipakai decide_direction_from_boxes.
+# detect_batch(frames) menjalankan beberapa frame (multi-kamera) dalam SATU panggilan model
+# bila runtime mendukung batch (torch, onnx export dynamic); selain itu frame dijalankan berurutan.
+#
+# Export sekali (hasil disimpan di sebelah file .pt):
+#   python detector.py --export onnx [--model best_pothole.pt] [--imgsz 416]
+import os, sys, argparse
+import numpy as np
+import cv2
+
+BACKENDS = ("torch", "onnx", "openvino", "ncnn")
+
+def export_path(model_path:str, backend:str):
+    base = os.path.splitext(model_path)[0]
+    return {
+        "torch":    model_path,
+        "onnx":     base + ".onnx",
+        "openvino": base + "_openvino_model",
+        "ncnn":     base + "_ncnn_model",
+    }[backend]
+
+def export_model(model_path:str, backend:str, imgsz:int, force=False):
+    """Konversi .pt ke format backend; dipakai ulang kalau cache lebih baru dari .pt."""
+    if backend not in BACKENDS:
+        raise ValueError(f"backend tidak dikenal: {backend}")
+    dst = export_path(model_path, backend)
+    if backend == "torch":
+        return dst
+    if not force and os.path.exists(dst):
+        if not os.path.exists(model_path) or os.path.getmtime(dst) >= os.path.getmtime(model_path):
+            return dst
+    from ultralytics import YOLO
+    print(f"[INFO] Export {model_path} -> {backend} (imgsz {imgsz}) ...")
+    kw = {"dynamic": True, "simplify": True} if backend == "onnx" else {}
+    out = YOLO(model_path).export(format=backend, imgsz=imgsz, **kw)
+    print(f"[OK ] Export selesai: {out}")
+    return str(out) if out else dst
+
+def _export_imgsz(path:str):
+    # Ultralytics menulis metadata.yaml (berisi imgsz) di folder export openvino/ncnn
+    meta = os.path.join(path, "metadata.yaml")
+    if not os.path.isfile(meta):
+        return None
+    try:
+        import yaml
+        with open(meta) as f:
+            sz = (yaml.safe_load(f) or {}).get("imgsz")
+        return int(sz[0] if isinstance(sz, (list, tuple)) else sz)
+    except Exception:
+        return None
+
+class UltralyticsDetector:
+    """torch/openvino/ncnn lewat Ultralytics AutoBackend."""
+    def __init__(self, path:str, backend:str, threads:int):
+        if backend == "torch":
+            try:
+                import torch
+                torch.set_num_threads(threads)
+            except Exception:
+                pass
+        from ultralytics import YOLO
+        self.backend = backend
+        self.path = path
+        self.threads = threads
+        self._threads_done = backend == "torch"
+        self.model = YOLO(path, task="detect")
+        # export openvino/ncnn biasanya ber-shape statis -> imgsz harus sama dengan saat export
+        self.fixed_imgsz = None if backend == "torch" else _export_imgsz(path)
+
+    def _apply_threads(self):
+        """openvino/ncnn: runtime (AutoBackend) baru dibuat Ultralytics saat predict pertama,
+        jadi INFER_THREADS dipasang setelahnya: ncnn lewat net.opt.num_threads, openvino dengan
+        compile ulang memakai INFERENCE_NUM_THREADS."""
+        self._threads_done = True
+        be = getattr(getattr(self.model, "predictor", None), "model", None)
+        try:
+            if self.backend == "ncnn" and hasattr(be, "net"):
+                be.net.opt.num_threads = self.threads
+                return
+            if self.backend == "openvino" and hasattr(be, "ov_model") and hasattr(be, "core"):
+                be.ov_compiled_model = be.core.compile_model(
+                    be.ov_model, device_name="CPU",
+                    config={"PERFORMANCE_HINT": "LATENCY", "INFERENCE_NUM_THREADS": self.threads})
+                return
+        except Exception as e:
+            print(f"[WARN] INFER_THREADS={self.threads} tidak bisa dipasang ke {self.backend}: {e}")
+            return
+        print(f"[WARN] INFER_THREADS diabaikan backend {self.backend} (runtime Ultralytics tidak dikenali)")
+
+    @staticmethod
+    def _boxes(result):
+        boxes = []
+        b = result.boxes
+        if b is not None and b.xyxy is not None and b.conf is not None:
+            for (x1,y1,x2,y2), c in zip(b.xyxy.cpu().numpy(), b.conf.cpu().numpy()):
+                boxes.append((float(x1),float(y1),float(x2),float(y2),float(c)))
+        return boxes
+
+    def detect(self, frame, imgsz:int, conf:float):
+        results = self.model(frame, imgsz=(self.fixed_imgsz or imgsz), conf=conf, verbose=False)
+        if not self._threads_done:
+            self._apply_threads()
+        return self._boxes(results[0])
+
+    def detect_batch(self, frames, imgsz:int, conf:float):
+        if len(frames) == 1 or self.backend != "torch":
+            # export openvino/ncnn ber-batch statis 1
+            return [self.detect(f, imgsz, conf) for f in frames]
+        results = self.model(list(frames), imgsz=(self.fixed_imgsz or imgsz), conf=conf, verbose=False)
+        return [self._boxes(r) for r in results]
+
+class OnnxDetector:
+    """onnxruntime langsung: letterbox + decode output YOLOv8 + NMS (cv2.dnn)."""
+    def __init__(self, path:str, threads:int, iou:float=0.45):
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.intra_op_num_threads = threads
+        so.inter_op_num_threads = 1
+        so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.backend = "onnx"
+        self.path = path
+        self.iou = iou
+        self.sess = ort.InferenceSession(path, sess_options=so, providers=["CPUExecutionProvider"])
+        inp = self.sess.get_inputs()[0]
+        self.input_name = inp.name
+        hw = inp.shape[2]
+        self.fixed_imgsz = hw if isinstance(hw, int) else None
+        self.dynamic_batch = not isinstance(inp.shape[0], int)
+
+    def _letterbox(self, frame, size:int):
+        h, w = frame.shape[:2]
+        r = min(size / h, size / w)
+        nh, nw = int(round(h * r)), int(round(w * r))
+        top, left = (size - nh) // 2, (size - nw) // 2
+        canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+        canvas[top:top+nh, left:left+nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        return canvas, r, left, top
+
+    def detect(self, frame, imgsz:int, conf:float):
+        return self.detect_batch([frame], imgsz, conf)[0]
+
+    def detect_batch(self, frames, imgsz:int, conf:float):
+        size = self.fixed_imgsz or max(32, int(imgsz) // 32 * 32)
+        if len(frames) > 1 and not self.dynamic_batch:
+            return [self.detect(f, imgsz, conf) for f in frames]
+        boxed = [self._letterbox(f, size) for f in frames]
+        blob = cv2.dnn.blobFromImages([b[0] for b in boxed], 1/255.0, swapRB=True)   # BGR->RGB, NCHW, float32
+        outs = self.sess.run(None, {self.input_name: blob})[0]
+        return [self._decode(out, f, *b[1:], conf) for out, f, b in zip(outs, frames, boxed)]
+
+    def _decode(self, out, frame, r, left, top, conf):
+        if out.shape[0] < out.shape[1]:          # (4+nc, N) -> (N, 4+nc)
+            out = out.T
+        scores = out[:, 4:].max(axis=1)
+        keep = scores >= conf
+        if not np.any(keep):
+            return []
+        xywh, scores = out[keep, :4], scores[keep]
+        x1 = (xywh[:, 0] - xywh[:, 2] / 2 - left) / r
+        y1 = (xywh[:, 1] - xywh[:, 3] / 2 - top) / r
+        bw, bh = xywh[:, 2] / r, xywh[:, 3] / r
+        idx = cv2.dnn.NMSBoxes(np.stack([x1, y1, bw, bh], 1).tolist(), scores.tolist(), conf, self.iou)
+        H, W = frame.shape[:2]
+        boxes = []
+        for i in np.array(idx).reshape(-1):
+            boxes.append((float(max(0.0, x1[i])), float(max(0.0, y1[i])),
+                          float(min(W, x1[i] + bw[i])), float(min(H, y1[i] + bh[i])), float(scores[i])))
+        return boxes
+
+def load_detector(model_path:str, backend:str="torch", imgsz:int=416, threads:int=0):
+    backend = (backend or "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"INFER_BACKEND harus salah satu dari {BACKENDS}, bukan '{backend}'")
+    threads = threads or (os.cpu_count() or 4)
+    cv2.setNumThreads(threads)
+    path = model_path if model_path.endswith((".onnx", "_model")) else export_model(model_path, backend, imgsz)
+    if backend == "onnx":
+        return OnnxDetector(path, threads)
+    return UltralyticsDetector(path, backend, threads)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export model pothole ke format backend inferensi")
+    ap.add_argument("--export", choices=BACKENDS[1:], required=True)
+    ap.add_argument("--model", default=os.getenv("MODEL_PATH", "best_pothole.pt"))
+    ap.add_argument("--imgsz", type=int, default=int(os.getenv("IMGSZ", "416")))
+    ap.add_argument("--force", action="store_true", help="export ulang walau cache sudah ada")
+    a = ap.parse_args()
+    try:
+        print(export_model(a.model, a.export, a.imgsz, force=a.force))
+    except Exception as e:
+        print("[ERR] Export gagal:", e)
+        sys.exit(1)
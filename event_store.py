@@ -0,0 +1,207 @@
+# event_store.py
+# Log kejadian lubang bergeotag + jejak GPS di SQLite (WAL), ramah kartu SD.
+#  - tulis hanya dari satu thread writer: antrian di-flush per batch (default 10 s)
+#    dalam SATU transaksi, jadi loop frame tidak pernah menunggu disk
+#  - journal WAL + synchronous=NORMAL: tulis berurutan, sedikit fsync
+#  - batas ukuran: kalau file > max_bytes, baris tertua dibuang (10%) lalu
+#    incremental_vacuum mengembalikan halaman kosong
+#  - query (rentang waktu / bounding box) memakai koneksi baca sendiri, tidak
+#    mengganggu writer
+import os, time, sqlite3, threading
+from collections import deque
+from contextlib import closing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hazards (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    lat REAL, lon REAL,
+    level TEXT, side TEXT,
+    confidence REAL, distance_m REAL, ttc_s REAL,
+    track_id INTEGER,
+    thumb BLOB
+);
+CREATE INDEX IF NOT EXISTS hazards_ts ON hazards(ts);
+CREATE INDEX IF NOT EXISTS hazards_pos ON hazards(lat, lon);
+CREATE TABLE IF NOT EXISTS track (
+    ts REAL NOT NULL,
+    lat REAL NOT NULL, lon REAL NOT NULL,
+    speed_kmh REAL
+);
+CREATE INDEX IF NOT EXISTS track_ts ON track(ts);
+"""
+
+def parse_bbox(text):
+    """'minlon,minlat,maxlon,maxlat' -> tuple float, atau None."""
+    if not text:
+        return None
+    try:
+        x1, y1, x2, y2 = (float(v) for v in text.split(","))
+    except Exception:
+        raise ValueError("bbox harus 'minlon,minlat,maxlon,maxlat'")
+    return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+class EventStore:
+    def __init__(self, path, max_bytes=64 << 20, flush_s=10.0, max_queue=20000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_s = flush_s
+        self.q = deque()
+        self.max_queue = max_queue
+        self.cond = threading.Condition()
+        self.counts = {"hazards": 0, "fixes": 0, "flushes": 0, "pruned": 0, "queue_dropped": 0, "errors": 0}
+        self.last_flush_ms = None
+        self._stop = False
+        self._db = None          # koneksi milik thread writer
+        self._thread = None
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def start(self):
+        d = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(d, exist_ok=True)
+        with closing(sqlite3.connect(self.path, isolation_level=None)) as db:
+            # auto_vacuum harus di-set sebelum WAL aktif dan sebelum tabel pertama dibuat
+            db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+        return self
+
+    # ---- tulis (non-blocking, dipanggil dari thread mana pun) ----
+    def _put(self, item):
+        with self.cond:
+            if len(self.q) >= self.max_queue:
+                self.q.popleft()
+                self.counts["queue_dropped"] += 1
+            self.q.append(item)
+
+    def log_hazard(self, ts, lat, lon, level, side, confidence, distance_m, ttc_s, track_id=None, thumb=None):
+        self._put(("h", (ts, lat, lon, level, side, confidence, distance_m, ttc_s, track_id, thumb)))
+
+    def log_fix(self, ts, lat, lon, speed_kmh):
+        self._put(("t", (ts, lat, lon, speed_kmh)))
+
+    # ---- writer ----
+    def _writer(self):
+        self._db = self._connect()
+        while not self._stop:
+            with self.cond:
+                self.cond.wait(self.flush_s)
+            self._flush()
+        self._flush()
+        self._db.close()
+
+    def _flush(self):
+        with self.cond:
+            items, self.q = self.q, deque()
+        if not items:
+            return
+        t0 = time.perf_counter()
+        hz = [v for k, v in items if k == "h"]
+        tr = [v for k, v in items if k == "t"]
+        try:
+            db = self._db
+            db.execute("BEGIN")
+            if hz:
+                db.executemany("INSERT INTO hazards (ts, lat, lon, level, side, confidence, distance_m, ttc_s,"
+                               " track_id, thumb) VALUES (?,?,?,?,?,?,?,?,?,?)", hz)
+            if tr:
+                db.executemany("INSERT INTO track (ts, lat, lon, speed_kmh) VALUES (?,?,?,?)", tr)
+            db.execute("COMMIT")
+            self.counts["hazards"] += len(hz)
+            self.counts["fixes"] += len(tr)
+            self.counts["flushes"] += 1
+            self._enforce_cap()
+        except Exception as e:
+            self.counts["errors"] += 1
+            print("[WARN] event store gagal flush:", e)
+            try:
+                self._db.execute("ROLLBACK")
+            except Exception:
+                pass
+        self.last_flush_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    def size_bytes(self):
+        total = 0
+        for p in (self.path, self.path + "-wal"):
+            try:
+                total += os.path.getsize(p)
+            except OSError:
+                pass
+        return total
+
+    def _enforce_cap(self):
+        if self.size_bytes() <= self.max_bytes:
+            return
+        db = self._db
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        for _ in range(10):
+            if self.size_bytes() <= self.max_bytes * 0.9:
+                break
+            n = 0
+            for table in ("track", "hazards"):
+                cnt = db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                k = max(1, cnt // 10)
+                if cnt:
+                    db.execute(f"DELETE FROM {table} WHERE rowid IN "
+                               f"(SELECT rowid FROM {table} ORDER BY ts LIMIT ?)", (k,))
+                    n += k
+            if not n:
+                break
+            self.counts["pruned"] += n
+            db.executescript("PRAGMA incremental_vacuum;")   # execute() hanya membebaskan 1 halaman
+            db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ---- query (koneksi baca per panggilan; aman dari thread request mana pun) ----
+    def _where(self, since, until, bbox):
+        cond, args = [], []
+        if since is not None:
+            cond.append("ts >= ?"); args.append(since)
+        if until is not None:
+            cond.append("ts <= ?"); args.append(until)
+        if bbox is not None:
+            cond.append("lon BETWEEN ? AND ? AND lat BETWEEN ? AND ?")
+            args += [bbox[0], bbox[2], bbox[1], bbox[3]]
+        return (" WHERE " + " AND ".join(cond)) if cond else "", args
+
+    def hazards(self, since=None, until=None, bbox=None, limit=1000):
+        w, args = self._where(since, until, bbox)
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT id, ts, lat, lon, level, side, confidence, distance_m, ttc_s, track_id,"
+                              f" thumb IS NOT NULL FROM hazards{w} ORDER BY ts DESC LIMIT ?",
+                              args + [limit]).fetchall()
+        keys = ("id", "ts", "lat", "lon", "level", "side", "confidence", "distance_m", "ttc_s", "track_id", "thumb")
+        return [dict(zip(keys, r), thumb=bool(r[-1])) for r in rows]
+
+    def thumb(self, hazard_id):
+        with closing(self._connect()) as db:
+            r = db.execute("SELECT thumb FROM hazards WHERE id = ?", (hazard_id,)).fetchone()
+        return r[0] if r else None
+
+    def track(self, since=None, until=None, bbox=None, limit=20000):
+        w, args = self._where(since, until, bbox)
+        with closing(self._connect()) as db:
+            rows = db.execute(f"SELECT ts, lat, lon, speed_kmh FROM track{w} ORDER BY ts DESC LIMIT ?",
+                              args + [limit]).fetchall()
+        rows.reverse()
+        return rows
+
+    def stats(self):
+        with self.cond:
+            pending = len(self.q)
+        return dict(self.counts, pending=pending, size_bytes=self.size_bytes(), max_bytes=self.max_bytes,
+                    last_flush_ms=self.last_flush_ms)
+
+    def close(self, timeout=5.0):
+        """Flush sisa antrian lalu tutup (dipanggil saat shutdown)."""
+        self._stop = True
+        with self.cond:
+            self.cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
@@ -0,0 +1,125 @@
+# fusion.py
+# Estimator bahaya gabungan: track YOLO + jarak ultrasonik + kecepatan GPS.
+# Tiap sensor memanggil update_*() saat punya data baru; state bahaya dihitung
+# ulang secara inkremental (murah) dan disimpan sebagai dict baru, jadi pembaca
+# (render, /metrics) cukup mengambil referensi tanpa lock.
+#
+# Keluaran per update: level (ok|caution|danger), side (kiri|kanan|depan|None),
+# ttc_s (time-to-contact), confidence, cause (range|vision: pemicu danger), plus sumber yang dipakai.
+# Danger dari ultrasonik selalu side "depan": sisi track kamera belum tentu benda yang sama.
+import time, threading
+
+class HazardFusion:
+    def __init__(self, warn1=1.5, warn2=0.5, ttc_caution=2.5, ttc_danger=1.0, lead_s=0.5,
+                 min_conf=0.35, vision_ttl=0.5, range_ttl=0.5, gps_ttl=3.0, on_hazard=None):
+        self.warn1, self.warn2 = warn1, warn2
+        self.ttc_caution, self.ttc_danger = ttc_caution, ttc_danger
+        self.lead_s = lead_s
+        self.min_conf = min_conf
+        self.vision_ttl, self.range_ttl, self.gps_ttl = vision_ttl, range_ttl, gps_ttl
+        self.on_hazard = on_hazard      # dipanggil (hazard) setiap selesai update
+        self.lock = threading.Lock()
+        self._vis = None     # (t, side, conf, y2n, approach) track terdekat
+        self._rng = None     # (t, d, closing)
+        self._gps = None     # (t, speed_mps)
+        self.state = {"level": "ok", "side": None, "ttc_s": None, "confidence": 0.0,
+                      "distance_m": None, "sources": [], "cause": None}
+
+    # ---- masukan sensor ----
+    def update_vision(self, side, conf, y2n, approach, t=None):
+        """side: kiri|kanan|None (tengah); y2n: tepi bawah box (0..1); approach: tinggi-frame/s."""
+        t = time.perf_counter() if t is None else t
+        with self.lock:
+            self._vis = (t, side, conf, y2n, approach) if conf is not None else None
+            st = self._recompute(t)
+        self._emit(st)
+
+    def clear_vision(self, t=None):
+        t = time.perf_counter() if t is None else t
+        with self.lock:
+            if self._vis is None:
+                return
+            self._vis = None
+            st = self._recompute(t)
+        self._emit(st)
+
+    def update_range(self, d, closing, t=None):
+        t = time.perf_counter() if t is None else t
+        with self.lock:
+            self._rng = (t, d, closing)
+            st = self._recompute(t)
+        self._emit(st)
+
+    def update_gps(self, speed_kmh, t=None):
+        t = time.perf_counter() if t is None else t
+        with self.lock:
+            self._gps = (t, None if speed_kmh is None else speed_kmh / 3.6)
+            # kecepatan saja tidak mengubah keputusan sampai sensor lain melapor
+
+    # ---- inti ----
+    def _recompute(self, now):
+        vis = self._vis if self._vis and now - self._vis[0] <= self.vision_ttl else None
+        rng = self._rng if self._rng and now - self._rng[0] <= self.range_ttl else None
+        gps = self._gps if self._gps and now - self._gps[0] <= self.gps_ttl else None
+        walk = gps[1] if gps and gps[1] is not None else 0.0
+
+        sources, ttcs = [], []
+        ttc_vis = None
+        d = None
+        range_conf = 0.0
+        if rng:
+            sources.append("range")
+            d, closing = rng[1], rng[2]
+            # objek diam (lubang/halangan): laju mendekat minimal = kecepatan jalan
+            v = max(closing, walk)
+            if v > 0.05:
+                ttcs.append(max(0.0, d - self.warn2 * 0.5) / v)
+            range_conf = 0.9 if d < self.warn1 else 0.0
+
+        side, vis_conf = None, 0.0
+        if vis:
+            sources.append("vision")
+            _, side, vis_conf, y2n, approach = vis
+            if approach and approach > 0.02:
+                ttc_vis = max(0.0, 1.0 - y2n) / approach
+                ttcs.append(ttc_vis)
+        if gps:
+            sources.append("gps")
+
+        ttc = min(ttcs) if ttcs else None
+        conf = 1.0 - (1.0 - vis_conf) * (1.0 - range_conf)
+
+        level, cause = "ok", None
+        if d is not None and (d < self.warn2 or d - max(0.0, rng[2]) * self.lead_s < self.warn2):
+            level, cause = "danger", "range"
+        elif ttc is not None and ttc < self.ttc_danger and conf >= self.min_conf:
+            # TTC terkecil dari track kamera -> danger milik track itu (sisinya berlaku)
+            level, cause = "danger", ("vision" if ttc_vis is not None and ttc_vis <= ttc else "range")
+        elif (d is not None and d < self.warn1) or (ttc is not None and ttc < self.ttc_caution):
+            level = "caution"
+
+        if level == "danger" and (cause == "range" or side is None):
+            side = "depan"
+        self.state = {"level": level, "side": side, "ttc_s": (None if ttc is None else round(ttc, 2)),
+                      "confidence": round(conf, 3), "distance_m": d, "sources": sources, "cause": cause}
+        return self.state
+
+    def _emit(self, st):
+        if self.on_hazard:
+            self.on_hazard(st)
+
+    def hazard(self):
+        return self.state
+
+    def alert_kind(self, h=None):
+        """Jenis alert untuk state bahaya h.
+        Danger dipicu track kamera di kiri/kanan -> 'bahaya_kiri'/'bahaya_kanan' (jenis sendiri:
+        prioritas, deadline dan cooldown danger, bukan milik alert arah); danger lain -> 'depan'.
+        Caution: arah hanya kalau cukup yakin."""
+        h = self.state if h is None else h
+        side = h["side"] if h["side"] in ("kiri", "kanan") else None
+        if h["level"] == "danger":
+            return "bahaya_" + side if (side and h.get("cause") == "vision") else "depan"
+        if side and h["confidence"] >= self.min_conf:
+            return side
+        return None
@@ -0,0 +1,287 @@
+# gps.py
+# Ingest GPS NMEA: baca serial per blok, parse cepat, ring buffer fix.
+#  - read(in_waiting) per blok, bukan readline() per baris
+#  - parser tanpa pynmea2: cek checksum, ambil tipe dari header ($xxRMC, talker bebas)
+#    dan HANYA parse RMC/GGA/VTG/GSA; kalimat lain (GSV, GLL, TXT, ...) dilewati murah
+#  - fix dikeluarkan saat RMC datang; kualitas (fix, satelit, HDOP/PDOP) dan VTG hanya dipakai
+#    dari epoch yang sama (UTC sama; GSA/VTG tanpa waktu ikut UTC kalimat sebelumnya), dan fix
+#    terakhir di-patch kalau kalimat epoch yang sama datang belakangan
+#  - ring buffer ukuran tetap berisi fix terbaru (dict immutable per fix) untuk fusion,
+#    event log, peringatan dini dan dashboard
+#  - PMTK: naikkan update rate (5–10 Hz) dan baud, batasi output kalimat (receiver MTK;
+#    receiver lain mengabaikan perintah ini)
+#  - ReplaySerial: pengganti port serial dari file NMEA untuk uji/replay
+import time, threading
+from collections import deque
+
+KNOT_KMH = 1.852
+WANTED = {b"RMC", b"GGA", b"VTG", b"GSA"}
+NO_QUALITY = {"fix_quality": None, "sats": None, "hdop": None, "pdop": None, "fix_mode": None, "alt_m": None}
+
+def nmea_checksum(body:bytes):
+    c = 0
+    for b in body:
+        c ^= b
+    return c
+
+def pmtk(cmd:str):
+    """'PMTK220,200' -> b'$PMTK220,200*2C\\r\\n'"""
+    return b"$%s*%02X\r\n" % (cmd.encode(), nmea_checksum(cmd.encode()))
+
+def _coord(v:bytes, hemi:bytes):
+    if not v:
+        return None
+    x = float(v)
+    deg = int(x / 100)
+    val = deg + (x - deg * 100) / 60.0
+    return -val if hemi in (b"S", b"W") else val
+
+def _f(v:bytes):
+    return float(v) if v else None
+
+def parse_sentence(line:bytes):
+    """Satu baris NMEA (tanpa CRLF) -> (tipe, fields) atau None kalau dilewati/rusak.
+    Raise ValueError kalau checksum salah."""
+    if len(line) < 7 or line[0:1] != b"$":
+        return None
+    typ = line[3:6]
+    if typ not in WANTED:
+        return None
+    star = line.rfind(b"*")
+    if star > 0:
+        if line[star+1:star+3].upper() != b"%02X" % nmea_checksum(line[1:star]):
+            raise ValueError("checksum")
+        line = line[:star]
+    return typ, line.split(b",")
+
+class GpsRing:
+    def __init__(self, maxlen=600):
+        self.q = deque(maxlen=maxlen)
+        self.lock = threading.Lock()
+
+    def append(self, fix):
+        with self.lock:
+            self.q.append(fix)
+
+    def patch_last(self, utc, **kw):
+        with self.lock:
+            if self.q and self.q[-1]["utc"] == utc:
+                self.q[-1] = dict(self.q[-1], **kw)
+
+    def latest(self):
+        with self.lock:
+            return self.q[-1] if self.q else None
+
+    def recent(self, n=None, since=None):
+        """Fix terbaru (maks n, atau yang t >= since), urut lama -> baru."""
+        with self.lock:
+            items = list(self.q)
+        if since is not None:
+            items = [f for f in items if f["t"] >= since]
+        return items[-n:] if n else items
+
+    def __len__(self):
+        return len(self.q)
+
+class GpsReader:
+    def __init__(self, ser, ring=None, on_fix=None, on_error=None, chunk=512):
+        self.ser = ser
+        self.ring = ring if ring is not None else GpsRing()
+        self.on_fix = on_fix
+        self.on_error = on_error      # on_error(jenis): "read" / "checksum" / "parse"
+        self.chunk = chunk
+        self.quality = dict(NO_QUALITY)
+        self._q_utc = None            # epoch asal self.quality
+        self._utc = None              # UTC kalimat bertanggal terakhir (RMC/GGA) = epoch berjalan
+        self.counts = {"bytes": 0, "sentences": 0, "parsed": 0, "skipped": 0, "checksum": 0, "errors": 0,
+                       "fixes": 0}
+        self._last_vtg = None
+        self._stop = False
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def close(self):
+        self._stop = True
+
+    def run(self):
+        buf = b""
+        while not self._stop:
+            try:
+                data = self.ser.read(max(1, min(self.chunk, getattr(self.ser, "in_waiting", 0) or 1)))
+            except Exception:
+                self._error("read")
+                time.sleep(0.2)
+                continue
+            if not data:
+                continue
+            self.counts["bytes"] += len(data)
+            buf += data
+            *lines, buf = buf.split(b"\n")
+            if len(buf) > 4096:       # sampah tanpa newline
+                buf = b""
+            for ln in lines:
+                self.feed_line(ln.strip())
+
+    def feed_line(self, line:bytes):
+        if not line:
+            return
+        self.counts["sentences"] += 1
+        try:
+            p = parse_sentence(line)
+        except ValueError:
+            self._error("checksum")
+            return
+        if p is None:
+            self.counts["skipped"] += 1
+            return
+        typ, f = p
+        try:
+            getattr(self, "_" + typ.decode().lower())(f)
+            self.counts["parsed"] += 1
+        except (ValueError, IndexError):
+            self._error("parse")
+
+    def _error(self, kind):
+        self.counts["checksum" if kind == "checksum" else "errors"] += 1
+        if self.on_error:
+            self.on_error(kind)
+
+    # ---- per kalimat ----
+    def _epoch(self, utc):
+        """Kalimat bertanggal: epoch baru -> kualitas epoch lama tidak dibawa."""
+        self._utc = utc
+        if utc != self._q_utc:
+            self.quality = dict(NO_QUALITY)
+            self._q_utc = utc
+
+    def _gga(self, f):
+        utc = f[1].decode() or None
+        self._epoch(utc)
+        q = self.quality
+        q["fix_quality"] = int(f[6]) if f[6] else 0
+        q["sats"] = int(f[7]) if f[7] else None
+        q["hdop"] = _f(f[8])
+        q["alt_m"] = _f(f[9])
+        self.ring.patch_last(utc, fix_quality=q["fix_quality"], sats=q["sats"], hdop=q["hdop"], alt_m=q["alt_m"])
+
+    def _gsa(self, f):
+        # GSA tanpa waktu: milik epoch kalimat RMC/GGA sebelumnya
+        if self._utc != self._q_utc:
+            return
+        self.quality["fix_mode"] = int(f[2]) if f[2] else None     # 1 = tidak ada, 2 = 2D, 3 = 3D
+        self.quality["pdop"] = _f(f[15]) if len(f) > 15 else None
+        self.ring.patch_last(self._utc, fix_mode=self.quality["fix_mode"], pdop=self.quality["pdop"])
+
+    def _vtg(self, f):
+        # course & kecepatan dari VTG dipakai kalau RMC kosong (beberapa modul mengisinya lebih cepat);
+        # VTG tanpa waktu -> ditandai epoch berjalan, dan mengisi fix epoch itu yang sudah keluar
+        course, spd = _f(f[1]), _f(f[7])
+        self._last_vtg = (self._utc, course, spd)
+        last = self.ring.latest()
+        if last is not None and last["utc"] == self._utc and self._utc is not None:
+            kw = {}
+            if last["speed_kmh"] is None and spd is not None:
+                kw["speed_kmh"] = spd
+            if last["heading"] is None and course is not None:
+                kw["heading"] = course
+            if kw:
+                self.ring.patch_last(self._utc, **kw)
+
+    def _rmc(self, f):
+        utc = f[1].decode() or None
+        self._epoch(utc)
+        valid = f[2] == b"A"
+        lat, lon = _coord(f[3], f[4]), _coord(f[5], f[6])
+        vtg = self._last_vtg if (self._last_vtg and utc is not None and self._last_vtg[0] == utc) else None
+        spd = _f(f[7])
+        spd = spd * KNOT_KMH if spd is not None else (vtg[2] if vtg else None)
+        heading = _f(f[8])
+        if heading is None and vtg:
+            heading = vtg[1]
+        date = f[9].decode() if len(f) > 9 else ""
+        time_utc = None
+        if utc and len(date) == 6 and len(utc) >= 6:
+            time_utc = f"20{date[4:6]}-{date[2:4]}-{date[0:2]} {utc[0:2]}:{utc[2:4]}:{utc[4:6]}"
+        fix = dict(self.quality, t=time.monotonic(), utc=utc, time_utc=time_utc, lat=lat, lon=lon,
+                   speed_kmh=spd, heading=heading, valid=valid and lat is not None and lon is not None)
+        self._last_vtg = None
+        self.ring.append(fix)
+        self.counts["fixes"] += 1
+        if self.on_fix:
+            self.on_fix(fix)
+
+    def stats(self):
+        return dict(self.counts, ring=len(self.ring))
+
+def configure(ser, rate_hz=1.0, baud=None, sentences=("RMC", "VTG", "GGA", "GSA")):
+    """Kirim perintah PMTK: daftar kalimat, baud (opsional) lalu update rate.
+    9600 baud hanya cukup untuk ~5 Hz dengan 4 kalimat; untuk 10 Hz pakai baud 57600/115200."""
+    # PMTK314: GLL,RMC,VTG,GGA,GSA,GSV,... (0/1 per kalimat)
+    order = ("GLL", "RMC", "VTG", "GGA", "GSA", "GSV")
+    flags = ",".join("1" if s in sentences else "0" for s in order) + ",0,0,0,0,0,0,0,0,0,0,0,0,0"
+    ser.write(pmtk("PMTK314," + flags))
+    if baud and baud != getattr(ser, "baudrate", baud):
+        ser.write(pmtk(f"PMTK251,{baud}"))
+        ser.flush()
+        time.sleep(0.1)
+        ser.baudrate = baud
+    if rate_hz and rate_hz != 1.0:
+        ser.write(pmtk(f"PMTK220,{int(round(1000.0 / rate_hz))}"))
+
+class ReplaySerial:
+    """Pengganti serial.Serial dari file NMEA. Diberi jeda sesuai waktu RMC (dibagi speed),
+    atau secepatnya kalau speed=0. Perintah yang ditulis (PMTK) dicatat di .written."""
+    def __init__(self, path, speed=1.0, loop=True):
+        with open(path, "rb") as f:
+            self.lines = [ln.strip() + b"\r\n" for ln in f if ln.strip()]
+        self.speed = speed
+        self.loop = loop
+        self.i = 0
+        self.baudrate = 9600
+        self.written = []
+        self._pending = b""
+        self._last_utc = None
+
+    @property
+    def in_waiting(self):
+        return len(self._pending)
+
+    def _utc_s(self, line):
+        try:
+            u = line.split(b",")[1]
+            return int(u[0:2]) * 3600 + int(u[2:4]) * 60 + float(u[4:])
+        except (IndexError, ValueError):
+            return None
+
+    def read(self, n=1):
+        if not self._pending:
+            if self.i >= len(self.lines):
+                if not self.loop:
+                    time.sleep(0.1)
+                    return b""
+                self.i = 0
+                self._last_utc = None
+            line = self.lines[self.i]
+            self.i += 1
+            if self.speed and line[3:6] == b"RMC":
+                u = self._utc_s(line)
+                if u is not None:
+                    if self._last_utc is not None and u > self._last_utc:
+                        time.sleep(min(2.0, (u - self._last_utc) / self.speed))
+                    self._last_utc = u
+            self._pending = line
+        out, self._pending = self._pending[:n], self._pending[n:]
+        return out
+
+    def write(self, b):
+        self.written.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.i = len(self.lines)
+        self.loop = False
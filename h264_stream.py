@@ -0,0 +1,316 @@
+# h264_stream.py
+# Stream video H.264 dalam fragmented MP4 (fMP4) sebagai alternatif hemat bandwidth dari MJPEG.
+#  - frame yang sudah diberi overlay di-encode SEKALI per tier (low/mid/high) oleh satu
+#    thread encoder; encoder tier hanya hidup selama ada viewer di tier itu
+#  - muxer mp4 dengan movflags frag_every_frame -> tiap frame jadi satu fragmen moof+mdat,
+#    latency cuma ~1 frame; init segment (ftyp+moov) dikirim dulu ke viewer baru
+#  - bitrate adaptif per viewer: antrian penuh -> turun tier (mulai di keyframe berikut),
+#    lama lancar -> naik tier lagi. Browser memutar lewat MSE (mode 'sequence').
+#  - encoder: h264_v4l2m2m (hardware Pi 4) kalau bisa dibuka, kalau tidak libx264 ultrafast
+import io, time, struct, threading
+from collections import deque
+
+import cv2
+
+TIERS = {                     # nama -> (lebar, tinggi, bitrate bps)
+    "low":  (320, 240, 250_000),
+    "mid":  (480, 360, 500_000),
+    "high": (640, 480, 1_000_000),
+}
+ORDER = ("low", "mid", "high")
+
+class _Sink(io.RawIOBase):
+    """File tujuan muxer: kumpulkan bytes, lalu dipotong per box mp4 top-level."""
+    def __init__(self):
+        self.buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def write(self, b):
+        self.buf += b
+        return len(b)
+
+    def boxes(self):
+        """Ambil box lengkap dari buffer -> list (type, bytes)."""
+        out, i, buf = [], 0, self.buf
+        while i + 8 <= len(buf):
+            n = struct.unpack(">I", buf[i:i+4])[0]
+            if n < 8 or i + n > len(buf):
+                break
+            out.append((bytes(buf[i+4:i+8]), bytes(buf[i:i+n])))
+            i += n
+        del buf[:i]
+        return out
+
+def _codec_string(extradata):
+    # avcC: [1]=profile, [2]=compat, [3]=level -> "avc1.PPCCLL" untuk MediaSource.isTypeSupported
+    if extradata and len(extradata) >= 4 and extradata[0] == 1:
+        return "avc1.%02X%02X%02X" % (extradata[1], extradata[2], extradata[3])
+    return "avc1.42E01E"
+
+class Fmp4Encoder:
+    def __init__(self, name, width, height, bitrate, fps=15, gop=30, codec="auto"):
+        import av
+        self.name = name
+        self.width, self.height = width, height
+        self.fps = fps
+        self.init = None            # ftyp+moov
+        self.codec_str = None
+        self.bytes_out = 0
+        self.frames = 0
+        self._key_flags = deque()   # keyframe flag per paket yang fragmennya belum keluar
+        self._moof = None
+        self.force_key = False      # viewer baru menunggu keyframe -> buat sekarang, jangan tunggu GOP
+        last_err = None
+        for cname in (["h264_v4l2m2m", "libx264"] if codec == "auto" else [codec]):
+            try:
+                self._open(av, cname, bitrate, gop)
+                self.codec = cname
+                return
+            except Exception as e:
+                last_err = e
+                self.close()
+        raise RuntimeError(f"encoder H.264 tidak tersedia: {last_err}")
+
+    def _open(self, av, cname, bitrate, gop):
+        self.sink = _Sink()
+        self.container = av.open(self.sink, "w", format="mp4",
+                                 options={"movflags": "empty_moov+default_base_moof+frag_every_frame"})
+        st = self.container.add_stream(cname, rate=self.fps)
+        st.width, st.height, st.pix_fmt = self.width, self.height, "yuv420p"
+        st.bit_rate = bitrate
+        opts = {"g": str(gop), "bf": "0"}
+        if cname == "libx264":
+            opts.update(preset="ultrafast", tune="zerolatency", profile="baseline")
+        st.codec_context.options = opts
+        self.stream = st
+        self._pts = 0
+        # encode satu frame hitam supaya encoder benar-benar terbuka (v4l2m2m bisa gagal di sini)
+        import numpy as np
+        self._encode(np.zeros((self.height, self.width, 3), np.uint8))
+
+    def _encode(self, bgr):
+        import av
+        f = av.VideoFrame.from_ndarray(bgr, format="bgr24")
+        f.pts = self._pts
+        if self.force_key:
+            f.pict_type = av.video.frame.PictureType.I
+            self.force_key = False
+        self._pts += 1
+        out = []
+        for pkt in self.stream.encode(f):
+            self._key_flags.append(bool(pkt.is_keyframe))
+            self.container.mux(pkt)
+            out += self._collect()
+        return out
+
+    def _collect(self):
+        frags = []
+        for typ, data in self.sink.boxes():
+            if typ in (b"ftyp", b"moov"):
+                self.init = (self.init or b"") + data
+                if typ == b"moov":
+                    self.codec_str = _codec_string(self.stream.codec_context.extradata)
+            elif typ == b"moof":
+                self._moof = data
+            elif typ == b"mdat" and self._moof is not None:
+                key = self._key_flags.popleft() if self._key_flags else False
+                frags.append((self._moof + data, key))
+                self._moof = None
+        return frags
+
+    def encode(self, bgr):
+        """Frame BGR (ukuran bebas) -> list (fragmen bytes, is_keyframe)."""
+        if bgr.shape[1] != self.width or bgr.shape[0] != self.height:
+            bgr = cv2.resize(bgr, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        frags = self._encode(bgr)
+        self.frames += 1
+        self.bytes_out += sum(len(f) for f, _ in frags)
+        return frags
+
+    def close(self):
+        try:
+            self.container.close()
+        except Exception:
+            pass
+
+class H264Sub:
+    """Viewer fMP4. get()/pop() dipakai generator Flask maupun server async (on_data)."""
+    def __init__(self, tier, auto=True, maxlen=8, on_data=None):
+        self.tier = tier
+        self.auto = auto
+        self.q = deque()
+        self.maxlen = maxlen
+        self.cond = threading.Condition()
+        self.on_data = on_data
+        self.need_init = True
+        self.need_key = True
+        self.clean_since = time.monotonic()
+        self.dropped = 0
+        self.switches = 0
+        self.bytes_sent = 0
+
+    def _push(self, chunk):
+        with self.cond:
+            self.q.append(chunk)
+            self.cond.notify()
+        if self.on_data:
+            self.on_data()
+
+    def pop(self):
+        with self.cond:
+            if not self.q:
+                return None
+            chunk = self.q.popleft()
+        self.bytes_sent += len(chunk)
+        return chunk
+
+    def get(self, timeout=1.0):
+        with self.cond:
+            if not self.q:
+                self.cond.wait(timeout)
+        return self.pop()
+
+class H264Hub:
+    def __init__(self, fps=15, gop=30, codec="auto", queue=8, upgrade_after=10.0, default_tier="mid"):
+        self.fps = fps
+        self.gop = gop
+        self.codec = codec
+        self.queue = queue
+        self.upgrade_after = upgrade_after
+        self.default_tier = default_tier
+        self.lock = threading.Lock()
+        self.subs = set()
+        self.encoders = {}          # tier -> Fmp4Encoder (hanya tier yang ditonton)
+        self.error = None
+        self.cond = threading.Condition()
+        self._frame = None
+        self._thread = None
+        self.counts = {"frames": 0, "skipped": 0, "downgrades": 0, "upgrades": 0}
+
+    # ---- viewer ----
+    def subscribe(self, tier=None, on_data=None):
+        auto = tier in (None, "", "auto")
+        tier = self.default_tier if auto or tier not in TIERS else tier
+        sub = H264Sub(tier, auto=auto, maxlen=self.queue, on_data=on_data)
+        with self.lock:
+            self.subs.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, daemon=True)
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            self.subs.discard(sub)
+
+    def viewers(self):
+        return len(self.subs)
+
+    # ---- produsen (render thread) ----
+    def submit(self, frame):
+        """Non-blocking: encoder hanya mengambil frame terbaru; kalau lambat, frame lama dilewati."""
+        with self.cond:
+            if self._frame is not None:
+                self.counts["skipped"] += 1
+            self._frame = frame
+            self.cond.notify()
+
+    def _encoder(self, tier):
+        enc = self.encoders.get(tier)
+        if enc is None:
+            w, h, br = TIERS[tier]
+            enc = Fmp4Encoder(tier, w, h, br, fps=self.fps, gop=self.gop, codec=self.codec)
+            self.encoders[tier] = enc
+            print(f"[OK ] H.264 tier {tier} {w}x{h} @{br//1000} kbps ({enc.codec})")
+        return enc
+
+    def _worker(self):
+        period = 1.0 / max(1, self.fps)
+        t_next = 0.0
+        while True:
+            with self.cond:
+                if self._frame is None and not self.cond.wait(1.0):
+                    continue
+                frame, self._frame = self._frame, None
+            if frame is None:
+                continue
+            now = time.monotonic()
+            if now < t_next:            # batasi ke fps stream
+                continue
+            t_next = now + period * 0.9
+            with self.lock:
+                subs = list(self.subs)
+            self._adapt(subs, now)
+            tiers = {s.tier for s in subs}
+            for tier in list(self.encoders):
+                if tier not in tiers:   # tidak ada penonton -> matikan encoder tier ini
+                    self.encoders.pop(tier).close()
+            for tier in tiers:
+                try:
+                    enc = self._encoder(tier)
+                    if any(s.need_key for s in subs if s.tier == tier):
+                        enc.force_key = True
+                    frags = enc.encode(frame)
+                    self.error = None
+                except Exception as e:
+                    self.error = str(e)
+                    self.encoders.pop(tier, None)
+                    time.sleep(1.0)
+                    continue
+                for frag, key in frags:
+                    for s in subs:
+                        if s.tier == tier:
+                            self._deliver(s, enc, frag, key)
+            self.counts["frames"] += 1
+
+    def _deliver(self, sub, enc, frag, key):
+        if sub.need_key:
+            if not key:
+                return
+            sub.need_key = False
+            if sub.need_init:
+                sub.need_init = False
+                frag = enc.init + frag
+        if len(sub.q) >= sub.maxlen:
+            # viewer tertinggal: buang antrian, lanjut dari keyframe berikut
+            with sub.cond:
+                sub.q.clear()
+            sub.dropped += 1
+            sub.need_key = True
+            sub.clean_since = time.monotonic()
+            if sub.auto and ORDER.index(sub.tier) > 0:
+                sub.tier = ORDER[ORDER.index(sub.tier) - 1]
+                sub.need_init = True
+                sub.switches += 1
+                self.counts["downgrades"] += 1
+            return
+        sub._push(frag)
+
+    def _adapt(self, subs, now):
+        for s in subs:
+            if (s.auto and not s.need_key and now - s.clean_since >= self.upgrade_after
+                    and ORDER.index(s.tier) < len(ORDER) - 1):
+                s.tier = ORDER[ORDER.index(s.tier) + 1]
+                s.need_init = s.need_key = True
+                s.clean_since = now
+                s.switches += 1
+                self.counts["upgrades"] += 1
+
+    def codec_string(self, tier=None):
+        enc = self.encoders.get(tier or self.default_tier)
+        return (enc.codec_str if enc else None) or "avc1.42E01E"
+
+    def stats(self):
+        with self.lock:
+            subs = list(self.subs)
+        return dict(self.counts, viewers=len(subs), error=self.error,
+                    encoders={t: {"codec": e.codec, "frames": e.frames,
+                                  "kbps": (round(e.bytes_out * 8 / 1000 / max(1, e.frames) * self.fps, 1))}
+                              for t, e in list(self.encoders.items())},
+                    clients=[{"tier": s.tier, "auto": s.auto, "dropped": s.dropped, "switches": s.switches,
+                              "sent_kb": round(s.bytes_sent / 1024)} for s in subs])
@@ -0,0 +1,122 @@
+# hazard_index.py
+# Indeks spasial lubang yang sudah pernah terkonfirmasi, untuk peringatan dini berbasis GPS.
+#  - grid hash: sel ~cell_m meter (lat/lon dikuantisasi ke integer) -> list titik;
+#    query radius cuma memeriksa sel tetangga, jadi puluhan ribu titik tetap < 1 ms
+#  - titik yang berdekatan (< merge_m) digabung jadi satu lubang dengan hitungan sighting;
+#    baris berturut-turut dalam pass_s detik (satu kali lewat, track hilang lalu muncul lagi)
+#    dihitung satu sighting
+#  - ahead(): lubang terdekat di dalam kerucut arah jalan, dengan jarak & ETA
+#  - sumber: events.db (tabel hazards) dan/atau file CSV lat,lon[,side]
+import math, csv, sqlite3, threading
+from contextlib import closing
+
+M_PER_DEG = 111_320.0
+
+class HazardIndex:
+    def __init__(self, cell_m=25.0, merge_m=4.0, pass_s=300.0):
+        self.cell_m = cell_m
+        self.merge_m = merge_m
+        self.pass_s = pass_s
+        self.dlat = cell_m / M_PER_DEG
+        self.lock = threading.Lock()
+        self.cells = {}          # (iy, ix) -> list [lat, lon, sightings, side, id, ts terakhir]
+        self.n = 0
+
+    def _dlon(self, lat):
+        return self.cell_m / (M_PER_DEG * max(0.01, math.cos(math.radians(lat))))
+
+    def _key(self, lat, lon):
+        # lebar sel bujur dihitung dari lintang sel (bukan titik) supaya konsisten antar tetangga
+        iy = int(math.floor(lat / self.dlat))
+        return iy, int(math.floor(lon / self._dlon((iy + 0.5) * self.dlat)))
+
+    @staticmethod
+    def _offset_m(lat0, lon0, lat, lon):
+        """Equirectangular: cukup akurat untuk jarak puluhan meter. -> (timur, utara) meter."""
+        return ((lon - lon0) * M_PER_DEG * math.cos(math.radians(lat0)), (lat - lat0) * M_PER_DEG)
+
+    def _near(self, lat, lon, radius_m):
+        # lebar sel bujur berbeda tiap baris, jadi rentang kolom dihitung per baris dari lebar
+        # baris itu sendiri (bukan indeks kolom baris titik query)
+        rlat = radius_m / M_PER_DEG
+        rlon = radius_m / (M_PER_DEG * max(0.01, math.cos(math.radians(lat))))   # sama dengan _offset_m
+        for iy in range(int(math.floor((lat - rlat) / self.dlat)), int(math.floor((lat + rlat) / self.dlat)) + 1):
+            w = self._dlon((iy + 0.5) * self.dlat)
+            for ix in range(int(math.floor((lon - rlon) / w)), int(math.floor((lon + rlon) / w)) + 1):
+                yield from self.cells.get((iy, ix), ())
+
+    def add(self, lat, lon, side=None, count=1, ts=None):
+        """Tambah sighting (count kali); digabung ke lubang terdekat kalau < merge_m.
+        Dengan ts: kurang dari pass_s sejak baris terakhir lubang itu = lintasan yang sama,
+        tidak menambah hitungan (ts harus urut naik)."""
+        if lat is None or lon is None:
+            return None
+        with self.lock:
+            for p in self._near(lat, lon, self.merge_m):
+                e, n = self._offset_m(lat, lon, p[0], p[1])
+                if e * e + n * n <= self.merge_m ** 2:
+                    last, p[5] = p[5], (ts if ts is not None else p[5])
+                    if ts is not None and last is not None and ts - last < self.pass_s:
+                        return p[4]
+                    k = p[2]
+                    p[0], p[1] = (p[0] * k + lat * count) / (k + count), (p[1] * k + lon * count) / (k + count)
+                    p[2] = k + count
+                    return p[4]
+            self.n += 1
+            self.cells.setdefault(self._key(lat, lon), []).append([lat, lon, count, side, self.n, ts])
+            return self.n
+
+    def ahead(self, lat, lon, heading=None, speed_mps=0.0, radius_m=30.0, cone_deg=35.0,
+              min_sightings=1, exclude=()):
+        """Lubang terdekat di depan -> dict (id, jarak, bearing relatif, eta) atau None.
+        heading None (diam / belum ada course) -> semua arah dalam radius."""
+        best = None
+        with self.lock:
+            for p in self._near(lat, lon, radius_m):
+                if p[2] < min_sightings or p[4] in exclude:
+                    continue
+                e, n = self._offset_m(lat, lon, p[0], p[1])
+                d = math.hypot(e, n)
+                if d > radius_m:
+                    continue
+                rel = None
+                if heading is not None:
+                    rel = (math.degrees(math.atan2(e, n)) - heading + 540.0) % 360.0 - 180.0
+                    if abs(rel) > cone_deg:
+                        continue
+                if best is None or d < best["distance_m"]:
+                    best = {"id": p[4], "lat": p[0], "lon": p[1], "distance_m": round(d, 1),
+                            "rel_bearing": (None if rel is None else round(rel, 1)), "sightings": p[2],
+                            "side": p[3], "eta_s": (round(d / speed_mps, 1) if speed_mps > 0.3 else None)}
+        return best
+
+    # ---- muat ----
+    def load_sqlite(self, path):
+        """Muat dari tabel hazards events.db; file/tabel belum ada -> 0.
+        Hanya baris dengan track kamera (track_id): baris lama dari ultrasonik saja bukan lubang."""
+        try:
+            with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as db:
+                rows = db.execute("SELECT lat, lon, side, ts FROM hazards WHERE lat IS NOT NULL AND lon IS NOT NULL"
+                                  " AND track_id IS NOT NULL ORDER BY ts").fetchall()
+        except sqlite3.Error:
+            return 0
+        for lat, lon, side, ts in rows:
+            self.add(lat, lon, side, ts=ts)
+        return len(rows)
+
+    def load_csv(self, path, count=1):
+        """Peta kurasi lat,lon[,side]; tiap baris dihitung count sighting."""
+        n = 0
+        with open(path, newline="") as f:
+            for r in csv.DictReader(f):
+                try:
+                    self.add(float(r["lat"]), float(r["lon"]), r.get("side") or None, count)
+                    n += 1
+                except (KeyError, ValueError):
+                    continue
+        return n
+
+    def stats(self):
+        with self.lock:
+            return {"hazards": sum(len(c) for c in self.cells.values()), "cells": len(self.cells),
+                    "cell_m": self.cell_m}
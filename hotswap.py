@@ -0,0 +1,104 @@
+# hotswap.py
+# Konfigurasi berversi + slot model ganda untuk ganti model/parameter tanpa restart.
+#  - ConfigStore: snapshot dict baru tiap perubahan (tidak pernah dimutasi); pipeline
+#    mengambil .cur SEKALI per frame, jadi CONF/IMGSZ/PROCESS_EVERY_N selalu konsisten
+#    dalam satu frame walau /set atau kontroler adaptif mengubahnya bersamaan
+#  - ModelSlot: model aktif + slot cadangan; model baru di-load dan di-warm-up (inferensi
+#    dummy di IMGSZ target) di thread background, lalu referensi ditukar -> frame berikutnya
+#    memakai model baru, tanpa jeda alert. Model lama ditutup setelah masa tenggang.
+import time, threading
+from collections import deque
+import numpy as np
+
+class ConfigStore:
+    def __init__(self, **initial):
+        self.lock = threading.Lock()
+        self.cur = dict(initial, version=1, source="env", t=time.time())
+        self.history = deque(maxlen=20)
+
+    def update(self, source="api", **kw):
+        """Ganti sebagian nilai -> snapshot baru (versi +1); tanpa perubahan -> snapshot lama."""
+        with self.lock:
+            changes = {k: v for k, v in kw.items() if self.cur.get(k) != v}
+            if not changes:
+                return self.cur
+            self.cur = dict(self.cur, **changes, version=self.cur["version"] + 1, source=source, t=time.time())
+            self.history.append({"version": self.cur["version"], "source": source, "changes": changes,
+                                 "t": self.cur["t"]})
+            return self.cur
+
+class ModelSlot:
+    def __init__(self, loader, grace_s=3.0):
+        self.loader = loader             # loader(path, backend) -> detector
+        self.grace_s = grace_s
+        self.lock = threading.Lock()
+        self.active = None
+        self.info = {"version": 0, "path": None, "backend": None, "loaded_at": None, "load_ms": None,
+                     "warmup_ms": None}
+        self.pending = None              # status load yang sedang berjalan / gagal terakhir
+
+    def install(self, model, path, backend, load_ms=None, warmup_ms=None):
+        """Pasang model langsung (dipakai replay / load awal). Return info versi baru."""
+        with self.lock:
+            old = self.active
+            self.active = model
+            self.info = {"version": self.info["version"] + 1, "path": path, "backend": backend,
+                         "loaded_at": time.time(), "load_ms": load_ms, "warmup_ms": warmup_ms,
+                         "fixed_imgsz": getattr(model, "fixed_imgsz", None)}
+            return self.info, old
+
+    @staticmethod
+    def warmup(model, imgsz, shapes):
+        """Inferensi dummy di ukuran target (dan batch sebanyak kamera) -> ms."""
+        t0 = time.perf_counter()
+        frames = [np.zeros(s, np.uint8) for s in shapes]
+        size = getattr(model, "fixed_imgsz", None) or imgsz
+        model.detect(frames[0], size, 0.99)
+        if len(frames) > 1:
+            model.detect_batch(frames, size, 0.99)
+        return round((time.perf_counter() - t0) * 1000.0)
+
+    def load_now(self, path, backend, imgsz, shapes):
+        """Load + warm-up + pasang (blocking). Return info."""
+        t0 = time.perf_counter()
+        model = self.loader(path, backend)
+        load_ms = round((time.perf_counter() - t0) * 1000.0)
+        if self.pending is not None:
+            self.pending.update(state="warmup", load_ms=load_ms)
+        warm = self.warmup(model, imgsz, shapes)
+        info, old = self.install(model, path, backend, load_ms, warm)
+        if old is not None:
+            threading.Thread(target=self._retire, args=(old,), daemon=True).start()
+        return info
+
+    def load_async(self, path, backend, imgsz, shapes, on_done=None):
+        """Load di background; model aktif tetap jalan sampai model baru siap."""
+        with self.lock:
+            if self.pending is not None and self.pending["state"] in ("loading", "warmup"):
+                raise RuntimeError("model lain sedang di-load")
+            self.pending = {"state": "loading", "path": path, "backend": backend, "started": time.time(),
+                            "error": None}
+        def run():
+            try:
+                info = self.load_now(path, backend, imgsz, shapes)
+                self.pending.update(state="done", version=info["version"])
+                if on_done:
+                    on_done(info, None)
+            except Exception as e:
+                self.pending.update(state="failed", error=str(e))
+                if on_done:
+                    on_done(None, e)
+        threading.Thread(target=run, daemon=True).start()
+        return self.pending
+
+    def _retire(self, old):
+        # frame yang sedang jalan mungkin masih memegang model lama
+        time.sleep(self.grace_s)
+        if hasattr(old, "close"):
+            try:
+                old.close()
+            except Exception:
+                pass
+
+    def status(self):
+        return {"active": self.info, "pending": (dict(self.pending) if self.pending else None)}
@@ -0,0 +1,262 @@
+# infer_proc.py
+# Inferensi YOLO di proses terpisah (INFER_PROC=N worker), supaya pre/post-processing model
+# tidak memegang GIL proses utama (sensor ultrasonik, GPS, HR, request Flask).
+#  - frame dikirim lewat slot multiprocessing.shared_memory (satu memcpy, tanpa pickle);
+#    yang lewat antrian hanya (id, slot, shape, imgsz, conf)
+#  - hasil dikirim balik sebagai array float32 Nx5 (x1,y1,x2,y2,conf) per frame
+#  - N worker mengambil dari satu antrian request; detect_batch() dengan >1 frame dibagi
+#    ke beberapa worker sekaligus
+#  - worker mati -> request yang sedang dikerjakannya langsung gagal, worker dijalankan ulang
+#  - request timeout -> pemanggil langsung dapat error, tapi slotnya baru dibebaskan saat hasil
+#    aslinya datang atau workernya mati (worker mungkin masih membaca frame di slot itu)
+#  - proses utama mati mendadak (SIGKILL/OOM) -> worker keluar sendiri dalam ~1 s
+#  - antarmuka sama dengan detector.py (detect, detect_batch, fixed_imgsz), jadi pipeline
+#    tidak perlu tahu model jalan di proses lain
+import os, time, queue, itertools, threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+def _worker(wid, model_path, backend, imgsz, threads, req_q, res_q, busy):
+    try:
+        from detector import load_detector
+        model = load_detector(model_path, backend, imgsz, threads)
+    except Exception as e:
+        res_q.put(("error", wid, repr(e), None))
+        return
+    res_q.put(("ready", wid, model.fixed_imgsz, os.getpid()))
+    shms = {}            # slot -> SharedMemory (nama bisa berganti kalau slot diperbesar)
+    parent, ppid = mp.parent_process(), os.getppid()
+    while True:
+        try:
+            req = req_q.get(timeout=1.0)
+        except queue.Empty:
+            # proses utama di-SIGKILL / OOM: daemon=True tidak menolong, keluar sendiri
+            if os.getppid() != ppid or (parent is not None and not parent.is_alive()):
+                break
+            continue
+        if req is None:
+            break
+        rid, items, imgsz, conf = req
+        busy.value = rid
+        try:
+            frames = []
+            for slot, name, shape in items:
+                shm = shms.get(slot)
+                if shm is None or shm.name != name:
+                    if shm is not None:
+                        try:
+                            shm.close()
+                        except BufferError:
+                            pass
+                    shm = shms[slot] = shared_memory.SharedMemory(name=name)
+                frames.append(np.ndarray(shape, np.uint8, buffer=shm.buf))
+            t0 = time.perf_counter()
+            out = model.detect_batch(frames, imgsz, conf) if len(frames) > 1 else [model.detect(frames[0], imgsz, conf)]
+            ms = (time.perf_counter() - t0) * 1000.0
+            del frames
+            res_q.put((rid, [np.asarray(b, np.float32).reshape(-1, 5) for b in out], None, ms))
+        except Exception as e:
+            res_q.put((rid, None, repr(e), None))
+        busy.value = -1
+
+class _Pending:
+    __slots__ = ("event", "result", "error", "slots", "t0", "abandoned")
+
+    def __init__(self, slots):
+        self.event = threading.Event()
+        self.result = self.error = None
+        self.slots = slots
+        self.abandoned = False     # penunggu sudah menyerah (timeout); tetap di pending sampai slot aman
+        self.t0 = time.perf_counter()
+
+class ProcDetector:
+    def __init__(self, model_path, backend="torch", imgsz=416, threads=0, workers=1, slots=4,
+                 slot_bytes=640 * 480 * 3, timeout=2.0, load_timeout=600.0):
+        self.path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+        self.threads = max(1, (threads or (os.cpu_count() or 4)) // max(1, workers))
+        self.timeout = timeout
+        self.fixed_imgsz = None
+        self.ctx = mp.get_context("spawn")    # fork + thread/OpenCV/torch = rawan deadlock
+        self.req_q = self.ctx.Queue()
+        self.res_q = self.ctx.Queue()
+        self.lock = threading.Lock()
+        self.shms = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(max(2, slots))]
+        self.free = queue.Queue()
+        for i in range(len(self.shms)):
+            self.free.put(i)
+        self.pending = {}
+        self._ids = itertools.count(1)
+        self.procs = [None] * max(1, workers)
+        self.busy = [self.ctx.Value("q", -1) for _ in self.procs]
+        self.ready = [False] * len(self.procs)
+        self.counts = {"requests": 0, "frames": 0, "errors": 0, "timeouts": 0, "restarts": 0, "slot_grow": 0}
+        self.infer_ms = self.ipc_ms = 0.0
+        self._closed = False
+        self._load_error = None
+        for i in range(len(self.procs)):
+            self._spawn(i)
+        threading.Thread(target=self._receiver, daemon=True).start()
+        t_end = time.monotonic() + load_timeout
+        while not any(self.ready) and time.monotonic() < t_end:
+            if self._load_error or not any(p.is_alive() for p in self.procs):
+                self.close()
+                raise RuntimeError(f"worker inferensi gagal load model: {self._load_error or 'proses mati'}")
+            time.sleep(0.05)
+        if not any(self.ready):
+            self.close()
+            raise RuntimeError("worker inferensi tidak siap (timeout load model)")
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def _spawn(self, i):
+        self.busy[i].value = -1
+        self.ready[i] = False
+        p = self.ctx.Process(target=_worker, name=f"infer-{i}", daemon=True,
+                             args=(i, self.path, self.backend, self.imgsz, self.threads, self.req_q, self.res_q,
+                                   self.busy[i]))
+        p.start()
+        self.procs[i] = p
+
+    # ---- thread pengelola ----
+    def _receiver(self):
+        while not self._closed:
+            try:
+                msg = self.res_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if msg[0] == "ready":
+                self.ready[msg[1]] = True
+                self.fixed_imgsz = msg[2]
+                print(f"[OK ] Worker inferensi {msg[1]} siap (pid {msg[3]}, {self.threads} thread)")
+                continue
+            if msg[0] == "error":
+                self._load_error = msg[2]
+                print(f"[WARN] Worker inferensi {msg[1]} gagal load model: {msg[2]}")
+                continue
+            rid, res, err, ms = msg
+            if ms is not None:
+                self.infer_ms = 0.2 * ms + 0.8 * self.infer_ms
+            self._finish(rid, res, err)
+
+    def _finish(self, rid, res, err):
+        with self.lock:
+            p = self.pending.pop(rid, None)
+        if p is None:
+            return
+        for s in p.slots:
+            self.free.put(s)
+        if p.abandoned:
+            return           # pemanggil sudah dapat error timeout
+        p.result, p.error = res, err
+        p.event.set()
+
+    def _monitor(self):
+        while not self._closed:
+            time.sleep(0.5)
+            for i, p in enumerate(self.procs):
+                if p.is_alive() or self._closed:
+                    continue
+                rid = self.busy[i].value
+                self.counts["restarts"] += 1
+                print(f"[WARN] Worker inferensi {i} mati (exit {p.exitcode}), dijalankan ulang")
+                if rid >= 0:
+                    self._finish(rid, None, f"worker {i} mati")
+                time.sleep(min(5.0, 0.5 * self.counts["restarts"]))
+                self._spawn(i)
+
+    # ---- slot shared memory ----
+    def _put_frame(self, frame):
+        slot = self.free.get(timeout=self.timeout)
+        shm = self.shms[slot]
+        if frame.nbytes > shm.size:
+            # frame lebih besar dari perkiraan (kamera mengabaikan WIDTH/HEIGHT): ganti slot
+            shm.close()
+            shm.unlink()
+            shm = self.shms[slot] = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+            self.counts["slot_grow"] += 1
+        np.ndarray(frame.shape, np.uint8, buffer=shm.buf)[...] = frame   # crop non-contiguous juga aman
+        return slot, shm.name, frame.shape
+
+    def _submit(self, frames, imgsz, conf):
+        slots = []
+        try:
+            items = []
+            for f in frames:
+                items.append(self._put_frame(f))
+                slots.append(items[-1][0])
+        except queue.Empty:
+            for s in slots:
+                self.free.put(s)
+            raise RuntimeError("slot shared memory penuh")
+        rid = next(self._ids)
+        p = _Pending(slots)
+        with self.lock:
+            self.pending[rid] = p
+        self.req_q.put((rid, items, imgsz, conf))
+        self.counts["requests"] += 1
+        self.counts["frames"] += len(frames)
+        return rid, p
+
+    def _wait(self, rid, p):
+        if not p.event.wait(self.timeout):
+            with self.lock:
+                if rid in self.pending:
+                    # worker bisa masih membaca slot: jangan dibebaskan di sini (lihat _finish)
+                    p.abandoned, p.error = True, "timeout"
+                    self.counts["timeouts"] += 1
+            if not p.abandoned:
+                p.event.wait()          # hasil datang tepat saat timeout, _finish sedang jalan
+        if p.error:
+            self.counts["errors"] += 1
+            raise RuntimeError(f"inferensi gagal: {p.error}")
+        self.ipc_ms = 0.2 * max(0.0, (time.perf_counter() - p.t0) * 1000.0 - self.infer_ms) + 0.8 * self.ipc_ms
+        return [[tuple(float(v) for v in row) for row in arr] for arr in p.result]
+
+    # ---- antarmuka detector ----
+    def detect(self, frame, imgsz, conf):
+        return self.detect_batch([frame], imgsz, conf)[0]
+
+    def detect_batch(self, frames, imgsz, conf):
+        n = sum(self.ready)
+        if n <= 1 or len(frames) == 1:
+            return self._wait(*self._submit(frames, imgsz, conf))
+        # beberapa worker siap: bagi frame supaya dikerjakan paralel
+        chunks = [frames[i::n] for i in range(n)]
+        reqs = [self._submit(c, imgsz, conf) for c in chunks if c]
+        outs = [self._wait(*r) for r in reqs]
+        res = [None] * len(frames)
+        for i, out in enumerate(outs):
+            res[i::n] = out
+        return res
+
+    def stats(self):
+        with self.lock:
+            inflight = len(self.pending)
+            abandoned = sum(p.abandoned for p in self.pending.values())
+        return dict(self.counts, workers=len(self.procs), ready=sum(self.ready), inflight=inflight,
+                    abandoned=abandoned,
+                    slots=len(self.shms), infer_ms=round(self.infer_ms, 2), ipc_ms=round(self.ipc_ms, 2),
+                    pids=[p.pid for p in self.procs])
+
+    def close(self):
+        self._closed = True
+        for _ in self.procs:
+            try:
+                self.req_q.put(None)
+            except Exception:
+                pass
+        for p in self.procs:
+            if p is not None:
+                p.join(1.0)
+                if p.is_alive():
+                    p.terminate()
+        for shm in self.shms:
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception:
+                pass
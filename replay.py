@@ -0,0 +1,258 @@
+# replay.py
+# Replay offline: video rekaman (+ trace ultrasonik/GPS opsional) dilewatkan ke logika
+# deteksi -> tracker -> arah -> fusion -> alert yang SAMA dengan stream_dir_audio.py,
+# tanpa kamera, GPIO, audio atau browser, secepat CPU mampu (waktu = waktu video).
+#
+#   python replay.py jalan.mp4
+#   python replay.py jalan.mp4 --range jarak.csv --gps gps.csv --truth lubang.csv --json hasil.json
+#   python replay.py jalan.mp4 --model best_pothole.onnx --backend onnx --imgsz 320 --conf 0.35
+#   python replay.py jalan.mp4 --set LEFT_THRESH=0.35 --set TTC_CAUTION=3
+#   CAMERAS=0:depan,2:kaki:0.9 python replay.py depan.mp4 --cam kaki=kaki.mp4
+#
+# Trace CSV (baris header wajib, t = detik sejak awal video):
+#   --range : t,distance_m
+#   --gps   : t,speed_kmh
+#   --truth : t                (waktu lubang pertama kali terlihat; untuk waktu-sampai-alert)
+# Tanpa --truth, deteksi mentah pertama dipakai sebagai waktu kemunculan.
+import os, sys, csv, json, time, argparse
+
+def percentiles(xs):
+    if not xs:
+        return None
+    ys = sorted(xs)
+    pick = lambda q: ys[min(len(ys) - 1, int(q * len(ys)))]
+    return {"p50": round(pick(0.50), 2), "p90": round(pick(0.90), 2), "p99": round(pick(0.99), 2),
+            "max": round(ys[-1], 2), "mean": round(sum(ys) / len(ys), 2), "n": len(ys)}
+
+def read_trace(path, cols):
+    """CSV -> list tuple (kolom sesuai cols), urut menurut t."""
+    if not path:
+        return []
+    with open(path, newline="") as f:
+        rows = [tuple(float(r[c]) for c in cols) for r in csv.DictReader(f) if r.get(cols[0], "").strip()]
+    return sorted(rows)
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class ReplayAudio:
+    """Pengganti AudioEngine: 'memutar' klip selama durasi aslinya di waktu video."""
+    def __init__(self, clock, durations, default_s=1.0):
+        self.clock = clock
+        self.durations = durations
+        self.default_s = default_s
+        self.cur, self.end = None, 0.0
+        self.log = []      # (t, kind)
+
+    def has(self, kind):
+        return True
+
+    def current(self):
+        if self.cur is not None and self.clock() >= self.end:
+            self.cur = None
+        return self.cur
+
+    def play(self, kind, t_trigger=None):
+        self.cur, self.end = kind, self.clock() + self.durations.get(kind, self.default_s)
+        self.log.append((self.clock(), kind))
+        return True
+
+class TimedModel:
+    """Bungkus detektor: catat latency detect()/detect_batch() dan waktu deteksi mentah."""
+    def __init__(self, model, clock):
+        self.model = model
+        self.clock = clock
+        self.fixed_imgsz = getattr(model, "fixed_imgsz", None)
+        self.ms = []
+        self.first_det = None
+
+    def detect(self, frame, imgsz, conf):
+        t0 = time.perf_counter()
+        boxes = self.model.detect(frame, imgsz, conf)
+        self.ms.append((time.perf_counter() - t0) * 1000.0)
+        if boxes and self.first_det is None:
+            self.first_det = self.clock()
+        return boxes
+
+    def detect_batch(self, frames, imgsz, conf):
+        # satu sampel per batch (semua kamera pada tick yang sama)
+        t0 = time.perf_counter()
+        res = self.model.detect_batch(frames, imgsz, conf)
+        self.ms.append((time.perf_counter() - t0) * 1000.0)
+        if any(res) and self.first_det is None:
+            self.first_det = self.clock()
+        return res
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay video offline lewat pipeline deteksi/alert")
+    ap.add_argument("video")
+    ap.add_argument("--range", help="trace ultrasonik CSV (t,distance_m)")
+    ap.add_argument("--gps", help="trace GPS CSV (t,speed_kmh)")
+    ap.add_argument("--truth", help="waktu kemunculan lubang CSV (t)")
+    ap.add_argument("--model"); ap.add_argument("--backend"); ap.add_argument("--imgsz"); ap.add_argument("--conf")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VAL", help="override env, bisa berulang")
+    ap.add_argument("--cam", action="append", default=[], metavar="NAMA=VIDEO",
+                    help="video kamera tambahan (nama dari CAMERAS), bisa berulang")
+    ap.add_argument("--max-frames", type=int, default=0)
+    ap.add_argument("--window", type=float, default=5.0, help="detik maksimum kemunculan -> alert")
+    ap.add_argument("--json", help="tulis laporan ke file JSON")
+    args = ap.parse_args()
+
+    # env harus di-set SEBELUM import: konfigurasi dibaca saat import
+    for k, v in (("MODEL_PATH", args.model), ("INFER_BACKEND", args.backend), ("IMGSZ", args.imgsz), ("CONF", args.conf)):
+        if v is not None:
+            os.environ[k] = v
+    for kv in args.set:
+        k, _, v = kv.partition("=")
+        os.environ[k.strip()] = v.strip()
+    os.environ.setdefault("ADAPTIVE", "0")
+
+    import cv2
+    import stream_dir_audio as sd
+    from alert_scheduler import AlertScheduler
+    from audio_engine import load_clips, RATE, SAMPLE_BYTES
+    from ultrasonic import UltrasonicRanger, FakeGpioBackend
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        sys.exit(f"[ERR] video tidak bisa dibuka: {args.video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    if not 1.0 <= fps <= 240.0:
+        fps = 30.0
+
+    videos = dict(kv.split("=", 1) for kv in args.cam)
+    for idx, name, near in sd.CAMS[1:]:
+        if name not in videos:
+            print(f"[WARN] Kamera tambahan '{name}' tanpa --cam {name}=VIDEO, dilewati")
+            continue
+        ecap = cv2.VideoCapture(videos[name])
+        if not ecap.isOpened():
+            sys.exit(f"[ERR] video tidak bisa dibuka: {videos[name]}")
+        sd.navi.extra_cams.append(sd.CamView(idx, name, near, ecap))
+
+    # semua durasi tahap yang masuk registry telemetri, sampel mentah untuk persentil
+    stage_ms = {}
+    _stage_update = sd._stage_update
+    def record_stage(name, ms):
+        stage_ms.setdefault(name, []).append(ms)
+        _stage_update(name, ms)
+    sd._stage_update = record_stage
+
+    clock = VirtualClock()
+    durations = {k: len(v) / (RATE * SAMPLE_BYTES) for k, v in load_clips(sd.AUDIO_DIR).items()}
+    for kind, clip in sd.DANGER_SIDE_CLIP.items():
+        if kind not in durations and clip in durations:
+            durations[kind] = durations[clip]
+    audio = ReplayAudio(clock, durations)
+    sd.navi.audio = audio
+    sd.navi.alerts = alerts = AlertScheduler(
+        audio, priorities=sd.ALERT_PRIORITY, cooldown=sd.AUDIO_COOLDOWN, global_gap=sd.AUDIO_GAP,
+        max_age=sd.ALERT_MAX_AGE, max_ages=sd.DANGER_MAX_AGES, clock=clock)
+    t0 = time.perf_counter()
+    sd.navi.model = model = TimedModel(sd.init_model(), clock)
+    load_s = time.perf_counter() - t0
+    ranger = UltrasonicRanger(FakeGpioBackend(lambda t: None), on_sample=sd._on_distance)
+    rng, gps = read_trace(args.range, ("t", "distance_m")), read_trace(args.gps, ("t", "speed_kmh"))
+    truth = [r[0] for r in read_trace(args.truth, ("t",))]
+
+    step_ms, n = [], 0
+    ri = gi = 0
+    t_wall = time.perf_counter()
+    while True:
+        ok, frame = cap.read()
+        if not ok or (args.max_frames and n >= args.max_frames):
+            break
+        t = n / fps
+        clock.now = t
+        while ri < len(rng) and rng[ri][0] <= t:
+            ranger.feed(rng[ri][1], rng[ri][0])
+            ri += 1
+        while gi < len(gps) and gps[gi][0] <= t:
+            sd.fusion.update_gps(gps[gi][1], gps[gi][0])
+            gi += 1
+        extra = []
+        for cv in sd.navi.extra_cams:
+            ok, f = cv.cap.read()
+            if ok:
+                extra.append((cv, t, f))
+        t1 = time.perf_counter()
+        out, inferred = sd.infer_step(n, t, frame, extra)
+        t2 = time.perf_counter()
+        step_ms.append((t2 - t1) * 1000.0)
+        if inferred:
+            # t_cap di replay = waktu video; "alert" diukur dari awal langkah seperti infer_worker
+            sd._stage_update("alert", (t2 - t1) * 1000.0)
+        sd.draw_overlay(*out[1:])
+        sd._stage_update("render", (time.perf_counter() - t2) * 1000.0)
+        alerts.pump()
+        n += 1
+    wall = time.perf_counter() - t_wall
+    cap.release()
+    for cv in sd.navi.extra_cams:
+        cv.cap.release()
+
+    dur = n / fps
+    st = alerts.stats()
+    emitted = audio.log
+    appear = truth or ([model.first_det] if model.first_det is not None else [])
+    events = []
+    for ta in appear:
+        hit = next((te for te, _ in emitted if ta <= te <= ta + args.window), None)
+        events.append({"t": round(ta, 3), "alert_t": (None if hit is None else round(hit, 3)),
+                       "delay_s": (None if hit is None else round(hit - ta, 3))})
+    delays = [e["delay_s"] for e in events if e["delay_s"] is not None]
+
+    report = {
+        "video": args.video,
+        "frames": n,
+        "video_fps": round(fps, 2),
+        "duration_s": round(dur, 2),
+        "wall_s": round(wall, 2),
+        "model_load_s": round(load_s, 2),
+        "fps": round(n / wall, 1) if wall else None,
+        "speedup": round(dur / wall, 2) if wall else None,
+        # "infer" = detektor saja (TimedModel); tahap registry "infer" ikut crop/resize
+        "stages_ms": dict({("infer_total" if k == "infer" else k): percentiles(v) for k, v in stage_ms.items()},
+                          infer=percentiles(model.ms), step=percentiles(step_ms)),
+        "alerts": {
+            "emitted": st["emitted"],
+            "per_min": round(st["emitted"] / (dur / 60.0), 2) if dur else None,
+            "suppressed": st["suppressed"], "coalesced": st["coalesced"], "dropped": st["dropped"],
+            "by_kind": {k: v["emitted"] for k, v in st["by_kind"].items()},
+        },
+        "first_detection_s": (None if model.first_det is None else round(model.first_det, 3)),
+        "first_alert_s": (round(emitted[0][0], 3) if emitted else None),
+        "appearance_source": ("truth" if truth else "first_detection"),
+        "time_to_alert_s": percentiles(delays),
+        "missed": sum(1 for e in events if e["delay_s"] is None),
+        "events": events,
+        "ultrasonic": dict(ranger.counts),
+        "cameras": [sd.CAMS[0][1]] + [cv.name for cv in sd.navi.extra_cams],
+        "config": {"model": sd.MODEL_PATH, "backend": sd.INFER_BACKEND, "imgsz": sd.IMGSZ, "conf": sd.CONF,
+                   "process_n": sd.PROCESS_EVERY_N, "roi_mode": sd.ROI_MODE, "left": sd.LEFT_THRESH,
+                   "right": sd.RIGHT_THRESH, "min_persist": sd.MIN_PERSIST_FRM,
+                   "ttc_caution": sd.TTC_CAUTION, "ttc_danger": sd.TTC_DANGER, "cooldown": sd.AUDIO_COOLDOWN},
+    }
+
+    print(f"[OK ] {n} frame ({dur:.1f} s video) dalam {wall:.1f} s -> {report['fps']} FPS, {report['speedup']}x realtime")
+    for name in ("infer", "post", "alert", "render", "step"):
+        p = report["stages_ms"].get(name)
+        if p:
+            print(f"      {name + ' ms':<10}p50 {p['p50']}  p90 {p['p90']}  p99 {p['p99']}  max {p['max']}")
+    print(f"      alert: {st['emitted']} ({report['alerts']['per_min']}/menit) {report['alerts']['by_kind']}"
+          f"  suppressed {st['suppressed']}  dropped {st['dropped']}")
+    tta = report["time_to_alert_s"]
+    print(f"      kemunculan -> alert ({report['appearance_source']}): "
+          + (f"p50 {tta['p50']} s  max {tta['max']} s" if tta else "-") + f"  missed {report['missed']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK ] laporan -> {args.json}")
+    return report
+
+if __name__ == "__main__":
+    main()
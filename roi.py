@@ -0,0 +1,64 @@
+# roi.py
+# Region-of-interest untuk inferensi: hanya potongan jalur jalan yang dikirim ke model.
+# Kamera dada menunduk 10–15°, jadi bagian atas frame kebanyakan langit/gedung.
+#
+#   static  : ROI tetap dari env ROI="x1,y1,x2,y2" (pecahan 0..1 dari lebar/tinggi)
+#   learned : batas atas ROI dipelajari dari posisi deteksi sebelumnya; sesekali
+#             frame penuh tetap diinferensi supaya ROI bisa melebar lagi.
+from collections import deque
+
+def parse_roi(text:str):
+    try:
+        x1, y1, x2, y2 = (float(v) for v in text.split(","))
+    except Exception:
+        raise ValueError(f"ROI harus 'x1,y1,x2,y2' (0..1), bukan '{text}'")
+    x1, y1 = max(0.0, x1), max(0.0, y1)
+    x2, y2 = min(1.0, x2), min(1.0, y2)
+    if x2 - x1 < 0.1 or y2 - y1 < 0.1:
+        raise ValueError(f"ROI terlalu kecil: '{text}'")
+    return (x1, y1, x2, y2)
+
+class RoiSelector:
+    def __init__(self, mode="static", static=(0.0, 0.0, 1.0, 1.0), full_every=30,
+                 min_height=0.4, margin=0.05, min_samples=30, quantile=0.05):
+        self.mode = mode
+        self.static = static
+        self.full_every = max(1, full_every)
+        self.min_height = min_height
+        self.margin = margin
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.tops = deque(maxlen=500)   # y1 ternormalisasi dari deteksi
+        self.top = static[1]
+        self._n = 0
+
+    def region(self, W:int, H:int):
+        """Kotak crop (px) untuk inferensi berikutnya; None = pakai frame penuh."""
+        self._n += 1
+        if self.mode == "off":
+            return None
+        x1, y1, x2, y2 = self.static
+        if self.mode == "learned":
+            if self._n % self.full_every == 0:
+                return None
+            y1 = self.top
+        if (x1, y1, x2, y2) == (0.0, 0.0, 1.0, 1.0):
+            return None
+        return (int(x1 * W), int(y1 * H), int(x2 * W), int(y2 * H))
+
+    def observe(self, boxes, W:int, H:int):
+        """Catat deteksi (koordinat frame penuh) untuk mode learned."""
+        if self.mode != "learned" or not boxes:
+            return
+        for b in boxes:
+            self.tops.append(b[1] / max(1.0, float(H)))
+        if len(self.tops) < self.min_samples:
+            return
+        ys = sorted(self.tops)
+        q = ys[int(self.quantile * (len(ys) - 1))]
+        top = max(0.0, q - self.margin)
+        self.top = min(top, self.static[3] - self.min_height)
+
+    def info(self):
+        return {"mode": self.mode, "static": self.static, "learned_top": round(self.top, 3),
+                "samples": len(self.tops)}
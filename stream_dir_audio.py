@@ -1,18 +1,28 @@
-import os, time, threading, statistics, signal, sys, json, subprocess
+import os, time, threading, signal, sys, json
 from collections import deque
 from flask import Flask, Response, render_template_string, jsonify, request, make_response
-from ultralytics import YOLO
 import cv2
+from detector import load_detector, BACKENDS
+from tracker import Tracker
+from adaptive import AdaptiveController, read_cpu_temp, read_throttled
+from roi import RoiSelector, parse_roi
+from audio_engine import AudioEngine
+from alert_scheduler import AlertScheduler
+from ultrasonic import UltrasonicRanger, open_backend
+from fusion import HazardFusion
+from h264_stream import H264Hub
+from telemetry import Registry
+from event_store import EventStore, parse_bbox
+from hazard_index import HazardIndex
+from capture import CaptureEngine
+from hotswap import ConfigStore, ModelSlot
+from gps import GpsRing, GpsReader, ReplaySerial, configure as gps_configure
 
 # ---------- Optional deps (GPS & HR) ----------
 try:
     import serial
 except Exception:
     serial = None
-try:
-    import pynmea2
-except Exception:
-    pynmea2 = None
 try:
     from heartrate_monitor import HeartRateMonitor
 except Exception:
@@ -20,157 +30,211 @@ except Exception:
 
 # ================== ENV ==================
 MODEL_PATH = os.getenv("MODEL_PATH", "best_pothole.pt")
+MODEL_DIR  = os.getenv("MODEL_DIR", os.path.dirname(os.path.abspath(MODEL_PATH)))   # batas model untuk POST /model
 PORT       = int(os.getenv("PORT", "5000"))
 CAM_INDEX  = int(os.getenv("CAMERA_INDEX", "-1"))   # -1 = auto
+CAM_CACHE  = os.getenv("CAM_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cam_cache.json"))
 WIDTH      = int(os.getenv("WIDTH", "640"))
 HEIGHT     = int(os.getenv("HEIGHT", "480"))
+# Multi-kamera: "idx:nama[:near],..." -> kamera pertama = utama (ROI, overlay, stream).
+# near = kedekatan minimum (0..1) untuk deteksi kamera itu, mis. kamera kaki yang menunduk.
+CAMERAS    = os.getenv("CAMERAS", "")                   # kosong = satu kamera (CAMERA_INDEX)
+CAM_NEAR   = float(os.getenv("CAM_NEAR", "0.85"))       # default near kamera tambahan
+CAM_SYNC_MS = float(os.getenv("CAM_SYNC_MS", "15"))     # tunggu frame kamera lain untuk batch yang sama
+CAP_DECODE = os.getenv("CAP_DECODE", "cv2").lower()     # cv2|reduced (MJPEG di-decode 1/2..1/8; butuh lebar >= 2x IMGSZ)
+CAP_POOL   = int(os.getenv("CAP_POOL", "6"))            # buffer frame yang dipakai ulang
+CAP_STALE_MS = float(os.getenv("CAP_STALE_MS", "50"))   # frame lebih tua dari ini di antrian driver dibuang
 IMGSZ      = int(os.getenv("IMGSZ", "416"))
 CONF       = float(os.getenv("CONF", "0.30"))
+INFER_BACKEND = os.getenv("INFER_BACKEND", "torch").lower()  # torch|onnx|openvino|ncnn
+INFER_THREADS = int(os.getenv("INFER_THREADS", "0"))          # 0 = semua core
+INFER_PROC    = int(os.getenv("INFER_PROC", "0"))             # >0 = inferensi di N proses worker
+INFER_TIMEOUT = float(os.getenv("INFER_TIMEOUT", "2.0"))      # s, request ke worker dianggap gagal
+ROI_MODE   = os.getenv("ROI_MODE", "static").lower()   # off|static|learned
+ROI        = os.getenv("ROI", "0,0,1,1")                # x1,y1,x2,y2 (pecahan), mis. "0,0.35,1,1"
+ROI_FULL_EVERY = int(os.getenv("ROI_FULL_EVERY", "30"))  # mode learned: tiap N inferensi pakai frame penuh
 PROCESS_EVERY_N = int(os.getenv("PROCESS_EVERY_N", "1"))  # 1 tiap frame
 
+# Kontrol adaptif (IMGSZ / PROCESS_EVERY_N mengikuti latency, suhu, kecepatan jalan)
+ADAPTIVE          = os.getenv("ADAPTIVE", "0") == "1"
+LATENCY_TARGET_MS = float(os.getenv("LATENCY_TARGET_MS", "150"))
+ADAPT_SIZES       = tuple(int(x) for x in os.getenv("ADAPT_SIZES", "320,384,416,480").split(","))
+ADAPT_MAX_SKIP    = int(os.getenv("ADAPT_MAX_SKIP", "4"))
+
 # Ultrasonik
 TRIG_PIN   = int(os.getenv("TRIG_PIN", "23"))  # BCM
 ECHO_PIN   = int(os.getenv("ECHO_PIN", "24"))  # BCM
 DIST_WARN1 = float(os.getenv("DIST_WARN1", "1.5"))  # m (CAUTION)
 DIST_WARN2 = float(os.getenv("DIST_WARN2", "0.5"))  # m (DANGER)
+ULTRA_BACKEND = os.getenv("ULTRA_BACKEND", "auto").lower()   # auto|lgpio|rpigpio|fake
+ULTRA_RATE_HZ = float(os.getenv("ULTRA_RATE_HZ", "25"))
+ULTRA_FAKE_DIST = float(os.getenv("ULTRA_FAKE_DIST", "1.5"))  # m, untuk backend fake
+DANGER_LEAD_S = float(os.getenv("DANGER_LEAD_S", "0.5"))     # s, danger lebih awal saat mendekat cepat
+TTC_CAUTION   = float(os.getenv("TTC_CAUTION", "2.5"))       # s, time-to-contact -> CAUTION
+TTC_DANGER    = float(os.getenv("TTC_DANGER", "1.0"))        # s, time-to-contact -> DANGER
+FUSION_MIN_CONF = float(os.getenv("FUSION_MIN_CONF", "0.35"))
 
 # GPS (default pakai symlink otomatis /dev/serial0)
 GPS_PORT   = os.getenv("GPS_PORT", "/dev/serial0")
 GPS_BAUD   = int(os.getenv("GPS_BAUD", "9600"))
+GPS_RATE_HZ  = float(os.getenv("GPS_RATE_HZ", "1"))      # >1 -> kirim PMTK220 (receiver MTK, maks 10 Hz)
+GPS_SET_BAUD = int(os.getenv("GPS_SET_BAUD", "0"))       # >0 -> PMTK251 naikkan baud (perlu untuk 10 Hz)
+GPS_RING     = int(os.getenv("GPS_RING", "600"))         # jumlah fix terakhir di memori
 
 # Arah
 LEFT_THRESH  = float(os.getenv("LEFT_THRESH",  "0.40"))  # < 40% = kiri
 RIGHT_THRESH = float(os.getenv("RIGHT_THRESH", "0.60"))  # > 60% = kanan
-MIN_PERSIST_FRM = int(os.getenv("MIN_PERSIST_FRM", "3"))
+MIN_PERSIST_FRM = int(os.getenv("MIN_PERSIST_FRM", "2"))  # hit track sebelum dianggap terkonfirmasi
+TRACK_MAX_MISS  = int(os.getenv("TRACK_MAX_MISS", "5"))   # frame tanpa match sebelum track dibuang
 
 # Audio
 AUDIO_DIR       = os.getenv("AUDIO_DIR", "sounds")
-AUDIO_METHOD    = os.getenv("AUDIO_METHOD", "aplay")  # aplay|pygame
-AUDIO_COOLDOWN  = float(os.getenv("AUDIO_COOLDOWN", "2.5"))
+AUDIO_METHOD    = os.getenv("AUDIO_METHOD", "aplay")  # aplay (stream persisten) | pygame
+AUDIO_COOLDOWN  = float(os.getenv("AUDIO_COOLDOWN", "2.5"))   # s, per jenis alert
+AUDIO_GAP       = float(os.getenv("AUDIO_GAP", "0.8"))        # s, jeda minimum antar alert apa pun
+ALERT_MAX_AGE   = float(os.getenv("ALERT_MAX_AGE", "0.6"))    # s, alert arah lebih tua dari ini dibuang
+ALERT_MAX_AGE_DANGER = float(os.getenv("ALERT_MAX_AGE_DANGER", "0.4"))
+
+# Server HTTP
+SERVER_MODE  = os.getenv("SERVER", "flask").lower()   # flask (dev, thread per viewer) | async
+STREAM_QUEUE = int(os.getenv("STREAM_QUEUE", "2"))     # frame antre per viewer sebelum yang lama dibuang
+H264_STREAM  = os.getenv("H264_STREAM", "1") == "1"    # /video.mp4 (fMP4 H.264 via PyAV); encoder jalan hanya kalau ada viewer
+H264_FPS     = int(os.getenv("H264_FPS", "15"))
+H264_GOP     = int(os.getenv("H264_GOP", "30"))         # frame antar keyframe (viewer baru tetap dapat keyframe paksa)
+H264_CODEC   = os.getenv("H264_CODEC", "auto")          # auto (h264_v4l2m2m -> libx264) | libx264 | h264_v4l2m2m
+
+# Log kejadian (SQLite WAL, ditulis per batch); EVENT_DB= kosong untuk mematikan
+EVENT_DB      = os.getenv("EVENT_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "events.db"))
+EVENT_DB_MAX_MB = float(os.getenv("EVENT_DB_MAX_MB", "64"))
+EVENT_FLUSH_S = float(os.getenv("EVENT_FLUSH_S", "10"))   # makin besar makin sedikit tulis ke SD
+EVENT_THUMB   = os.getenv("EVENT_THUMB", "1") == "1"       # simpan potongan JPEG kecil per kejadian
+
+# Peringatan dini dari peta lubang yang sudah dikenal (events.db + HAZARD_MAP CSV lat,lon[,side])
+HAZARD_MAP      = os.getenv("HAZARD_MAP", "")
+PREWARN         = os.getenv("PREWARN", "1") == "1"
+PREWARN_RADIUS_M = float(os.getenv("PREWARN_RADIUS_M", "25"))
+PREWARN_CONE    = float(os.getenv("PREWARN_CONE", "35"))      # derajat kiri/kanan dari arah jalan
+PREWARN_REPEAT_S = float(os.getenv("PREWARN_REPEAT_S", "120")) # lubang yang sama tidak diulang sebelum ini
+PREWARN_MIN_SIGHTINGS = int(os.getenv("PREWARN_MIN_SIGHTINGS", "2"))   # satu kali lewat belum cukup
+PREWARN_PASS_S  = float(os.getenv("PREWARN_PASS_S", "300"))     # baris < ini dari baris sebelumnya = lintasan yang sama
+PREWARN_CLIP    = os.getenv("PREWARN_CLIP", "waspada")          # klip sendiri; tidak ada -> peringatan dini diam
 # ========================================
 
+# --------- Telemetri (format Prometheus di /metrics/prometheus) ----------
+reg = Registry("navi_")
+stage_hist = reg.histogram("stage_seconds", "Durasi per tahap pipeline (capture = grab -> frame ter-decode; "
+                          "age = umur frame saat inferensi mulai, termasuk tunggu slot)")
+alert_hist = reg.histogram("alert_latency_seconds", "Trigger alert -> sampel audio pertama",
+                           buckets=(0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0))
+errors = reg.counter("errors_total", "Kegagalan baca/parse/inferensi per sumber")
+frames = reg.counter("frames_total", "Frame yang lewat tiap tahap pipeline")
+
 # ========= Globals & State =========
 start_ts = time.time()
 fps_val = 0.0
 fps_alpha = 0.2
-last_jpg = None
-DETECT_ENABLED = True
+
+# Parameter runtime (diubah /set, /toggle, kontroler adaptif) sebagai snapshot berversi;
+# pipeline membaca config.cur sekali per frame. Konstanta ENV di atas = nilai awal.
+config = ConfigStore(conf=CONF, imgsz=IMGSZ, process_n=PROCESS_EVERY_N, adaptive=ADAPTIVE, detect=True)
 
 _last_dir = None
-_persist_count = 0
-_last_audio_t = 0.0
-_last_audio_kind = None
-audio_lock = threading.Lock()
+track_info = {"count": 0, "nearest_id": None, "approach": None, "cam": None, "cameras": {}}
+
+# --------- Fusion (YOLO + ultrasonik + GPS) ----------
+# Tiap sensor meng-update state bahaya begitu punya data; alert diputuskan di _on_hazard.
+fusion = HazardFusion(warn1=DIST_WARN1, warn2=DIST_WARN2, ttc_caution=TTC_CAUTION, ttc_danger=TTC_DANGER,
+                      lead_s=DANGER_LEAD_S, min_conf=FUSION_MIN_CONF)
 
 # --------- Ultrasonic (HC-SR04) ----------
-ULTRA_READY = False
+# Edge callback (lgpio / RPi.GPIO), bukan busy-wait; lihat ultrasonic.py
 distance_lock = threading.Lock()
-distance_m = None  # meter
-try:
-    import RPi.GPIO as GPIO
-    import time as _t
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setwarnings(False)
-    GPIO.setup(TRIG_PIN, GPIO.OUT)
-    GPIO.setup(ECHO_PIN, GPIO.IN)
-    GPIO.output(TRIG_PIN, False)
-    _t.sleep(0.1)
-    ULTRA_READY = True
-    print(f"[OK ] GPIO ready TRIG={TRIG_PIN} ECHO={ECHO_PIN} (BCM)")
-except Exception as e:
-    print("[WARN] RPi.GPIO tidak tersedia/gagal init:", e)
-    GPIO = None
-
-def read_distance_once(timeout=0.06):
-    if not ULTRA_READY:
-        return None
-    GPIO.output(TRIG_PIN, True); _t.sleep(10e-6); GPIO.output(TRIG_PIN, False)
-
-    t0 = time.perf_counter()
-    while GPIO.input(ECHO_PIN) == 0:
-        if time.perf_counter() - t0 > timeout:
-            return None
-    start = time.perf_counter()
-    while GPIO.input(ECHO_PIN) == 1:
-        if time.perf_counter() - start > timeout:
-            return None
-    end = time.perf_counter()
-    return (end - start) * 343.0 / 2.0
-
-def ultrasonic_worker():
-    global distance_m
-    buf = deque(maxlen=5)
-    while True:
-        try:
-            d = read_distance_once()
-            if d is not None and 0.02 <= d <= 4.0:
-                buf.append(d)
-                with distance_lock:
-                    distance_m = statistics.median(buf)
-        except Exception:
-            pass
-        time.sleep(0.08)
+distance_m = None  # meter (tersaring)
+closing_mps = 0.0  # m/s, positif = mendekat
 
-if ULTRA_READY:
-    threading.Thread(target=ultrasonic_worker, daemon=True).start()
+def _on_distance(d, closing, t):
+    global distance_m, closing_mps
+    with distance_lock:
+        distance_m, closing_mps = d, closing
+    fusion.update_range(d, closing, t)
 
-# --------- GPS (NMEA) ----------
-gps_lock = threading.Lock()
-gps_data = {"lat": None, "lon": None, "speed_kmh": None, "time_utc": None, "valid": False}
-GPS_READY = False
-gps_ser = None
-
-def gps_worker():
-    global GPS_READY, gps_ser
-    if serial is None or pynmea2 is None:
-        print("[INFO] GPS skipped: pyserial/pynmea2 not available")
-        return
-    try:
-        gps_ser = serial.Serial(GPS_PORT, baudrate=GPS_BAUD, timeout=1)
-        GPS_READY = True
-        print(f"[OK ] GPS serial opened on {GPS_PORT}@{GPS_BAUD}")
-    except Exception as e:
-        print(f"[WARN] Could not open GPS serial: {e}")
-        return
-    while True:
-        try:
-            line = gps_ser.readline().decode('ascii', errors='ignore').strip()
-            if not line:
-                continue
-            if line.startswith(('$GPRMC', '$GNRMC')):
-                try:
-                    msg = pynmea2.parse(line)
-                    lat, lon = (msg.latitude, msg.longitude)
-                    # knots -> km/h
-                    try:
-                        spd_kmh = float(msg.spd_over_grnd or 0.0) * 1.852
-                    except Exception:
-                        spd_kmh = None
-                    time_utc = None
-                    try:
-                        if getattr(msg, "datestamp", None) and getattr(msg, "timestamp", None):
-                            time_utc = msg.datestamp.strftime("%Y-%m-%d") + " " + msg.timestamp.strftime("%H:%M:%S")
-                    except Exception:
-                        pass
-                    with gps_lock:
-                        gps_data.update({
-                            "lat": lat if lat != 0 else None,
-                            "lon": lon if lon != 0 else None,
-                            "speed_kmh": spd_kmh,
-                            "time_utc": time_utc,
-                            "valid": (getattr(msg, "status", None) == "A"),
-                        })
-                except Exception:
-                    pass
-        except Exception:
-            time.sleep(0.2)
+def init_ultrasonic():
+    backend = open_backend(ULTRA_BACKEND, TRIG_PIN, ECHO_PIN, fake_distance=ULTRA_FAKE_DIST)
+    ranger = UltrasonicRanger(backend, rate_hz=ULTRA_RATE_HZ, on_sample=_on_distance).start()
+    print(f"[OK ] Ultrasonic {backend.name} TRIG={TRIG_PIN} ECHO={ECHO_PIN} (BCM) @ {ULTRA_RATE_HZ:g} Hz")
+    return ranger
 
-threading.Thread(target=gps_worker, daemon=True).start()
+# --------- GPS (NMEA) ----------
+gps_ring = GpsRing(GPS_RING)
+GPS_KEYS = ("lat", "lon", "speed_kmh", "heading", "time_utc", "valid", "fix_quality", "sats", "hdop", "pdop",
+            "fix_mode", "alt_m")
+
+def gps_snapshot():
+    """Fix terbaru dari ring buffer (dict baru; aman dipakai di luar lock)."""
+    f = gps_ring.latest()
+    if f is None:
+        return {k: (False if k == "valid" else None) for k in GPS_KEYS}
+    return {k: f.get(k) for k in GPS_KEYS}
+
+def init_gps():
+    # GPS_PORT=replay:<file.nmea>[@speed] -> putar ulang file NMEA (uji tanpa receiver)
+    if GPS_PORT.startswith("replay:"):
+        path, _, speed = GPS_PORT[7:].partition("@")
+        ser = ReplaySerial(path, speed=float(speed or 1.0))
+    else:
+        if serial is None:
+            raise RuntimeError("pyserial not available")
+        ser = serial.Serial(GPS_PORT, baudrate=GPS_BAUD, timeout=0.2)
+    if GPS_RATE_HZ != 1.0 or GPS_SET_BAUD:
+        gps_configure(ser, rate_hz=GPS_RATE_HZ, baud=(GPS_SET_BAUD or None))
+    print(f"[OK ] GPS serial opened on {GPS_PORT} ({ser.baudrate} baud, {GPS_RATE_HZ:g} Hz)")
+    return ser
+
+def _on_gps_fix(fix):
+    fusion.update_gps(fix["speed_kmh"])
+    if fix["valid"]:
+        on_gps_fix(fix["lat"], fix["lon"], fix["speed_kmh"], fix["heading"])
+
+# --------- Peta lubang + peringatan dini ----------
+hazmap = HazardIndex(pass_s=PREWARN_PASS_S)
+_prewarned = {}     # id lubang -> waktu terakhir diperingatkan
+prewarn_info = {"count": 0, "last": None, "no_clip": 0}
+
+def prewarn_check(lat, lon, spd_kmh, heading):
+    """Lubang yang sudah dikenal di depan -> alert sebelum kamera bisa melihatnya."""
+    if not PREWARN or spd_kmh is None or spd_kmh < 1.0:
+        return None
+    # course GPS tidak bisa dipercaya saat sangat pelan -> cek semua arah dalam radius
+    hd = heading if spd_kmh >= 2.0 else None
+    now = time.monotonic()
+    recent = [k for k, t in _prewarned.items() if now - t < PREWARN_REPEAT_S]
+    hit = hazmap.ahead(lat, lon, hd, spd_kmh / 3.6, radius_m=PREWARN_RADIUS_M, cone_deg=PREWARN_CONE,
+                       min_sightings=PREWARN_MIN_SIGHTINGS, exclude=recent)
+    if hit is None:
+        return None
+    _prewarned[hit["id"]] = now
+    if len(_prewarned) > 1000:
+        _prewarned.clear()
+    prewarn_info["count"] += 1
+    prewarn_info["last"] = dict(hit, t=time.time())
+    audio = navi.audio
+    if audio is None or not audio.has(PREWARN_CLIP) or PREWARN_CLIP in ALERT_KINDS:
+        # jangan memakai klip bahaya: "ada halangan di depan" 25 m sebelum titiknya menyesatkan
+        # dan menghabiskan cooldown alert bahaya yang sebenarnya
+        prewarn_info["no_clip"] += 1
+        return hit
+    play_audio(PREWARN_CLIP)
+    return hit
+
+def on_gps_fix(lat, lon, spd_kmh, heading):
+    """Efek samping tiap fix GPS valid: jejak ke event log + cek peringatan dini."""
+    if navi.store:
+        navi.store.log_fix(time.time(), lat, lon, spd_kmh)
+    prewarn_check(lat, lon, spd_kmh, heading)
 
 # --------- Heart Rate (MAX30102) ----------
 hr_lock = threading.Lock()
 hr_metrics = {"bpm": None, "spo2": None, "ready": False}
-hrm = None
 
 def _probe_hr_attr(obj, *names):
     for n in names:
@@ -182,24 +246,21 @@ def _probe_hr_attr(obj, *names):
                 v = v()
             return float(v)
         except Exception:
+            errors.inc(source="hr_read")
             continue
     return None
 
-def hr_worker():
-    global hrm
+def init_hr():
     if HeartRateMonitor is None:
-        print("[INFO] HR skipped: HeartRateMonitor module not available")
-        return
-    try:
-        hrm = HeartRateMonitor(print_raw=False, print_result=False)
-        hrm.start_sensor()
-        with hr_lock:
-            hr_metrics["ready"] = True
-        print("[OK ] MAX30102 HeartRateMonitor started")
-    except Exception as e:
-        print("[WARN] Failed to start HeartRateMonitor:", e)
-        return
+        raise RuntimeError("HeartRateMonitor module not available")
+    hrm = HeartRateMonitor(print_raw=False, print_result=False)
+    hrm.start_sensor()
+    with hr_lock:
+        hr_metrics["ready"] = True
+    print("[OK ] MAX30102 HeartRateMonitor started")
+    return hrm
 
+def hr_worker(hrm):
     while True:
         try:
             bpm  = _probe_hr_attr(hrm, "bpm", "BPM", "heart_rate", "HR")
@@ -208,94 +269,143 @@ def hr_worker():
                 if bpm  is not None: hr_metrics["bpm"]  = bpm
                 if spo2 is not None: hr_metrics["spo2"] = spo2
         except Exception:
-            pass
+            errors.inc(source="hr_read")
         time.sleep(0.3)
 
-threading.Thread(target=hr_worker, daemon=True).start()
-
 # --------- Kamera (USB) ----------
-def open_cam():
+def _try_cam(i, be, fcc):
+    cap = cv2.VideoCapture(i, be)
+    if not cap.isOpened():
+        if cap: cap.release()
+        return None
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH,  WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE,   1)
+    for f in ([fcc] if fcc else ['MJPG','YUYV','H264']):
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*f))
+        time.sleep(0.05)
+        ret, frm = cap.read()
+        if ret and frm is not None:
+            return cap, f
+    cap.release()
+    return None
+
+def _load_cam_cache():
+    try:
+        with open(CAM_CACHE) as f:
+            c = json.load(f)
+        return int(c["index"]), int(c["backend"]), str(c["fourcc"])
+    except Exception:
+        return None
+
+def _save_cam_cache(i, be, fcc):
+    try:
+        with open(CAM_CACHE, "w") as f:
+            json.dump({"index": i, "backend": be, "fourcc": fcc}, f)
+    except Exception as e:
+        print("[WARN] Gagal simpan cache kamera:", e)
+
+def parse_cameras(text):
+    """'0:depan,2:kaki:0.9' -> [(idx, nama, near)]; kosong -> satu kamera CAMERA_INDEX."""
+    cams = []
+    for i, part in enumerate(p for p in text.split(",") if p.strip()):
+        f = [x.strip() for x in part.split(":")]
+        try:
+            cams.append((int(f[0]), (f[1] if len(f) > 1 and f[1] else f"cam{f[0]}"),
+                         float(f[2]) if len(f) > 2 else (0.0 if i == 0 else CAM_NEAR)))
+        except ValueError:
+            raise ValueError(f"CAMERAS harus 'idx:nama[:near],...', bukan '{part}'")
+    return cams or [(CAM_INDEX, "depan", 0.0)]
+
+CAMS = parse_cameras(CAMERAS)
+
+def open_cam(index=None, use_cache=True):
+    index = CAM_INDEX if index is None else index
+    # coba kombinasi yang terakhir berhasil dulu -> boot berikutnya tidak perlu probe penuh
+    cached = _load_cam_cache() if use_cache else None
+    if cached and (index < 0 or index == cached[0]):
+        i, be, fcc = cached
+        r = _try_cam(i, be, fcc)
+        if r:
+            print(f"[OK ] Kamera (cache): /dev/video{i} {WIDTH}x{HEIGHT} backend={be} fourcc={fcc}")
+            return r[0], i
+        print("[INFO] Cache kamera tidak valid, probe ulang")
+
     import glob, re
     devs = []
     for path in sorted(glob.glob("/dev/video*")):
         m = re.match(r"/dev/video(\d+)$", path)
         if m: devs.append(int(m.group(1)))
-    candidates = ([CAM_INDEX] if CAM_INDEX >= 0 else (devs if devs else [0,1,2,10,11,12,21,22,23,31]))
+    candidates = ([index] if index >= 0 else (devs if devs else [0,1,2,10,11,12,21,22,23,31]))
     print(f"[INFO] Kandidat kamera: {candidates}")
     backends = [cv2.CAP_V4L2, cv2.CAP_ANY, 0]
     for i in candidates:
         for be in backends:
-            cap = cv2.VideoCapture(i, be)
-            if not cap.isOpened():
-                if cap: cap.release()
-                continue
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH,  WIDTH)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, HEIGHT)
-            cap.set(cv2.CAP_PROP_BUFFERSIZE,   1)
-            for fcc in ['MJPG','YUYV','H264']:
-                cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fcc))
-                time.sleep(0.05)
-                ret, frm = cap.read()
-                if ret and frm is not None:
-                    print(f"[OK ] Kamera: /dev/video{i} {WIDTH}x{HEIGHT} backend={be} fourcc={fcc}")
-                    return cap, i
-            cap.release()
+            r = _try_cam(i, be, None)
+            if r:
+                cap, fcc = r
+                print(f"[OK ] Kamera: /dev/video{i} {WIDTH}x{HEIGHT} backend={be} fourcc={fcc}")
+                if use_cache:
+                    _save_cam_cache(i, be, fcc)
+                return cap, i
     raise RuntimeError("Tidak ada kamera yang bisa dibuka")
 
-try:
-    cap, chosen_idx = open_cam()
-except Exception as e:
-    print("[ERR] Gagal buka kamera:", e)
-    sys.exit(1)
-
 # --------- YOLO ---------
-try:
-    print(f"[INFO] Load model: {MODEL_PATH}")
-    model = YOLO(MODEL_PATH)
-except Exception as e:
-    print("[ERR] Gagal load model:", e)
-    sys.exit(1)
-
-# --------- Audio helpers ---------
-def _find_audio(kind:str):
-    # cari file di AUDIO_DIR, dukung .wav .mp3 .ogg .wap (jika kamu memang pakai .wap)
-    for ext in ("wav","WAV","mp3","MP3","ogg","OGG","wap","WAP"):
-        p = os.path.join(AUDIO_DIR, f"{kind}.{ext}")
-        if os.path.exists(p): return p
-    return None
-
-def _play_aplay(path:str):
-    try:
-        subprocess.Popen(["aplay","-q",path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as e:
-        print("[WARN] aplay gagal:", e)
-
-def _play_pygame(path:str):
-    try:
-        import pygame
-        if not pygame.mixer.get_init():
-            pygame.mixer.init(frequency=44100, size=-16, channels=2)
-        pygame.mixer.music.load(path)
-        pygame.mixer.music.play()
-    except Exception as e:
-        print("[WARN] pygame audio gagal:", e)
+def init_model(path=None, backend=None):
+    path, backend = path or MODEL_PATH, (backend or INFER_BACKEND).lower()
+    imgsz = config.cur["imgsz"]
+    if INFER_PROC > 0:
+        # model di proses worker; frame lewat shared memory, hasil box saja yang kembali
+        from infer_proc import ProcDetector
+        print(f"[INFO] Load model: {path} (backend {backend}, {INFER_PROC} proses worker)")
+        return ProcDetector(path, backend, imgsz, INFER_THREADS, workers=INFER_PROC,
+                            slots=max(4, 2 * len(CAMS)), slot_bytes=WIDTH * HEIGHT * 3, timeout=INFER_TIMEOUT)
+    print(f"[INFO] Load model: {path} (backend {backend})")
+    return load_detector(path, backend, imgsz, INFER_THREADS)
+
+# Slot model ganda: model baru di-load + warm-up di background, ditukar antar frame
+models = ModelSlot(init_model)
+
+def warmup_shapes():
+    return [(HEIGHT, WIDTH, 3)] * len(CAMS)
+
+# --------- Audio engine + alert scheduler ---------
+# Klip di-decode sekali ke PCM; satu output stream persisten; "depan" memotong kiri/kanan.
+ALERT_KINDS = ("depan", "kiri", "kanan", "bahaya_kiri", "bahaya_kanan")
+# danger dengan sisi: jenis sendiri (prioritas/deadline/cooldown danger); tanpa klip bahaya_kiri.wav
+# dsb. yang diputar klip arahnya
+DANGER_SIDE_CLIP = {"bahaya_kiri": "kiri", "bahaya_kanan": "kanan"}
+ALERT_PRIORITY = {"depan": 2, "kiri": 1, "kanan": 1, "bahaya_kiri": 2, "bahaya_kanan": 2}
+ALERT_PRIORITY.setdefault(PREWARN_CLIP, 1)     # PREWARN_CLIP tidak boleh menimpa prioritas klip bahaya
+
+DANGER_MAX_AGES = {k: ALERT_MAX_AGE_DANGER for k in ("depan", "bahaya_kiri", "bahaya_kanan")}
+
+def init_audio():
+    audio = AudioEngine(AUDIO_DIR, AUDIO_METHOD, priorities=ALERT_PRIORITY, fallbacks=DANGER_SIDE_CLIP)
+    audio.on_latency = lambda ms: alert_hist.observe(ms / 1000.0)
+    audio.start()
+    alerts = AlertScheduler(audio, priorities=ALERT_PRIORITY, cooldown=AUDIO_COOLDOWN, global_gap=AUDIO_GAP,
+                            max_age=ALERT_MAX_AGE, max_ages=DANGER_MAX_AGES).start()
+    return audio, alerts
 
 def play_audio(kind:str):
-    global _last_audio_t, _last_audio_kind
-    path = _find_audio(kind)
-    if not path:
+    audio, alerts = navi.audio, navi.alerts
+    if alerts is None:
+        return
+    if not audio.has(kind):
         print(f"[WARN] file audio '{kind}' tidak ditemukan di {AUDIO_DIR}")
         return
-    now = time.time()
-    with audio_lock:
-        if (now - _last_audio_t) < AUDIO_COOLDOWN and kind == _last_audio_kind:
-            return
-        _last_audio_t   = now
-        _last_audio_kind= kind
-    if AUDIO_METHOD.lower() == "pygame":
-        threading.Thread(target=_play_pygame, args=(path,), daemon=True).start()
-    else:
-        threading.Thread(target=_play_aplay,  args=(path,), daemon=True).start()
+    alerts.submit(kind)
+
+def _on_hazard(h):
+    if h["level"] != "ok":
+        pusher.poke()
+    # danger: bahaya_kiri/kanan kalau dipicu track kamera, else 'depan'; caution: arah kalau cukup yakin
+    kind = fusion.alert_kind(h)
+    if kind:
+        play_audio(kind)
+
+fusion.on_hazard = _on_hazard
 
 # ------------------ Flask Web ------------------
 app = Flask(__name__)
@@ -432,7 +542,7 @@ HTML = """
                 <div class="muted">YOLO · Ultrasonic · GPS · Heart Rate · Directional Audio</div>
             </div>
             <div class="flex items-center gap-4">
-                 <div class="muted">Model {{model}} · imgsz {{imgsz}} · conf {{conf}} · Camera /dev/video{{cam}}</div>
+                 <div class="muted">Model {{model}} ({{backend}}) · imgsz {{imgsz}} · conf {{conf}} · Camera /dev/video{{cam}}</div>
                  <button onclick="showPage('page1')" class="text-sm bg-slate-700 hover:bg-slate-600 text-slate-2 00 font-semibold py-2 px-4 rounded-lg transition-colors duration-200">
                     ← Kembali ke Panduan
                  </button>
@@ -443,13 +553,17 @@ HTML = """
             <div class="grid">
                 <div class="card">
                     <h3>Realtime Camera</h3>
-                    <img class="video" src="/video" alt="Realtime camera feed placeholder" />
+                    <img class="video" id="mjpeg" src="/video" alt="Realtime camera feed placeholder" />
+                    <video class="video hidden" id="h264v" muted playsinline></video>
                     <div class="row">
+                        <button class="btn" id="streamBtn">Stream: MJPEG</button>
                         <button class="btn" id="toggleBtn">Toggle Deteksi</button>
                         <button class="btn" onclick="snapshot()">Snapshot</button>
                         <div class="field">CONF <input id="conf" type="number" step="0.01" min="0" max="1" value="{{conf}}"></div>
                         <div class="field">IMGSZ <input id="imgsz" type="number" step="32" min="128" max="1280" value="{{imgsz}}"></div>
                         <div class="field">Every N <input id="processn" type="number" step="1" min="1" max="10" value="{{processn}}"></div>
+                        <div class="field">Model <input id="modelPath" type="text" size="18" placeholder="file di MODEL_DIR"></div>
+                        <button class="btn" id="modelBtn">Ganti Model</button>
                         <span class="muted" id="status"></span>
                     </div>
                 </div>
@@ -467,7 +581,11 @@ HTML = """
                             <div>Uptime: <b id="uptime">-</b></div>
                             <div>Detect: <b id="detect">-</b></div>
                             <div>Direction: <b id="dir">-</b></div>
+                            <div>Hazard: <b id="hazard">-</b></div>
                             <div>Audio: <b id="aud">-</b></div>
+                            <div>Adaptive: <b id="adapt">-</b></div>
+                            <div>Model: <b id="modelInfo">-</b></div>
+                            <div>Alerts (ok/supp/drop): <b id="alerts">-</b></div>
                             <div>Detak Jantung: <b id="hr">-</b></div>
                         </div>
                     </div>
@@ -505,6 +623,7 @@ HTML = """
             const tw1 = document.getElementById('t_warn1');
             const tw2 = document.getElementById('t_warn2');
             if (tw1 && tw2) { tw1.textContent = (window.WARN1 ?? '-'); tw2.textContent = (window.WARN2 ?? '-'); }
+            if (pageId === 'page2' && typeof S !== 'undefined') applyMetrics(S);
         }
 
         // --- Monitor Page Logic ---
@@ -533,6 +652,7 @@ HTML = """
                 marker = L.marker([0, 0]).addTo(map).bindPopup('Menunggu GPS…');
                 pathLine = L.polyline([], { weight: 4, opacity: 0.9, color: '#3b82f6' }).addTo(map);
                 map.setView([0, 0], 2);
+                restoreHistory();
 
                 const fb = document.getElementById('followBtn');
                 fb.onclick = () => {
@@ -543,17 +663,56 @@ HTML = """
             }
         }
 
-        async function tick() {
-            if (!document.getElementById('page2').classList.contains('hidden')) {
-                const j = await getJSON('/metrics');
-                if (!j) { setTimeout(tick, 1000); return; }
+        // Jejak & lubang tersimpan (event log) supaya peta tidak kosong setelah reload
+        async function restoreHistory() {
+            const since = Date.now() / 1000 - 6 * 3600;
+            const tr = await getJSON('/track?since=' + since);
+            if (tr && tr.length) {
+                pathLine.setLatLngs(tr.map(p => [p[1], p[2]]));
+                map.fitBounds(pathLine.getBounds(), { maxZoom: 18 });
+            }
+            const hz = await getJSON('/hazards?since=' + since);
+            (hz || []).forEach(h => {
+                if (h.lat == null || h.lon == null) return;
+                const c = L.circleMarker([h.lat, h.lon], { radius: 6, color: h.level === 'danger' ? '#ef4444' : '#f59e0b' }).addTo(map);
+                const t = new Date(h.ts * 1000).toLocaleTimeString();
+                c.bindPopup(`${h.level} ${h.side || ''} · ${t}` + (h.thumb ? `<br><img src="/hazards/${h.id}/thumb">` : ''));
+            });
+        }
 
+        // --- Render metrics (dipakai oleh push /events maupun polling /metrics) ---
+        let lastLL = null;
+        function applyMetrics(j) {
+            if (!document.getElementById('page2').classList.contains('hidden')) {
                 // General metrics
                 document.getElementById('fps').textContent = j.fps ? j.fps.toFixed(1) : '-';
                 document.getElementById('uptime').textContent = j.uptime_human || '-';
                 document.getElementById('detect').textContent = j.detect_enabled ? 'ON' : 'OFF';
-                document.getElementById('dir').textContent = j.direction || '-';
+                document.getElementById('dir').textContent = (j.direction || '-')
+                    + (j.direction && j.direction_cam ? ' (' + j.direction_cam + ')' : '');
                 document.getElementById('aud').textContent = j.last_audio || '-';
+                const hz = j.hazard;
+                document.getElementById('hazard').textContent = hz
+                    ? hz.level.toUpperCase() + (hz.ttc_s != null ? ' · TTC ' + hz.ttc_s.toFixed(1) + ' s' : '')
+                    : '-';
+                const al = j.alerts;
+                document.getElementById('alerts').textContent = al ? `${al.emitted}/${al.suppressed}/${al.dropped}` : '-';
+                const ad = j.adaptive || {};
+                document.getElementById('adapt').textContent = ad.enabled ? ('ON' + (ad.reason ? ' (' + ad.reason + ')' : '')) : 'OFF';
+                const mi = j.model_info;
+                if (mi) {
+                    document.getElementById('modelInfo').textContent = `v${mi.version} ${mi.name || '-'}`
+                        + (mi.warmup_ms != null ? ' · warm-up ' + mi.warmup_ms + ' ms' : '')
+                        + (j.config_version != null ? ' · config v' + j.config_version : '')
+                        + (mi.pending ? ' · ' + mi.pending + '…' : '');
+                }
+                if (ad.enabled) {
+                    // nilai diubah kontroler -> ikuti di input (kecuali sedang diedit)
+                    [['imgsz', j.imgsz], ['processn', j.process_n]].forEach(([id, v]) => {
+                        const el = document.getElementById(id);
+                        if (document.activeElement !== el) el.value = v;
+                    });
+                }
 
                 // Heart rate (FIXED: use j.hr.bpm and j.hr.spo2)
                 const hrBpm = j.hr && j.hr.bpm;
@@ -601,7 +760,8 @@ HTML = """
                         marker.setLatLng(ll).setPopupContent(
                             `Lat ${glat.toFixed(6)}, Lon ${glon.toFixed(6)}<br><a target="_blank" href="https://maps.google.com/?q=${glat},${glon}">Buka di Google Maps</a>`
                         );
-                        pathLine.addLatLng(ll);
+                        // delta bisa datang karena field lain berubah -> tambah titik hanya kalau posisi baru
+                        if (!lastLL || lastLL[0] !== glat || lastLL[1] !== glon) { pathLine.addLatLng(ll); lastLL = ll; }
 
                         if (follow) {
                             const targetZoom = Math.max(map.getZoom(), 16);
@@ -613,7 +773,10 @@ HTML = """
                         spdEl.textContent = j.gps?.speed_kmh ? (j.gps.speed_kmh.toFixed(1) + ' km/h') : '-';
                         utcEl.textContent = j.gps?.time_utc || '-';
                         gmapsBtn.href = `https://maps.google.com/?q=${glat},${glon}`;
-                        statusEl.textContent = gvalid ? 'GPS fix OK' : 'GPS belum fix';
+                        statusEl.textContent = gvalid
+                            ? ('GPS fix OK' + (j.gps.sats != null ? ' · ' + j.gps.sats + ' sat' : '')
+                               + (j.gps.hdop != null ? ' · HDOP ' + j.gps.hdop : ''))
+                            : 'GPS belum fix';
                     } else {
                         statusEl.textContent = 'menunggu data GPS…';
                         latEl.textContent = lonEl.textContent = '-';
@@ -622,9 +785,25 @@ HTML = """
                     }
                 }
             }
-            setTimeout(tick, 600);
         }
-        tick();
+
+        // Polling /metrics (fallback kalau EventSource tidak ada)
+        async function tick() {
+            const j = await getJSON('/metrics');
+            if (j) applyMetrics(j);
+            setTimeout(tick, j ? 600 : 1000);
+        }
+
+        // Push: /events kirim snapshot penuh ('full') lalu hanya field yang berubah
+        let S = {};
+        function startPush() {
+            if (!window.EventSource) return false;
+            const es = new EventSource('/events');
+            es.addEventListener('full', e => { S = JSON.parse(e.data); applyMetrics(S); });
+            es.onmessage = e => { Object.assign(S, JSON.parse(e.data)); applyMetrics(S); };
+            return true;
+        }
+        if (!startPush()) tick();
 
         document.getElementById('toggleBtn').onclick = async () => {
             const r = await fetch('/toggle', { method: 'POST' });
@@ -647,6 +826,68 @@ HTML = """
         ['conf', 'imgsz', 'processn'].forEach(id => {
             document.getElementById(id).addEventListener('change', applySettings);
         });
+        document.getElementById('modelBtn').onclick = async () => {
+            const path = document.getElementById('modelPath').value.trim();
+            if (!path) return;
+            const r = await fetch('/model', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({path})});
+            const j = await r.json();
+            document.getElementById('status').textContent = j.ok ? 'model di-load di background…' : (j.error || 'gagal');
+        };
+
+        // --- Stream H.264 (fMP4 lewat MediaSource), fallback MJPEG ---
+        let h264Ctl = null;
+        async function startH264(v) {
+            if (!window.MediaSource) return false;
+            const ctl = new AbortController();
+            const r = await fetch('/video.mp4?q=auto', { signal: ctl.signal, cache: 'no-store' }).catch(() => null);
+            if (!r || !r.ok || !r.body) return false;
+            const codec = r.headers.get('X-Codec') || 'avc1.42E01E';
+            if (!MediaSource.isTypeSupported('video/mp4; codecs="' + codec + '"')) { ctl.abort(); return false; }
+            const ms = new MediaSource();
+            v.src = URL.createObjectURL(ms);
+            await new Promise(res => ms.addEventListener('sourceopen', res, { once: true }));
+            const sb = ms.addSourceBuffer('video/mp4; codecs="' + codec + '"');
+            sb.mode = 'sequence';      // server bisa ganti tier (init segment baru) di tengah stream
+            const pend = [];
+            const pump = () => { if (!sb.updating && pend.length) sb.appendBuffer(pend.shift()); };
+            sb.addEventListener('updateend', () => {
+                const b = sb.buffered;
+                if (b.length) {
+                    const end = b.end(b.length - 1);
+                    if (end - v.currentTime > 0.5) v.currentTime = end - 0.05;   // tetap di ujung live
+                    if (v.currentTime - b.start(0) > 10) { sb.remove(b.start(0), v.currentTime - 5); return; }
+                }
+                pump();
+            });
+            const reader = r.body.getReader();
+            (async () => {
+                for (;;) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    pend.push(value);
+                    pump();
+                }
+            })().catch(() => {});
+            v.play().catch(() => {});
+            h264Ctl = ctl;
+            return true;
+        }
+        document.getElementById('streamBtn').onclick = async () => {
+            const img = document.getElementById('mjpeg'), v = document.getElementById('h264v');
+            const btn = document.getElementById('streamBtn');
+            if (h264Ctl) {
+                h264Ctl.abort(); h264Ctl = null;
+                v.removeAttribute('src'); v.load(); v.classList.add('hidden');
+                img.src = '/video'; img.classList.remove('hidden');
+                btn.textContent = 'Stream: MJPEG';
+                return;
+            }
+            img.src = ''; img.classList.add('hidden'); v.classList.remove('hidden');
+            if (await startH264(v)) { btn.textContent = 'Stream: H.264'; return; }
+            // browser/server tidak mendukung -> kembali ke MJPEG
+            v.classList.add('hidden'); img.src = '/video'; img.classList.remove('hidden');
+            document.getElementById('status').textContent = 'H.264 tidak tersedia, tetap MJPEG';
+        };
 
         async function snapshot() {
             const r = await fetch('/snapshot', { cache: 'no-store' });
@@ -684,94 +925,804 @@ def decide_direction_from_boxes(boxes, w):
     if nx > RIGHT_THRESH: return "kanan"
     return None
 
-# --------- Video generator ----------
-def gen_frames():
-    global fps_val, last_jpg, _last_dir, _persist_count, _last_audio_kind
-    frame_id = 0
+# --------- Frame hub (broadcast MJPEG) ----------
+MJPEG_HDR = b'--frame\r\nX-Accel-Buffering: no\r\nContent-Type: image/jpeg\r\n\r\n'
+
+class _Subscriber:
+    """Antrian per-viewer; kalau penuh, frame paling lama dibuang (bukan menumpuk)."""
+    def __init__(self, maxlen):
+        self.q = deque(maxlen=maxlen)
+        self.cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, chunk):
+        with self.cond:
+            if len(self.q) == self.q.maxlen:
+                self.dropped += 1
+            self.q.append(chunk)
+            self.cond.notify()
+
+    def get(self, timeout=1.0):
+        with self.cond:
+            if not self.q and not self.cond.wait(timeout):
+                return None
+            return self.q.popleft() if self.q else None
+
+class FrameHub:
+    """Encode sekali per frame, bagikan bytes yang sama ke semua viewer /video."""
+    def __init__(self, maxlen=2):
+        self.maxlen = maxlen
+        self.lock = threading.Lock()
+        self.subs = set()
+        self.latest = None    # JPEG terakhir (untuk /snapshot)
+        self.seq = 0
+        self.dropped_gone = 0 # frame terbuang milik viewer yang sudah putus (untuk counter kumulatif)
+
+    def subscribe(self, sub=None):
+        """sub: objek dengan put(chunk) & dropped (mis. subscriber async); default antrian thread."""
+        sub = sub or _Subscriber(self.maxlen)
+        with self.lock:
+            self.subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.lock:
+            if sub in self.subs:
+                self.subs.discard(sub)
+                self.dropped_gone += sub.dropped
+
+    def publish(self, jpg):
+        chunk = b''.join((MJPEG_HDR, jpg, b'\r\n'))   # dibangun sekali, dipakai semua viewer
+        with self.lock:
+            self.latest = jpg
+            self.seq += 1
+            subs = list(self.subs)
+        for sub in subs:
+            sub.put(chunk)
+
+    def viewers(self):
+        return len(self.subs)
+
+    def stats(self):
+        with self.lock:
+            cur = sum(s.dropped for s in self.subs)
+            return {"viewers": len(self.subs), "dropped": cur, "dropped_total": self.dropped_gone + cur}
+
+hub = FrameHub(maxlen=STREAM_QUEUE)
+h264 = H264Hub(fps=H264_FPS, gop=H264_GOP, codec=H264_CODEC) if H264_STREAM else None
+
+# --------- Push metrics (SSE /events) ----------
+class _SseSub:
+    def __init__(self, maxlen):
+        self.q = deque(maxlen=maxlen)
+        self.cond = threading.Condition()
+
+    def put(self, msg, full_msg):
+        with self.cond:
+            if len(self.q) == self.q.maxlen:
+                # klien lambat: delta tidak boleh hilang sebagian -> ganti dengan snapshot penuh
+                self.q.clear()
+                msg = full_msg
+            self.q.append(msg)
+            self.cond.notify()
+
+    def get(self, timeout):
+        with self.cond:
+            if not self.q and not self.cond.wait(timeout):
+                return None
+            return self.q.popleft() if self.q else None
+
+class StatePusher:
+    """Satu thread mengumpulkan state ringkas dashboard, kirim hanya field yang berubah (delta)
+    ke semua subscriber, dengan batas laju min_interval."""
+    def __init__(self, collect, min_interval=0.05, slow_every=1.0, maxlen=16):
+        self.collect = collect            # collect(slow:bool) -> dict
+        self.min_interval = min_interval
+        self.slow_every = slow_every
+        self.maxlen = maxlen
+        self.cond = threading.Condition()
+        self.subs = set()
+        self.state = {}
+        self._poked = False
+        self._thread = None
+
+    def _event(self, name, data):
+        head = f"event: {name}\n" if name else ""
+        return (head + "data: " + json.dumps(data, separators=(",", ":")) + "\n\n").encode()
+
+    def subscribe(self, sub=None):
+        sub = sub or _SseSub(self.maxlen)
+        with self.cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self.subs.add(sub)
+            if self.state:
+                sub.put(self._event("full", self.state), None)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self.cond:
+            self.subs.discard(sub)
+
+    def poke(self):
+        """Ada perubahan penting (hazard/alert) -> kirim secepatnya (tetap dibatasi min_interval)."""
+        with self.cond:
+            self._poked = True
+            self.cond.notify()
+
+    def _run(self):
+        t_slow = 0.0
+        while True:
+            with self.cond:
+                if not self._poked:
+                    self.cond.wait(0.25)
+                self._poked = False
+                if not self.subs:
+                    continue
+            now = time.time()
+            slow = now - t_slow >= self.slow_every
+            if slow:
+                t_slow = now
+            try:
+                cur = self.collect(slow)
+            except Exception:
+                errors.inc(source="push")
+                continue
+            with self.cond:
+                delta = {k: v for k, v in cur.items() if self.state.get(k) != v}
+                if delta:
+                    self.state.update(delta)
+                    msg, full = self._event(None, delta), self._event("full", self.state)
+                    for sub in self.subs:
+                        sub.put(msg, full)
+            time.sleep(self.min_interval)
+
+    def stream(self, keepalive=15.0):
+        sub = self.subscribe()
+        try:
+            while True:
+                msg = sub.get(timeout=keepalive)
+                yield msg if msg is not None else b": ka\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+# --------- Detection pipeline (capture -> infer -> render/encode) ----------
+# Tiga thread dengan slot "latest wins" di antaranya: kamera tidak menunggu model,
+# model selalu dapat frame terbaru, encode JPEG jalan paralel dengan inferensi berikutnya.
+class LatestSlot:
+    """Slot tunggal: put() menimpa item yang belum diambil, take() menunggu item baru."""
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.item = None
+        self.overwritten = 0
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                self.overwritten += 1
+            self.item = item
+            self.cond.notify()
+
+    def pending(self):
+        return self.item is not None
+
+    def take(self, timeout=1.0):
+        with self.cond:
+            if self.item is None and not self.cond.wait_for(lambda: self.item is not None, timeout):
+                return None
+            item, self.item = self.item, None
+            return item
+
+cap_slot    = LatestSlot()   # capture -> infer
+render_slot = LatestSlot()   # infer -> render/encode
+
+stage_lock = threading.Lock()
+stage_ms = {"capture": 0.0, "age": 0.0, "infer": 0.0, "post": 0.0, "alert": 0.0, "render": 0.0, "encode": 0.0, "latency": 0.0}
+
+def _stage_update(name, ms):
+    stage_hist.observe(ms / 1000.0, stage=name)
+    with stage_lock:
+        stage_ms[name] = fps_alpha*ms + (1.0-fps_alpha)*stage_ms[name]
+
+class CamView:
+    """Kamera tambahan: capture, slot, tracker sendiri (id track per kamera) + frame terakhir."""
+    def __init__(self, idx, name, near, cap):
+        self.idx, self.name, self.near, self.cap = idx, name, near, cap
+        self.slot = LatestSlot()
+        self.engine = None
+        self.tracker = Tracker(confirm_hits=MIN_PERSIST_FRM, max_misses=TRACK_MAX_MISS)
+        self.tracks = []
+        self.frame = None        # frame terakhir (untuk inset overlay & thumbnail)
+
+    def info(self):
+        return {"index": self.idx, "name": self.name, "near": self.near, "tracks": len(self.tracks),
+                "capture": (self.engine.stats() if self.engine else None)}
+
+def _capture_engine(cap, slot):
+    cfg = config.cur
+    target = max((cfg["imgsz"],) + (ADAPT_SIZES if cfg["adaptive"] else ()))
+    def _on_frame(ms):
+        _stage_update("capture", ms)
+        frames.inc(stage="captured")
+    return CaptureEngine(cap, slot, pool_size=CAP_POOL, decode=CAP_DECODE, target=(target, 0),
+                         stale_ms=CAP_STALE_MS, on_frame=_on_frame,
+                         on_error=lambda kind: errors.inc(source=kind)).start()
+
+def start_capture():
+    """grab() terus di thread CaptureEngine; hanya frame yang akan dipakai di-retrieve/decode."""
+    for cv in navi.extra_cams:
+        cv.engine = _capture_engine(cv.cap, cv.slot)
+    return _capture_engine(navi.cap, cap_slot)
+
+tracker = Tracker(confirm_hits=MIN_PERSIST_FRM, max_misses=TRACK_MAX_MISS)
+roi = RoiSelector(ROI_MODE, parse_roi(ROI), full_every=ROI_FULL_EVERY)
+
+def _proximity(tr, H, near):
+    """Kedekatan track 0..1 (tepi bawah box); kamera menunduk punya batas bawah 'near'."""
+    return max(near, tr.box()[3] / H)
+
+def infer_step(frame_id, t_cap, frame, extra=()):
+    """Satu tick: ROI -> deteksi (batch semua kamera) -> tracker -> arah -> fusion (alert lewat _on_hazard).
+    extra = [(CamView, t, frame)] frame kamera tambahan pada tick yang sama.
+    Dipakai infer_worker dan replay.py. Return (item render, inferred)."""
+    global _last_dir, track_info
+    cfg, model = config.cur, navi.model    # satu snapshot konfigurasi + model untuk seluruh frame
+    H, W = frame.shape[:2]
+    inferred = False
+    roi_box = None
+    t0 = None
+    got = {cv.name for cv, _, _ in extra}
+    for cv, _, f in extra:
+        cv.frame = f
+
+    if not cfg["detect"]:
+        tracker.reset()
+        tracks = []
+        for cv in navi.extra_cams:
+            cv.tracker.reset()
+            cv.tracks = []
+    elif frame_id % max(1, cfg["process_n"]) == 0:
+        inferred = True
+        t_inf = time.perf_counter()
+        roi_box = roi.region(W, H)
+        rx1, ry1 = (roi_box[0], roi_box[1]) if roi_box is not None else (0, 0)
+        # crop = view (tanpa copy); koordinat box dikembalikan ke frame penuh
+        crop = frame if roi_box is None else frame[roi_box[1]:roi_box[3], roi_box[0]:roi_box[2]]
+        try:
+            if extra:
+                # semua kamera dalam SATU panggilan model
+                res = model.detect_batch([crop] + [f for _, _, f in extra], cfg["imgsz"], cfg["conf"])
+            else:
+                res = [model.detect(crop, cfg["imgsz"], cfg["conf"])]
+        except Exception:
+            errors.inc(source="infer")
+            res = [[] for _ in range(1 + len(extra))]
+        boxes = [(x1+rx1, y1+ry1, x2+rx1, y2+ry1, c) for x1, y1, x2, y2, c in res[0]]
+        t0 = time.perf_counter()
+        _stage_update("infer", (t0 - t_inf) * 1000.0)
+        frames.inc(stage="inferred")
+        roi.observe(boxes, W, H)
+        tracks = tracker.step(boxes, t_cap)
+        for (cv, t, _), b in zip(extra, res[1:]):
+            cv.tracks = cv.tracker.step(b, t)
+        for cv in navi.extra_cams:
+            if cv.name not in got:
+                cv.tracks = cv.tracker.predict(t_cap)
+    else:
+        # frame tanpa inferensi: ekstrapolasi posisi track
+        t0 = time.perf_counter()
+        tracks = tracker.predict(t_cap)
+        for cv in navi.extra_cams:
+            cv.tracks = cv.tracker.predict(t_cap)
+
+    # Keputusan arah dari track terkonfirmasi (bukan box mentah per frame), di kamera
+    # tempat lubang terdekat terlihat
+    tboxes = [tr.box() for tr in tracks]
+    cams = [(CAMS[0][1], tracks, frame, 0.0)] + [(cv.name, cv.tracks, cv.frame, cv.near)
+                                                for cv in navi.extra_cams if cv.frame is not None]
+    best = None
+    for name, trs, f, near in cams:
+        if trs:
+            tr = max(trs, key=lambda tr: tr.box()[3])
+            p = _proximity(tr, f.shape[0], near)
+            if best is None or p > best[0]:
+                best = (p, name, tr, trs, f)
+    near = None
+    if best is not None:
+        p, cam, near, trs, nf = best
+        nh, nw = nf.shape[:2]
+        direction = decide_direction_from_boxes([tr.box() for tr in trs], nw)
+        nb = near.box()
+        track_info = {"count": sum(len(c[1]) for c in cams), "nearest_id": near.id,
+                      "approach": near.approach_px / nh, "cam": cam,
+                      "cameras": {c[0]: len(c[1]) for c in cams}}
+        fusion.update_vision(direction, nb[4], p, track_info["approach"], t_cap)
+    else:
+        direction = None
+        track_info = {"count": 0, "nearest_id": None, "approach": None, "cam": None,
+                      "cameras": {c[0]: 0 for c in cams}}
+        fusion.clear_vision(t_cap)
+    _last_dir = direction
+
+    if t0 is not None:
+        # postprocess = tracker + arah + fusion (+ submit alert)
+        _stage_update("post", (time.perf_counter() - t0) * 1000.0)
+
+    # alert sudah diputuskan di _on_hazard; di sini cukup ambil state untuk overlay
+    hz = fusion.hazard()
+    d, danger = hz["distance_m"], hz["level"] == "danger"
+    if hz["level"] != "ok" and near is not None and navi.store is not None:
+        # hanya bahaya dengan track kamera yang dicatat sebagai lubang; bahaya dari ultrasonik
+        # saja (dinding, orang, sepeda parkir) tidak masuk log/peta lubang
+        log_hazard(hz, near.box(), (best[4] if best else frame), t_cap, cam=(best[1] if best else None))
+    insets = [(cv.frame, [tr.box() for tr in cv.tracks], cv.name) for cv in navi.extra_cams
+              if cv.frame is not None]
+    return (t_cap, frame, tboxes, direction, d, danger, roi_box, insets), inferred
+
+# --------- Log kejadian ----------
+_logged_tracks = deque(maxlen=256)   # id track yang sudah dicatat (satu baris per lubang)
+
+def _thumb(frame, box, size=96):
+    x1, y1, x2, y2 = (int(v) for v in box[:4])
+    crop = frame[max(0, y1):max(y1 + 1, y2), max(0, x1):max(x1 + 1, x2)]
+    if crop.size == 0:
+        return None
+    s = size / max(crop.shape[:2])
+    if s < 1.0:
+        crop = cv2.resize(crop, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", crop, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+    return buf.tobytes() if ok else None
+
+def log_hazard(hz, nb, frame, t, cam=None):
+    """Catat lubang terkonfirmasi (track kamera nb), sekali per track."""
+    key = (cam, nb[5])        # id track unik per kamera
+    if key in _logged_tracks:
+        return
+    _logged_tracks.append(key)
+    g = gps_ring.latest()
+    lat, lon = (g["lat"], g["lon"]) if (g and g["valid"]) else (None, None)
+    thumb = _thumb(frame, nb) if EVENT_THUMB else None
+    if lat is not None:
+        hazmap.add(lat, lon, hz["side"], ts=time.time())     # langsung ikut peringatan dini di lintasan berikutnya
+    d = hz["distance_m"]
+    navi.store.log_hazard(time.time(), lat, lon, hz["level"], hz["side"], hz["confidence"],
+                          (None if d is None else round(d, 3)), hz["ttc_s"], track_id=nb[5], thumb=thumb)
+
+def infer_worker():
     while True:
-        ok, frame = cap.read()
-        if not ok:
-            time.sleep(0.1)
+        item = cap_slot.take()
+        if item is None:
             continue
-        t0 = time.time()
-
-        H, W = frame.shape[:2]
-        out = frame
-        boxes = []
+        frame_id, t_cap, frame = item
+        # umur frame: sensor (timestamp buffer) -> mulai dipakai
+        _stage_update("age", (time.perf_counter() - t_cap) * 1000.0)
+        # frame kamera lain dari tick yang sama (tunggu maksimal CAM_SYNC_MS total)
+        extra = []
+        deadline = time.perf_counter() + CAM_SYNC_MS / 1000.0
+        for cv in navi.extra_cams:
+            it = cv.slot.take(timeout=max(0.0, deadline - time.perf_counter()))
+            if it is not None:
+                extra.append((cv, it[1], it[2]))
+        out, inferred = infer_step(frame_id, t_cap, frame, extra)
+        if inferred:
+            # capture -> keputusan alert (dipakai kontroler adaptif)
+            _stage_update("alert", (time.perf_counter() - t_cap) * 1000.0)
+        render_slot.put(out)
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_GUIDE = (60,60,60)
+
+def _draw_inset(img, frame, boxes, name, slot):
+    """Kamera tambahan sebagai gambar kecil di pojok kanan bawah (1/4 lebar), box ikut diskalakan."""
+    H, W = img.shape[:2]
+    h, w = frame.shape[:2]
+    s = (W / 4.0) / w
+    iw, ih = int(w * s), int(h * s)
+    x0, y0 = W - (iw + 8) * (slot + 1), H - ih - 8
+    if x0 < 0 or y0 < 0:
+        return
+    img[y0:y0+ih, x0:x0+iw] = cv2.resize(frame, (iw, ih), interpolation=cv2.INTER_AREA)
+    amber = bgr_color("amber")
+    for b in boxes:
+        cv2.rectangle(img, (x0 + int(b[0]*s), y0 + int(b[1]*s)), (x0 + int(b[2]*s), y0 + int(b[3]*s)), amber, 1)
+    cv2.rectangle(img, (x0, y0), (x0+iw, y0+ih), _GUIDE, 1)
+    cv2.putText(img, name, (x0 + 4, y0 + 14), _FONT, 0.45, bgr_color("yellow"), 1, cv2.LINE_AA)
+
+def draw_overlay(img, boxes, direction, d, danger, roi_box=None, insets=()):
+    """Gambar box, garis bantu kiri/kanan, badge jarak & arah langsung di buffer (in-place)."""
+    H, W = img.shape[:2]
+    amber = bgr_color("amber")
+    for i, (f, b, name) in enumerate(insets):
+        _draw_inset(img, f, b, name, i)
+    if roi_box is not None:
+        cv2.rectangle(img, roi_box[:2], roi_box[2:], _GUIDE, 1)
+    for b in boxes:
+        p1 = (int(b[0]), int(b[1]))
+        cv2.rectangle(img, p1, (int(b[2]),int(b[3])), amber, 2)
+        label = f"#{b[5]} {b[4]:.2f}" if len(b) > 5 else f"{b[4]:.2f}"
+        cv2.putText(img, label, (p1[0], max(12, p1[1]-6)), _FONT, 0.5, amber, 1, cv2.LINE_AA)
+
+    # Garis bantu arah
+    lx = int(LEFT_THRESH  * W)
+    rx = int(RIGHT_THRESH * W)
+    cv2.line(img, (lx,0), (lx,H), _GUIDE, 1)
+    cv2.line(img, (rx,0), (rx,H), _GUIDE, 1)
+
+    # Badge jarak
+    label = "Distance: -- m" if d is None else f"Distance: {d:.2f} m"
+    if d is None:
+        color = bgr_color("gray")
+    elif d < DIST_WARN2:
+        color = bgr_color("red")
+    elif d < DIST_WARN1:
+        color = amber
+    else:
+        color = bgr_color("green")
+    cv2.rectangle(img, (8,8), (300,48), bgr_color("black"), -1)
+    cv2.putText(img, label, (14,38), _FONT, 0.8, color, 2, cv2.LINE_AA)
+
+    # Tampilkan arah (kalau ada)
+    if direction:
+        cv2.putText(img, f"Arah: {direction.upper()}", (14,72), _FONT, 0.8, bgr_color("yellow"), 2, cv2.LINE_AA)
+    if danger:
+        cv2.putText(img, "DANGER", (14,106), _FONT, 0.9, bgr_color("red"), 2, cv2.LINE_AA)
+    return img
+
+def encode_jpg(img):
+    ok, jpg = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+    return jpg.tobytes() if ok else None
+
+_idle_item = None   # item terakhir yang tidak di-render (tidak ada viewer), untuk /snapshot
+
+def render_worker():
+    global fps_val, _idle_item
+    t_prev = None
+    while True:
+        item = render_slot.take()
+        if item is None:
+            continue
+        t_cap, frame, boxes, direction, d, danger, roi_box, insets = item
 
-        if DETECT_ENABLED and (frame_id % max(1, PROCESS_EVERY_N) == 0):
+        h264_on = h264 is not None and h264.viewers() > 0
+        if hub.viewers() == 0 and not h264_on:
+            # tidak ada yang menonton /video: lewati render + encode sama sekali
+            _idle_item = item
+        else:
+            _idle_item = None
+            t0 = time.perf_counter()
+            draw_overlay(frame, boxes, direction, d, danger, roi_box, insets)
+            t1 = time.perf_counter()
+            _stage_update("render", (t1 - t0) * 1000.0)
+            if h264_on:
+                h264.submit(frame)     # di-encode thread H.264 sendiri, tidak menahan render
+            if hub.viewers():
+                jpg = encode_jpg(frame)
+                _stage_update("encode", (time.perf_counter() - t1) * 1000.0)
+                if jpg is not None:
+                    hub.publish(jpg)
+            frames.inc(stage="rendered")
+
+        t2 = time.perf_counter()
+        _stage_update("latency", (t2 - t_cap) * 1000.0)
+        # FPS = laju frame keluar dari pipeline
+        if t_prev is not None:
+            inst = 1.0 / max(t2 - t_prev, 1e-6)
+            fps_val = fps_alpha*inst + (1.0-fps_alpha)*fps_val
+        t_prev = t2
+
+# --------- Kontrol adaptif ----------
+adapt_info = {"temp_c": None, "throttled": None, "reason": None}
+
+def _adapt_sizes():
+    fixed = getattr(navi.model, "fixed_imgsz", None)
+    return (fixed,) if fixed else ADAPT_SIZES
+
+def adaptive_worker():
+    global adapt_info
+    controller = AdaptiveController(target_ms=LATENCY_TARGET_MS, sizes=_adapt_sizes(), max_skip=ADAPT_MAX_SKIP)
+    model_version = models.info["version"]
+    while True:
+        time.sleep(1.0)
+        temp, thr = read_cpu_temp(), read_throttled()
+        adapt_info = {"temp_c": temp, "throttled": thr, "reason": controller.reason}
+        if models.info["version"] != model_version:
+            # model baru bisa ber-imgsz tetap (export statis)
+            model_version = models.info["version"]
+            controller = AdaptiveController(target_ms=LATENCY_TARGET_MS, sizes=_adapt_sizes(),
+                                            max_skip=ADAPT_MAX_SKIP)
+        cfg = config.cur
+        if not (cfg["adaptive"] and cfg["detect"]):
+            continue
+        with stage_lock:
+            lat = stage_ms["alert"]
+        g = gps_ring.latest()
+        spd = g["speed_kmh"] if g else None
+        sz, n = controller.step(cfg["imgsz"], cfg["process_n"], lat, temp, thr, spd)
+        if (sz, n) != (cfg["imgsz"], cfg["process_n"]):
+            print(f"[INFO] adaptive ({controller.reason}): imgsz {cfg['imgsz']}->{sz}, every_n {cfg['process_n']}->{n} "
+                  f"(latency {lat:.0f} ms, temp {temp}, speed {spd})")
+            config.update(source="adaptive", imgsz=sz, process_n=n)
+
+# --------- Aplikasi: startup paralel & readiness ----------
+class NaviApp:
+    """Pemegang semua subsistem. Import modul tidak menyentuh hardware; start() menyalakan
+    kamera, model, audio dan sensor secara paralel, /healthz melaporkan kesiapan tiap subsistem."""
+    REQUIRED = ("camera", "model")
+
+    def __init__(self):
+        self.cap = None
+        self.cam_idx = None
+        self.audio = None
+        self.alerts = None
+        self.ranger = None
+        self.gps_ser = None
+        self.gps = None
+        self.capture = None
+        self.extra_cams = []       # CamView kamera tambahan (CAMERAS)
+        self.hrm = None
+        self.store = None
+        self.lock = threading.Lock()
+        self.status = {k: {"state": "pending", "error": None, "ms": None}
+                       for k in ("camera", "model", "audio", "ultrasonic", "gps", "hr", "events", "hazmap")}
+        self._pipeline_started = False
+        self._announced = False
+        self.t_start = None
+
+    def ready(self, name):
+        return self.status[name]["state"] == "ready"
+
+    def _run(self, name, fn, retry=None):
+        t0 = time.perf_counter()
+        with self.lock:
+            self.status[name]["state"] = "starting"
+        while True:
+            try:
+                fn()
+                break
+            except Exception as e:
+                with self.lock:
+                    first = self.status[name]["error"] != str(e)
+                    self.status[name].update(state="error", error=str(e))
+                if first:
+                    print(f"[WARN] {name} gagal init: {e}" + (f" (coba lagi tiap {retry:g} s)" if retry else ""))
+                if not retry:
+                    return
+                time.sleep(retry)
+        with self.lock:
+            self.status[name].update(state="ready", error=None, ms=round((time.perf_counter() - t0) * 1000))
+        self._maybe_start_pipeline()
+
+    def _init_camera(self):
+        self.cap, self.cam_idx = open_cam(CAMS[0][0])
+        for idx, name, near in CAMS[1:]:
+            if any(cv.idx == idx for cv in self.extra_cams):
+                continue
+            try:
+                cap, _ = open_cam(idx, use_cache=False)
+                self.extra_cams.append(CamView(idx, name, near, cap))
+                print(f"[OK ] Kamera tambahan '{name}': /dev/video{idx} (near {near:g})")
+            except Exception as e:
+                print(f"[WARN] Kamera tambahan '{name}' (/dev/video{idx}) gagal: {e}")
+
+    @property
+    def model(self):
+        return models.active
+
+    @model.setter
+    def model(self, m):
+        # pasang langsung tanpa warm-up (replay.py membungkus model dengan TimedModel)
+        models.install(m, MODEL_PATH, INFER_BACKEND)
+
+    def _init_model(self):
+        info = models.load_now(MODEL_PATH, INFER_BACKEND, config.cur["imgsz"], warmup_shapes())
+        print(f"[OK ] Model v{info['version']} siap (load {info['load_ms']} ms, warm-up {info['warmup_ms']} ms)")
+
+    def _init_audio(self):
+        self.audio, self.alerts = init_audio()
+        if PREWARN and (PREWARN_CLIP in ALERT_KINDS or not self.audio.has(PREWARN_CLIP)):
+            print(f"[WARN] klip peringatan dini '{PREWARN_CLIP}' tidak ada / sama dengan klip bahaya, "
+                  f"peringatan dini tanpa suara")
+        # audio bisa selesai init setelah kamera & model: pipeline sudah jalan tanpa cue
+        self._announce_ready()
+
+    def _init_ultrasonic(self):
+        self.ranger = init_ultrasonic()
+
+    def _init_gps(self):
+        self.gps_ser = init_gps()
+        self.gps = GpsReader(self.gps_ser, gps_ring, on_fix=_on_gps_fix,
+                             on_error=lambda kind: errors.inc(source="gps_" + kind)).start()
+
+    def _init_hr(self):
+        self.hrm = init_hr()
+        threading.Thread(target=hr_worker, args=(self.hrm,), daemon=True).start()
+
+    def _init_events(self):
+        if not EVENT_DB:
+            raise RuntimeError("EVENT_DB kosong (log kejadian dimatikan)")
+        self.store = EventStore(EVENT_DB, max_bytes=int(EVENT_DB_MAX_MB * (1 << 20)), flush_s=EVENT_FLUSH_S).start()
+        print(f"[OK ] Event log: {EVENT_DB} (flush tiap {EVENT_FLUSH_S:g} s, maks {EVENT_DB_MAX_MB:g} MB)")
+
+    def _init_hazmap(self):
+        t0 = time.perf_counter()
+        n = hazmap.load_sqlite(EVENT_DB) if EVENT_DB else 0
+        if HAZARD_MAP:
+            n += hazmap.load_csv(HAZARD_MAP, count=PREWARN_MIN_SIGHTINGS)   # peta kurasi = sudah terkonfirmasi
+        st = hazmap.stats()
+        print(f"[OK ] Peta lubang: {n} sighting -> {st['hazards']} lubang dalam "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def _maybe_start_pipeline(self):
+        with self.lock:
+            if self._pipeline_started or not all(self.ready(k) for k in self.REQUIRED):
+                return
+            self._pipeline_started = True
+        self.capture = start_capture()
+        for worker in (infer_worker, render_worker, adaptive_worker):
+            threading.Thread(target=worker, daemon=True).start()
+        print(f"[OK ] Pipeline jalan ({time.perf_counter() - self.t_start:.1f} s sejak start)")
+        self._announce_ready()
+
+    def _announce_ready(self):
+        """Cue "siap" sekali, begitu pipeline jalan DAN audio siap, apa pun urutan init-nya."""
+        with self.lock:
+            if self._announced or not self._pipeline_started or self.alerts is None:
+                return
+            self._announced = True
+        if self.audio.has("siap"):
+            self.alerts.submit("siap")
+
+    def start(self):
+        self.t_start = time.perf_counter()
+        for name, fn, retry in (("camera", self._init_camera, 5.0), ("model", self._init_model, None),
+                                ("audio", self._init_audio, None), ("ultrasonic", self._init_ultrasonic, None),
+                                ("gps", self._init_gps, None), ("hr", self._init_hr, None),
+                                ("events", self._init_events, None), ("hazmap", self._init_hazmap, None)):
+            threading.Thread(target=self._run, args=(name, fn, retry), daemon=True).start()
+        return self
+
+    def health(self):
+        with self.lock:
+            subs = {k: dict(v) for k, v in self.status.items()}
+        return {"ready": all(subs[k]["state"] == "ready" for k in self.REQUIRED),
+                "pipeline": self._pipeline_started, "subsystems": subs}
+
+    def close(self):
+        if self.capture:
+            self.capture.close()
+        for cv in self.extra_cams:
+            if cv.engine:
+                cv.engine.close()
             try:
-                results = model(out, imgsz=IMGSZ, conf=CONF, verbose=False)
-                out = results[0].plot()
-                b = results[0].boxes
-                if b is not None and b.xyxy is not None and b.conf is not None:
-                    for (x1,y1,x2,y2), conf in zip(b.xyxy.cpu().numpy(), b.conf.cpu().numpy()):
-                        boxes.append((float(x1),float(y1),float(x2),float(y2),float(conf)))
+                cv.cap.release()
             except Exception:
-                out = frame
-
-        # Garis bantu arah
-        lx = int(LEFT_THRESH  * W)
-        rx = int(RIGHT_THRESH * W)
-        cv2.line(out, (lx,0), (lx,H), (60,60,60), 1)
-        cv2.line(out, (rx,0), (rx,H), (60,60,60), 1)
-
-        # Keputusan arah
-        direction = decide_direction_from_boxes(boxes, W)
-
-        # Overlay jarak
-        with distance_lock:
-            d = distance_m
-        label = "Distance: -- m" if d is None else f"Distance: {d:.2f} m"
-        if d is None:
-            color = bgr_color("gray")
-        elif d < DIST_WARN2:
-            color = bgr_color("red")
-        elif d < DIST_WARN1:
-            color = bgr_color("amber")
-        else:
-            color = bgr_color("green")
-        cv2.rectangle(out, (8,8), (300,48), bgr_color("black"), -1)
-        cv2.putText(out, label, (14,38), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2, cv2.LINE_AA)
-
-        # Tampilkan arah (kalau ada)
-        if direction:
-            cv2.putText(out, f"Arah: {direction.upper()}",
-                        (14,72), cv2.FONT_HERSHEY_SIMPLEX, 0.8, bgr_color("yellow"), 2, cv2.LINE_AA)
-
-        # Audio logic: prioritas danger-depan
-        danger = (d is not None and d < DIST_WARN2)
-        if danger:
-            play_audio("depan")
-            cv2.putText(out, "DANGER", (14,106), cv2.FONT_HERSHEY_SIMPLEX, 0.9, bgr_color("red"), 2, cv2.LINE_AA)
-        else:
-            # butuh konsistensi beberapa frame agar tidak terlalu sensitif
-            if direction == _last_dir and direction is not None:
-                _persist_count += 1
-            else:
-                _persist_count = 1
-                _last_dir = direction
-            if direction and _persist_count >= MIN_PERSIST_FRM:
-                play_audio(direction)  # 'kiri' atau 'kanan'
-                _persist_count = 0
-
-        # FPS
-        dt = time.time() - t0
-        inst = 1.0 / max(dt, 1e-6)
-        fps_val = fps_alpha*inst + (1.0-fps_alpha)*fps_val
-
-        ok2, jpg = cv2.imencode('.jpg', out, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
-        if ok2:
-            last_jpg = jpg.tobytes()
-            yield (b'--frame\r\nX-Accel-Buffering: no\r\nContent-Type: image/jpeg\r\n\r\n' + last_jpg + b'\r\n')
-        frame_id += 1
+                pass
+        try:
+            if self.cap: self.cap.release()
+        except Exception:
+            pass
+        if self.ranger:
+            self.ranger.close()
+        if self.gps:
+            self.gps.close()
+        try:
+            if self.gps_ser: self.gps_ser.close()
+        except Exception:
+            pass
+        try:
+            if self.hrm and hasattr(self.hrm, "stop_sensor"): self.hrm.stop_sensor()
+        except Exception:
+            pass
+        if self.store:
+            self.store.close()
+        if hasattr(self.model, "close"):
+            self.model.close()
+
+navi = NaviApp()
+
+# --------- Video generator (reader) ----------
+def gen_frames():
+    sub = hub.subscribe()
+    try:
+        while True:
+            chunk = sub.get(timeout=1.0)
+            if chunk is not None:
+                yield chunk
+    finally:
+        hub.unsubscribe(sub)
+
+# --------- State ringkas untuk push /events ----------
+_slow_state = {}
+
+def _model_summary():
+    a, pend = models.info, models.pending
+    return {"version": a["version"], "name": (os.path.basename(a["path"]) if a["path"] else None),
+            "backend": a["backend"], "warmup_ms": a["warmup_ms"],
+            "pending": (pend["state"] if pend and pend["state"] != "done" else None)}
+
+def collect_push_state(slow):
+    """Field yang sama namanya dengan /metrics, supaya dashboard bisa pakai satu renderer."""
+    global _slow_state
+    with distance_lock:
+        d = distance_m
+    hz = fusion.hazard()
+    alerts = navi.alerts
+    cur = {
+        "distance_m": (None if d is None else round(d, 2)),
+        "direction": _last_dir,
+        "direction_cam": (track_info["cam"] if navi.extra_cams else None),
+        "hazard": {"level": hz["level"], "side": hz["side"], "ttc_s": hz["ttc_s"]},
+        "last_audio": (alerts.last_kind if alerts else None),
+        "detect_enabled": config.cur["detect"],
+    }
+    if slow:
+        cfg = config.cur
+        g = gps_snapshot()
+        with hr_lock:
+            h = dict(hr_metrics)
+        uptime = time.time() - start_ts
+        _slow_state = {
+            "gps": g,
+            "hr": h,
+            "fps": round(fps_val, 1),
+            "uptime_human": f"{int(uptime//3600)}h {int((uptime%3600)//60)}m {int(uptime%60)}s",
+            "alerts": ({k: v for k, v in alerts.stats().items() if k in ("emitted", "suppressed", "dropped")}
+                       if alerts else None),
+            "adaptive": {"enabled": cfg["adaptive"], "reason": adapt_info.get("reason")},
+            "imgsz": cfg["imgsz"],
+            "process_n": cfg["process_n"],
+            "config_version": cfg["version"],
+            "model_info": _model_summary(),
+        }
+    cur.update(_slow_state)
+    return cur
+
+server = None     # AsyncServer kalau SERVER=async
+
+pusher = StatePusher(collect_push_state, min_interval=float(os.getenv("PUSH_MIN_INTERVAL", "0.05")))
+
+# --------- Metrik dari counter subsistem (dibaca saat scrape) ----------
+def _alert_counts():
+    a = navi.alerts
+    return {k: v for k, v in a.stats().items() if k in ("emitted", "suppressed", "coalesced", "dropped")} if a else {}
+
+reg.counter_fn("frames_dropped_total", "Frame dibuang karena tahap berikutnya/viewer tertinggal",
+               lambda: {"capture_slot": cap_slot.overwritten, "render_slot": render_slot.overwritten,
+                        "mjpeg_viewer": hub.stats()["dropped_total"],
+                        "h264_encoder": (h264.counts["skipped"] if h264 else None)}, label="where")
+reg.counter_fn("alerts_total", "Alert per hasil penjadwalan", _alert_counts, label="result")
+reg.counter_fn("audio_errors_total", "Error output audio", lambda: (navi.audio.errors if navi.audio else None))
+reg.counter_fn("ultrasonic_samples_total", "Sampel ultrasonik per hasil",
+               lambda: (dict(navi.ranger.counts) if navi.ranger else {}), label="result")
+reg.counter_fn("camera_frames_total", "Frame kamera per hasil (drained = basi di antrian driver)",
+               lambda: ({k: v for k, v in navi.capture.counts.items()} if navi.capture else None), label="result")
+reg.counter_fn("frame_pool_misses_total", "Frame yang terpaksa dialokasikan baru karena pool penuh",
+               lambda: (navi.capture.pool.counts["misses"] if navi.capture else None))
+reg.counter_fn("gps_sentences_total", "Kalimat NMEA per hasil parse",
+               lambda: ({k: v for k, v in navi.gps.counts.items() if k not in ("bytes", "fixes")} if navi.gps else None),
+               label="result")
+reg.gauge_fn("gps_hdop", "HDOP fix GPS terakhir", lambda: gps_snapshot()["hdop"])
+reg.gauge_fn("gps_satellites", "Satelit dipakai pada fix terakhir", lambda: gps_snapshot()["sats"])
+reg.gauge_fn("fps", "Laju frame keluar pipeline (EMA)", lambda: round(fps_val, 2))
+reg.gauge_fn("viewers", "Viewer stream aktif",
+             lambda: {"mjpeg": hub.viewers(), "h264": (h264.viewers() if h264 else 0)}, label="stream")
+reg.gauge_fn("imgsz", "Ukuran input model", lambda: config.cur["imgsz"])
+reg.gauge_fn("process_every_n", "Inferensi tiap N frame", lambda: config.cur["process_n"])
+reg.gauge_fn("config_version", "Versi snapshot konfigurasi runtime", lambda: config.cur["version"])
+reg.gauge_fn("model_version", "Versi model aktif (naik tiap hot-swap)", lambda: models.info["version"])
+reg.gauge_fn("model_warmup_seconds", "Durasi warm-up model aktif",
+             lambda: (None if models.info["warmup_ms"] is None else models.info["warmup_ms"] / 1000.0))
+reg.gauge_fn("cpu_temp_celsius", "Suhu CPU", lambda: adapt_info.get("temp_c"))
 
 # --------- Routes ----------
 @app.route("/")
 def index():
-    return render_template_string(HTML, model=os.path.basename(MODEL_PATH),
-                                  imgsz=IMGSZ, conf=CONF, cam=chosen_idx,
-                                  warn1=DIST_WARN1, warn2=DIST_WARN2, processn=PROCESS_EVERY_N)
+    cfg, mi = config.cur, models.info
+    return render_template_string(HTML, model=os.path.basename(mi["path"] or MODEL_PATH),
+                                  backend=(mi["backend"] or INFER_BACKEND), imgsz=cfg["imgsz"], conf=cfg["conf"], cam=("-" if navi.cam_idx is None else str(navi.cam_idx))
+                                  + "".join(f" + /dev/video{cv.idx} ({cv.name})" for cv in navi.extra_cams),
+                                  warn1=DIST_WARN1, warn2=DIST_WARN2, processn=cfg["process_n"])
 
 @app.route("/video")
 def video():
@@ -779,12 +1730,47 @@ def video():
     resp.headers['Cache-Control'] = 'no-store'
     return resp
 
+def gen_fmp4(sub):
+    try:
+        while True:
+            chunk = sub.get(timeout=1.0)
+            if chunk is not None:
+                yield chunk
+    finally:
+        h264.unsubscribe(sub)
+
+@app.route("/video.mp4")
+def video_mp4():
+    # q=low|mid|high tetap; auto (default) = turun/naik tier mengikuti kecepatan klien
+    if h264 is None:
+        return "H.264 stream nonaktif (H264_STREAM=0)", 503
+    sub = h264.subscribe(request.args.get("q", "auto"))
+    resp = Response(gen_fmp4(sub), mimetype='video/mp4')
+    resp.headers['Cache-Control'] = 'no-store'
+    resp.headers['X-Codec'] = h264.codec_string(sub.tier)
+    return resp
+
+@app.route("/events")
+def events():
+    resp = Response(pusher.stream(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-store'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+def snapshot_jpg():
+    item = _idle_item
+    if item is not None:
+        # tidak ada viewer -> render on-demand dari frame mentah terakhir
+        _, frame, boxes, direction, d, danger, roi_box, insets = item
+        return encode_jpg(draw_overlay(frame.copy(), boxes, direction, d, danger, roi_box, insets))
+    return hub.latest
+
 @app.route("/snapshot")
 def snapshot():
-    global last_jpg
-    if last_jpg is None:
+    jpg = snapshot_jpg()
+    if jpg is None:
         return "no frame yet", 503
-    r = make_response(last_jpg)
+    r = make_response(jpg)
     r.headers['Content-Type'] = 'image/jpeg'
     r.headers['Content-Disposition'] = 'attachment; filename="snapshot.jpg"'
     r.headers['Cache-Control'] = 'no-store'
@@ -793,82 +1779,209 @@ def snapshot():
 @app.route("/metrics")
 def metrics():
     with distance_lock:
-        d = distance_m
-    with gps_lock:
-        g = dict(gps_data)
+        d, closing = distance_m, closing_mps
+    g = gps_snapshot()
     with hr_lock:
         h = dict(hr_metrics)
     uptime = time.time() - start_ts
-    with audio_lock:
-        last_aud = _last_audio_kind
+    st = hub.stats()
+    cfg = config.cur
+    audio, alerts, ranger = navi.audio, navi.alerts, navi.ranger
+    with stage_lock:
+        stages = {k: round(v, 2) for k, v in stage_ms.items()}
     return jsonify({
         "distance_m": (None if d is None else float(d)),
+        "closing_mps": round(closing, 3),
         "fps": float(fps_val),
-        "camera": int(chosen_idx),
+        "camera": navi.cam_idx,
         "uptime_sec": int(uptime),
         "uptime_human": f"{int(uptime//3600)}h {int((uptime%3600)//60)}m {int(uptime%60)}s",
-        "detect_enabled": DETECT_ENABLED,
+        "detect_enabled": cfg["detect"],
         "gps": g,
         "hr": h,                       # <-- HR object (bpm, spo2, ready)
-        "conf": CONF,
-        "imgsz": IMGSZ,
-        "process_n": PROCESS_EVERY_N,
-        "ultrasonic_ready": ULTRA_READY,
-        "gps_ready": GPS_READY,
+        "conf": cfg["conf"],
+        "imgsz": cfg["imgsz"],
+        "process_n": cfg["process_n"],
+        "config_version": cfg["version"],
+        "ultrasonic_ready": navi.ready("ultrasonic"),
+        "ultrasonic": (ranger.counts if ranger else None),
+        "gps_ready": navi.ready("gps"),
+        "gps_reader": (navi.gps.stats() if navi.gps else None),
+        "capture": (navi.capture.stats() if navi.capture else None),
+        "cameras": ([{"index": navi.cam_idx, "name": CAMS[0][1], "near": 0.0, "tracks": len(tracker.active())}]
+                    + [cv.info() for cv in navi.extra_cams]),
         "hr_ready": h.get("ready", False),
-        "model": os.path.basename(MODEL_PATH),
+        "model": os.path.basename(models.info["path"] or MODEL_PATH),
+        "backend": (models.info["backend"] or INFER_BACKEND),
+        "model_info": _model_summary(),
+        "infer_proc": (navi.model.stats() if hasattr(navi.model, "stats") else None),
         "direction": _last_dir,
-        "last_audio": last_aud
+        "direction_cam": (track_info["cam"] if navi.extra_cams else None),
+        "tracks": track_info,
+        "hazard": fusion.hazard(),
+        "roi": roi.info(),
+        "last_audio": (alerts.last_kind if alerts else None),
+        "audio": (audio.stats() if audio else None),
+        "alerts": (alerts.stats() if alerts else None),
+        "viewers": st["viewers"],
+        "stream_dropped": st["dropped"],
+        "errors": errors.snapshot(),
+        "events": (navi.store.stats() if navi.store else None),
+        "hazmap": dict(hazmap.stats(), prewarn=prewarn_info),
+        "server": (server.stats() if server else {"mode": "flask"}),
+        "h264": (h264.stats() if h264 else None),
+        "stage_ms": stages,            # EMA per tahap pipeline (ms)
+        "stage_drops": {"capture": cap_slot.overwritten, "render": render_slot.overwritten},
+        "adaptive": dict(adapt_info, enabled=cfg["adaptive"], target_ms=LATENCY_TARGET_MS)
     })
 
+@app.route("/metrics/prometheus")
+def metrics_prometheus():
+    r = make_response(reg.render())
+    r.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return r
+
+def _query_args():
+    a = request.args
+    f = lambda k: (float(a[k]) if a.get(k) else None)
+    return {"since": f("since"), "until": f("until"), "bbox": parse_bbox(a.get("bbox")),
+            "limit": min(int(a.get("limit", "1000")), 50000)}
+
+@app.route("/hazards")
+def hazards():
+    # ?since=&until= (unix detik) &bbox=minlon,minlat,maxlon,maxlat &limit=
+    if navi.store is None:
+        return jsonify({"error": "event log tidak aktif"}), 503
+    try:
+        q = _query_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(navi.store.hazards(**q))
+
+@app.route("/hazards/<int:hid>/thumb")
+def hazard_thumb(hid):
+    jpg = navi.store.thumb(hid) if navi.store else None
+    if not jpg:
+        return "not found", 404
+    r = make_response(jpg)
+    r.headers['Content-Type'] = 'image/jpeg'
+    return r
+
+@app.route("/track")
+def track():
+    if navi.store is None:
+        return jsonify({"error": "event log tidak aktif"}), 503
+    try:
+        q = _query_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    q["limit"] = min(int(request.args.get("limit", "20000")), 200000)
+    return jsonify([[round(ts, 1), lat, lon, spd] for ts, lat, lon, spd in navi.store.track(**q)])
+
 @app.route("/toggle", methods=["POST"])
 def toggle():
-    global DETECT_ENABLED
-    DETECT_ENABLED = not DETECT_ENABLED
-    return jsonify({"detect_enabled": DETECT_ENABLED})
+    cfg = config.update(source="toggle", detect=not config.cur["detect"])
+    return jsonify({"detect_enabled": cfg["detect"], "config_version": cfg["version"]})
 
 @app.route("/set", methods=["POST"])
 def set_params():
-    global CONF, IMGSZ, PROCESS_EVERY_N
     try:
         j = request.get_json(silent=True) or {}
+        kw = {}
         if "conf" in j:
             c = float(j["conf"])
-            if 0 <= c <= 1: CONF = c
+            if 0 <= c <= 1: kw["conf"] = c
         if "imgsz" in j:
             s = int(j["imgsz"])
-            if 128 <= s <= 1280: IMGSZ = s
+            if 128 <= s <= 1280: kw["imgsz"] = s
         if "process_n" in j:
             n = int(j["process_n"])
-            if 1 <= n <= 10: PROCESS_EVERY_N = n
-        return jsonify({"ok": True, "msg": "updated", "conf": CONF, "imgsz": IMGSZ, "process_n": PROCESS_EVERY_N})
+            if 1 <= n <= 10: kw["process_n"] = n
+        if "adaptive" in j:
+            kw["adaptive"] = bool(j["adaptive"])
+        # semua field berubah sekaligus dalam satu snapshot baru
+        cfg = config.update(source="set", **kw)
+        return jsonify({"ok": True, "msg": "updated", "conf": cfg["conf"], "imgsz": cfg["imgsz"],
+                        "process_n": cfg["process_n"], "adaptive": cfg["adaptive"], "config_version": cfg["version"]})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 400
 
+@app.route("/config")
+def config_info():
+    return jsonify({"current": config.cur, "history": list(config.history)})
+
+MODEL_EXTS = (".pt", ".onnx", "_openvino_model", "_ncnn_model")
+
+def _model_file(path):
+    """Path dari klien -> path asli di dalam MODEL_DIR (symlink di-resolve), atau ValueError.
+    Mencegah /model memuat file sembarang (.pt = pickle, bisa menjalankan kode)."""
+    root = os.path.realpath(MODEL_DIR)
+    real = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, real]) != root:
+        raise ValueError(f"model harus di dalam {MODEL_DIR}")
+    if not real.endswith(MODEL_EXTS):
+        raise ValueError(f"jenis model tidak didukung (harus {', '.join(MODEL_EXTS)})")
+    if not os.path.exists(real):
+        raise ValueError(f"file model tidak ada: {path}")
+    return real
+
+@app.route("/model", methods=["GET", "POST"])
+def model_swap():
+    """GET: model aktif + status load. POST {"path": ..., "backend": ...}: load + warm-up di background,
+    lalu ditukar antar frame; model lama tetap melayani sampai model baru siap.
+    path relatif terhadap MODEL_DIR dan harus tetap di dalamnya."""
+    if request.method == "GET":
+        return jsonify(models.status())
+    j = request.get_json(silent=True) or {}
+    path = str(j.get("path") or "").strip()
+    backend = str(j.get("backend") or models.info["backend"] or INFER_BACKEND).lower()
+    if not path:
+        return jsonify({"ok": False, "error": "path wajib diisi"}), 400
+    if backend not in BACKENDS:
+        return jsonify({"ok": False, "error": f"backend harus salah satu dari {BACKENDS}"}), 400
+    try:
+        path = _model_file(path)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    def done(info, err):
+        if err is not None:
+            print(f"[WARN] Hot-swap model {path} gagal: {err}")
+            return
+        if info["fixed_imgsz"] and info["fixed_imgsz"] != config.cur["imgsz"]:
+            config.update(source="model", imgsz=info["fixed_imgsz"])
+        print(f"[OK ] Model v{info['version']} aktif: {path} ({backend}, load {info['load_ms']} ms, "
+              f"warm-up {info['warmup_ms']} ms)")
+        pusher.poke()
+    try:
+        pend = models.load_async(path, backend, config.cur["imgsz"], warmup_shapes(), on_done=done)
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 409
+    return jsonify({"ok": True, "pending": dict(pend), "active": models.info}), 202
+
 @app.route("/healthz")
 def healthz():
-    return "ok", 200
+    # 503 selama kamera/model belum siap, supaya supervisor tidak perlu mem-parse body
+    h = navi.health()
+    return jsonify(h), (200 if h["ready"] else 503)
 
 
 def cleanup(*_):
-    try:
-        if cap: cap.release()
-    except Exception:
-        pass
-    if ULTRA_READY and GPIO:
-        try: GPIO.cleanup()
-        except Exception: pass
-    try:
-        if gps_ser: gps_ser.close()
-    except Exception:
-        pass
-    try:
-        if hrm and hasattr(hrm, "stop_sensor"): hrm.stop_sensor()
-    except Exception:
-        pass
+    navi.close()
     sys.exit(0)
 
 if __name__ == "__main__":
     signal.signal(signal.SIGTERM, cleanup)
     signal.signal(signal.SIGINT,  cleanup)
-    app.run(host="0.0.0.0", port=PORT, threaded=True)
+    navi.start()
+    if SERVER_MODE == "async":
+        from async_server import AsyncServer
+        server = AsyncServer(app, hub, pusher, snapshot_jpg, h264=h264,
+                             max_conns=int(os.getenv("MAX_CONNS", "32")),
+                             max_streams=int(os.getenv("MAX_STREAMS", "16")),
+                             send_timeout=float(os.getenv("SEND_TIMEOUT", "10")),
+                             keepalive=float(os.getenv("KEEPALIVE_S", "15")),
+                             queue=STREAM_QUEUE)
+        server.serve("0.0.0.0", PORT)
+        cleanup()
+    else:
+        app.run(host="0.0.0.0", port=PORT, threaded=True)
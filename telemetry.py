@@ -0,0 +1,123 @@
+# telemetry.py
+# Counter & histogram ringan (tanpa prometheus_client) + ekspor format teks Prometheus.
+#  - Counter / Histogram berlabel, thread-safe, observe() O(jumlah bucket)
+#  - counter_fn / gauge_fn: nilai diambil saat scrape dari counter yang sudah ada di
+#    subsistem lain (slot pipeline, ultrasonik, alert scheduler) -> tidak ada hitungan ganda
+import threading
+
+# detik; cukup rapat di 1–100 ms tempat kebanyakan tahap pipeline berada
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+
+def _labels(d):
+    if not d:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(d.items())) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self, name, help=""):
+        self.name, self.help = name, help
+        self.lock = threading.Lock()
+        self.values = {}          # tuple(label items) -> nilai
+
+    def inc(self, n=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + n
+
+    def get(self, **labels):
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self):
+        with self.lock:
+            return {",".join(f"{k}={v}" for k, v in key) or "total": n for key, n in self.values.items()}
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, n in sorted(self.values.items()):
+                out.append(f"{self.name}{_labels(dict(key))} {_num(n)}")
+        return out
+
+class Histogram:
+    def __init__(self, name, help="", buckets=DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.series = {}          # tuple(label items) -> [counts per bucket..., sum, count]
+
+    def observe(self, v, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if v <= b:
+                    s[i] += 1
+                    break
+            s[-2] += v
+            s[-1] += 1
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = sorted((k, list(s)) for k, s in self.series.items())
+        for key, s in items:
+            lab = dict(key)
+            acc = 0
+            for b, c in zip(self.buckets, s):
+                acc += c
+                out.append(f"{self.name}_bucket{_labels(dict(lab, le=repr(b)))} {acc}")
+            out.append(f"{self.name}_bucket{_labels(dict(lab, le='+Inf'))} {s[-1]}")
+            out.append(f"{self.name}_sum{_labels(lab)} {s[-2]!r}")
+            out.append(f"{self.name}_count{_labels(lab)} {s[-1]}")
+        return out
+
+class _FnMetric:
+    """Nilai dari callback: fn() -> angka, atau dict {label_value: angka} untuk satu label."""
+    def __init__(self, kind, name, help, fn, label=None):
+        self.kind, self.name, self.help, self.fn, self.label = kind, name, help, fn, label
+
+    def render(self):
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            v = self.fn()
+        except Exception:
+            return out
+        if isinstance(v, dict):
+            for lv, n in sorted(v.items()):
+                if n is not None:
+                    out.append(f"{self.name}{_labels({self.label: lv})} {_num(n)}")
+        elif v is not None:
+            out.append(f"{self.name} {_num(v)}")
+        return out
+
+class Registry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.metrics = []
+
+    def _add(self, m):
+        self.metrics.append(m)
+        return m
+
+    def counter(self, name, help=""):
+        return self._add(Counter(self.prefix + name, help))
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help, buckets))
+
+    def counter_fn(self, name, help, fn, label=None):
+        return self._add(_FnMetric("counter", self.prefix + name, help, fn, label))
+
+    def gauge_fn(self, name, help, fn, label=None):
+        return self._add(_FnMetric("gauge", self.prefix + name, help, fn, label))
+
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines += m.render()
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,4 @@
+# modul proyek ada di root repo (bukan package), jadi root dimasukkan ke sys.path
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+# Uji AlertScheduler dengan clock virtual dan audio palsu (tanpa thread, lewat pump()).
+from alert_scheduler import AlertScheduler
+
+class FakeAudio:
+    """current() = klip yang masih diputar sampai t_end (clock yang sama dengan scheduler)."""
+    def __init__(self, clock, priorities, dur=1.0):
+        self.clock, self.priorities, self.dur = clock, priorities, dur
+        self.cur, self.t_end, self.played = None, 0.0, []
+
+    def current(self):
+        return self.cur if self.clock() < self.t_end else None
+
+    def play(self, kind, t_trigger=None):
+        cur = self.current()
+        if cur is not None and self.priorities.get(kind, 1) <= self.priorities.get(cur, 1):
+            return False
+        self.cur, self.t_end = kind, self.clock() + self.dur
+        self.played.append(kind)
+        return True
+
+class Clock:
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+PRIO = {"depan": 2, "kiri": 1, "kanan": 1}
+
+def make(**kw):
+    clock = Clock()
+    audio = FakeAudio(clock, PRIO)
+    return AlertScheduler(audio, priorities=PRIO, clock=clock, **kw), audio, clock
+
+def test_first_alert_at_clock_zero_is_not_held_by_global_gap():
+    s, audio, _ = make(global_gap=0.8)
+    assert s.submit("kiri")
+    assert s.pump() == "kiri"
+
+def test_suppressed_counted_once_per_cooldown_window():
+    s, audio, clock = make(cooldown=2.5)
+    s.submit("kiri")
+    s.pump()
+    for _ in range(50):          # 25 Hz selama 2 s: bahaya yang sama terus dilaporkan
+        clock.t += 0.04
+        s.submit("kiri")
+    assert s.counts["suppressed"] == 1
+    clock.t = 3.0
+    s.submit("kiri")
+    assert s.pump() == "kiri"
+    clock.t += 0.04
+    s.submit("kiri")
+    assert s.counts["suppressed"] == 2
+    assert s.counts["emitted"] == 2
+
+def test_coalesced_counted_once_per_pending_entry():
+    s, _, _ = make()
+    for _ in range(10):
+        s.submit("kanan")
+    assert s.counts["coalesced"] == 1
+    assert s.pump() == "kanan"
+
+def test_side_danger_preempts_playing_direction_clip():
+    from fusion import HazardFusion
+    prio = dict(PRIO, bahaya_kiri=2, bahaya_kanan=2)
+    clock = Clock()
+    audio = FakeAudio(clock, prio, dur=1.5)
+    s = AlertScheduler(audio, priorities=prio, clock=clock, cooldown=2.5,
+                       max_ages={k: 0.4 for k in ("depan", "bahaya_kiri", "bahaya_kanan")})
+    f = HazardFusion(min_conf=0.5)
+    # caution kiri diputar dulu
+    f.update_vision("kiri", 0.7, 0.5, 0.3, t=0.0)
+    s.submit(f.alert_kind())
+    assert s.pump() == "kiri"
+    # 0.3 s kemudian track yang sama jadi danger: cooldown "kiri" tidak berlaku, klip arah dipotong
+    clock.t = 0.3
+    f.update_vision("kiri", 0.8, 0.9, 0.5, t=0.3)
+    kind = f.alert_kind()
+    assert kind == "bahaya_kiri"
+    assert s.submit(kind)
+    assert s.pump() == "bahaya_kiri"
+    assert audio.played == ["kiri", "bahaya_kiri"]
@@ -0,0 +1,30 @@
+# Uji HazardFusion: pemicu danger (range vs track kamera) menentukan jenis alert.
+from fusion import HazardFusion
+
+def test_range_danger_is_always_depan_even_with_side_track():
+    f = HazardFusion()
+    f.update_vision("kiri", 0.9, 0.3, 0.0, t=0.0)      # track jauh di kiri, tidak mendekat
+    h = f.update_range(0.3, 0.0, t=0.01) or f.hazard()
+    assert h["level"] == "danger" and h["cause"] == "range"
+    assert h["side"] == "depan"
+    assert f.alert_kind(h) == "depan"
+
+def test_vision_ttc_danger_keeps_side():
+    f = HazardFusion()
+    f.update_vision("kanan", 0.8, 0.9, 0.5, t=0.0)      # TTC kamera 0.2 s
+    h = f.hazard()
+    assert h["level"] == "danger" and h["cause"] == "vision"
+    assert f.alert_kind(h) == "bahaya_kanan"
+
+def test_center_vision_danger_is_depan():
+    f = HazardFusion()
+    f.update_vision(None, 0.8, 0.9, 0.5, t=0.0)
+    assert f.alert_kind() == "depan"
+
+def test_caution_side_needs_confidence():
+    f = HazardFusion(min_conf=0.5)
+    f.update_vision("kiri", 0.3, 0.5, 0.3, t=0.0)       # TTC ~1.7 s -> caution
+    assert f.hazard()["level"] == "caution"
+    assert f.alert_kind() is None
+    f.update_vision("kiri", 0.7, 0.5, 0.3, t=0.01)
+    assert f.alert_kind() == "kiri"
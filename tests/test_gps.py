@@ -0,0 +1,84 @@
+# Uji ingest NMEA lewat ReplaySerial -> GpsReader -> GpsRing (tanpa port serial).
+import time
+import pytest
+from gps import GpsReader, GpsRing, ReplaySerial, nmea_checksum, parse_sentence, pmtk
+
+def nmea(body):
+    return "$%s*%02X" % (body, nmea_checksum(body.encode()))
+
+def rmc(utc, status="A", spd="1.08", course="90.0"):
+    return nmea(f"GPRMC,{utc},{status},0654.000,S,10736.000,E,{spd},{course},170126,,,A")
+
+def gga(utc, sats="08", hdop="0.9"):
+    return nmea(f"GPGGA,{utc},0654.000,S,10736.000,E,1,{sats},{hdop},712.0,M,0.0,M,,")
+
+def gsa():
+    return nmea("GPGSA,A,3,01,02,03,04,05,06,07,08,,,,,1.6,0.9,1.3")
+
+def vtg(course="45.0", kmh="3.6"):
+    return nmea(f"GPVTG,{course},T,,M,1.94,N,{kmh},K,A")
+
+def replay(tmp_path, lines, ring_size=600):
+    path = tmp_path / "trace.nmea"
+    path.write_text("\n".join(lines) + "\n")
+    ser = ReplaySerial(str(path), speed=0, loop=False)
+    reader = GpsReader(ser, GpsRing(ring_size)).start()
+    t_end = time.monotonic() + 5.0
+    while (ser.i < len(ser.lines) or ser.in_waiting) and time.monotonic() < t_end:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    reader.close()
+    return reader
+
+def test_pmtk_checksum():
+    assert pmtk("PMTK220,200") == b"$PMTK220,200*2C\r\n"
+
+def test_parse_skips_unwanted_and_rejects_bad_checksum():
+    assert parse_sentence(nmea("GPGSV,3,1,11,01,40,083,46").encode()) is None
+    bad = rmc("120000.000")[:-2] + "00"
+    with pytest.raises(ValueError):
+        parse_sentence(bad.encode())
+
+def test_checksum_error_is_counted_and_dropped(tmp_path):
+    bad = rmc("120000.000")[:-2] + "00"
+    r = replay(tmp_path, [bad, rmc("120001.000")])
+    assert r.counts["checksum"] == 1
+    assert r.counts["fixes"] == 1
+    assert r.ring.latest()["utc"] == "120001.000"
+
+def test_rmc_fields(tmp_path):
+    r = replay(tmp_path, [rmc("120000.000")])
+    f = r.ring.latest()
+    assert f["valid"] is True
+    assert f["lat"] == pytest.approx(-6.9) and f["lon"] == pytest.approx(107.6)
+    assert f["speed_kmh"] == pytest.approx(1.08 * 1.852)
+    assert f["time_utc"] == "2026-01-17 12:00:00"
+
+def test_gga_gsa_merge_into_same_epoch(tmp_path):
+    # urutan MTK/u-blox: RMC, VTG, GGA, GSA per epoch -> GGA/GSA mem-patch fix yang sudah keluar
+    r = replay(tmp_path, [rmc("120000.000"), vtg(), gga("120000.000", sats="09", hdop="0.8"), gsa()])
+    f = r.ring.latest()
+    assert f["sats"] == 9 and f["hdop"] == pytest.approx(0.8) and f["fix_quality"] == 1
+    assert f["fix_mode"] == 3 and f["pdop"] == pytest.approx(1.6)
+
+def test_quality_not_carried_to_next_epoch(tmp_path):
+    r = replay(tmp_path, [rmc("120000.000"), gga("120000.000"), gsa(), rmc("120001.000", status="V")])
+    f = r.ring.latest()
+    assert f["valid"] is False
+    assert f["sats"] is None and f["hdop"] is None and f["fix_mode"] is None
+
+def test_vtg_fills_empty_rmc_of_same_epoch_only(tmp_path):
+    r = replay(tmp_path, [rmc("120000.000", spd="", course=""), vtg("45.0", "3.6"),
+                          rmc("120001.000", spd="", course="")])
+    first, second = r.ring.recent()
+    assert first["speed_kmh"] == pytest.approx(3.6) and first["heading"] == pytest.approx(45.0)
+    # VTG epoch sebelumnya tidak boleh dipakai epoch berikutnya
+    assert second["speed_kmh"] is None and second["heading"] is None
+
+def test_ring_wraps_around(tmp_path):
+    utcs = [f"1200{s:02d}.000" for s in range(7)]
+    r = replay(tmp_path, [rmc(u) for u in utcs], ring_size=3)
+    assert len(r.ring) == 3
+    assert [f["utc"] for f in r.ring.recent()] == utcs[-3:]
+    assert [f["utc"] for f in r.ring.recent(2)] == utcs[-2:]
+    assert r.counts["fixes"] == 7
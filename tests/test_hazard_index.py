@@ -0,0 +1,82 @@
+# Uji HazardIndex: query radius harus mengembalikan SEMUA titik di dalam radius,
+# termasuk di lintang tinggi dan dekat batas sel (lebar sel bujur berbeda per baris).
+import math, random, sqlite3
+import pytest
+from hazard_index import HazardIndex, M_PER_DEG
+
+def _dist(idx, lat0, lon0, lat, lon):
+    e, n = idx._offset_m(lat0, lon0, lat, lon)
+    return math.hypot(e, n)
+
+@pytest.mark.parametrize("lat0,lon0", [(-6.9, 107.6), (60.0, 25.0), (-45.0, 170.0), (78.2, 15.6)])
+def test_near_returns_every_point_in_radius(lat0, lon0):
+    rnd = random.Random(1)
+    idx = HazardIndex(cell_m=25.0, merge_m=0.0)
+    pts = []
+    for _ in range(3000):
+        lat = lat0 + rnd.uniform(-60, 60) / M_PER_DEG
+        lon = lon0 + rnd.uniform(-60, 60) / (M_PER_DEG * math.cos(math.radians(lat0)))
+        pts.append((lat, lon, idx.add(lat, lon)))
+    for _ in range(50):
+        qlat = lat0 + rnd.uniform(-20, 20) / M_PER_DEG
+        qlon = lon0 + rnd.uniform(-20, 20) / (M_PER_DEG * math.cos(math.radians(lat0)))
+        want = {i for lat, lon, i in pts if _dist(idx, qlat, qlon, lat, lon) <= 25.0}
+        got = {p[4] for p in idx._near(qlat, qlon, 25.0)}
+        assert want <= got
+
+def test_ahead_finds_nearest_in_radius_and_cone():
+    idx = HazardIndex()
+    lat0, lon0 = -45.0, 170.0
+    d_lat = 1.0 / M_PER_DEG
+    d_lon = 1.0 / (M_PER_DEG * math.cos(math.radians(lat0)))
+    far = idx.add(lat0 + 20 * d_lat, lon0)          # 20 m utara
+    near = idx.add(lat0 + 12 * d_lat, lon0 + 1 * d_lon)
+    behind = idx.add(lat0 - 5 * d_lat, lon0)        # 5 m selatan, di belakang
+    side = idx.add(lat0, lon0 + 8 * d_lon)          # 8 m timur, di luar kerucut
+    h = idx.ahead(lat0, lon0, heading=0.0, radius_m=25.0, cone_deg=35.0)
+    assert h["id"] == near and 11.0 < h["distance_m"] < 13.0
+    assert idx.ahead(lat0, lon0, heading=0.0, radius_m=25.0, exclude=(near,))["id"] == far
+    assert idx.ahead(lat0, lon0, heading=None, radius_m=25.0)["id"] == behind
+    assert idx.ahead(lat0, lon0, heading=90.0, radius_m=25.0)["id"] == side
+
+def test_add_merges_close_sightings():
+    idx = HazardIndex(merge_m=4.0)
+    a = idx.add(60.0, 25.0)
+    b = idx.add(60.0 + 2.0 / M_PER_DEG, 25.0)
+    assert a == b
+    assert idx.stats()["hazards"] == 1
+    assert idx.ahead(60.0, 25.0, min_sightings=2)["sightings"] == 2
+
+def _hazard_db(path, rows):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE hazards (id INTEGER PRIMARY KEY, ts REAL NOT NULL, lat REAL, lon REAL,"
+               " level TEXT, side TEXT, track_id INTEGER)")
+    db.executemany("INSERT INTO hazards (ts, lat, lon, level, side, track_id) VALUES (?, ?, ?, 'danger', 'kiri', ?)",
+                   rows)
+    db.commit()
+    db.close()
+
+def test_load_sqlite_counts_one_sighting_per_pass(tmp_path):
+    lat, lon = -6.9, 107.6
+    db = str(tmp_path / "events.db")
+    # satu kali lewat: track 7 hilang lalu muncul lagi sebagai track 9 beberapa detik kemudian
+    _hazard_db(db, [(1000.0, lat, lon, 7), (1004.0, lat + 1.0 / M_PER_DEG, lon, 9)])
+    idx = HazardIndex(pass_s=300.0)
+    assert idx.load_sqlite(db) == 2
+    assert idx.ahead(lat, lon)["sightings"] == 1
+
+    # lewat lagi keesokan harinya -> sighting kedua
+    db2 = sqlite3.connect(db)
+    db2.execute("INSERT INTO hazards (ts, lat, lon, level, side, track_id) VALUES (?, ?, ?, 'danger', 'kiri', 3)",
+                (1000.0 + 86400.0, lat, lon))
+    db2.commit()
+    db2.close()
+    idx = HazardIndex(pass_s=300.0)
+    idx.load_sqlite(db)
+    assert idx.ahead(lat, lon, min_sightings=2)["sightings"] == 2
+
+def test_add_without_ts_always_counts():
+    idx = HazardIndex(pass_s=300.0)
+    idx.add(60.0, 25.0)
+    idx.add(60.0, 25.0)
+    assert idx.ahead(60.0, 25.0)["sightings"] == 2
@@ -0,0 +1,55 @@
+# Uji filter UltrasonicRanger lewat FakeGpioBackend (edge sintetis, tanpa GPIO).
+import time
+from ultrasonic import UltrasonicRanger, FakeGpioBackend
+
+def make_ranger(distance_fn, **kw):
+    return UltrasonicRanger(FakeGpioBackend(distance_fn), **kw)
+
+def test_echo_pulse_to_distance():
+    r = make_ranger(lambda t: 1.25)
+    d = r.measure_once()
+    assert abs(d - 1.25) < 1e-6
+    assert r.state()[0] == d
+
+def test_no_echo_counts_timeout():
+    r = make_ranger(lambda t: None)
+    assert r.measure_once() is None
+    assert r.counts["timeouts"] == 1
+
+def test_hampel_rejects_single_spike():
+    seq = iter([1.50, 1.51, 1.49, 1.50, 3.60, 1.50, 1.51])
+    r = make_ranger(lambda t: next(seq))
+    for _ in range(7):
+        r.measure_once()
+    dist, _, _ = r.state()
+    assert r.counts["outliers"] == 1
+    assert r.counts["samples"] == 6
+    assert abs(dist - 1.5) < 0.02
+
+def test_hampel_follows_real_step():
+    # perubahan nyata (objek baru masuk) harus diterima setelah jendela median ikut bergeser
+    seq = iter([2.0] * 5 + [1.0] * 8)
+    r = make_ranger(lambda t: next(seq), window=7)
+    for _ in range(13):
+        r.measure_once()
+        time.sleep(0.01)
+    assert r.counts["outliers"] >= 1
+    assert abs(r.state()[0] - 1.0) < 0.1
+
+def test_alpha_beta_tracks_closing_speed():
+    t0 = time.perf_counter()
+    jitter = iter([0.005, -0.005] * 50)
+    # objek mendekat 1 m/s dari 2.5 m, noise +-5 mm
+    r = make_ranger(lambda t: 2.5 - (t - t0) + next(jitter), alpha=0.5, beta=0.1)
+    raw_err, filt_err = [], []
+    for _ in range(60):
+        d = r.measure_once()
+        true = 2.5 - (time.perf_counter() - t0)
+        raw_err.append(abs(d - true))
+        filt_err.append(abs(r.state()[0] - true))
+        time.sleep(0.01)
+    dist, closing, _ = r.state()
+    assert r.counts["outliers"] == 0
+    assert 0.6 < closing < 1.4
+    # setelah konvergen, estimasi tersaring tidak lebih buruk dari sampel mentah
+    assert sum(filt_err[30:]) <= sum(raw_err[30:]) + 0.05
@@ -0,0 +1,143 @@
+# tracker.py
+# Tracker ringan untuk box pothole: asosiasi IoU (fallback jarak centroid) +
+# filter Kalman kecepatan-konstan per koordinat (cx, cy, w, h).
+# Tiap lubang dapat ID tetap, posisi yang dihaluskan, dan laju mendekat
+# (kecepatan tepi bawah box, dalam tinggi-frame per detik).
+import itertools
+
+class _KF1D:
+    """Kalman 1D posisi+kecepatan (model kecepatan konstan)."""
+    __slots__ = ("x", "v", "p00", "p01", "p11", "q", "r")
+
+    def __init__(self, z, q, r):
+        self.x, self.v = float(z), 0.0
+        self.p00, self.p01, self.p11 = r, 0.0, 1e4
+        self.q, self.r = q, r
+
+    def predict(self, dt):
+        if dt <= 0:
+            return
+        self.x += self.v * dt
+        q = self.q
+        self.p00 += dt * (2*self.p01 + dt*self.p11) + q * dt**3 / 3
+        self.p01 += dt * self.p11 + q * dt**2 / 2
+        self.p11 += q * dt
+
+    def update(self, z):
+        s = self.p00 + self.r
+        k0, k1 = self.p00 / s, self.p01 / s
+        y = float(z) - self.x
+        self.x += k0 * y
+        self.v += k1 * y
+        p00, p01 = self.p00, self.p01
+        self.p00 = (1 - k0) * p00
+        self.p01 = (1 - k0) * p01
+        self.p11 -= k1 * p01
+
+def iou(a, b):
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    return inter / ((a[2]-a[0])*(a[3]-a[1]) + (b[2]-b[0])*(b[3]-b[1]) - inter + 1e-9)
+
+class Track:
+    def __init__(self, tid, box, t, q, r):
+        x1, y1, x2, y2, conf = box[:5]
+        self.id = tid
+        self.kf = [_KF1D((x1+x2)/2, q, r), _KF1D((y1+y2)/2, q, r),
+                   _KF1D(x2-x1, q, r),     _KF1D(y2-y1, q, r)]
+        self.conf = conf
+        self.hits = 1
+        self.misses = 0
+        self.t = t
+        self.confirmed = False
+
+    def predict(self, t):
+        dt = t - self.t
+        for k in self.kf:
+            k.predict(dt)
+        self.t = t
+
+    def update(self, box):
+        x1, y1, x2, y2, conf = box[:5]
+        for k, z in zip(self.kf, ((x1+x2)/2, (y1+y2)/2, x2-x1, y2-y1)):
+            k.update(z)
+        self.conf = 0.5*self.conf + 0.5*conf
+        self.hits += 1
+        self.misses = 0
+
+    def box(self):
+        cx, cy, w, h = (k.x for k in self.kf)
+        w, h = max(1.0, w), max(1.0, h)
+        return (cx - w/2, cy - h/2, cx + w/2, cy + h/2, self.conf, self.id)
+
+    @property
+    def approach_px(self):
+        """Kecepatan tepi bawah box (px/s); positif = lubang makin dekat ke kaki."""
+        return self.kf[1].v + self.kf[3].v / 2
+
+class Tracker:
+    """IoU/centroid tracker. step() untuk frame ber-inferensi, predict() untuk frame yang dilewati."""
+    def __init__(self, confirm_hits=2, max_misses=5, iou_min=0.2, dist_max=0.6, q=500.0, r=16.0):
+        self.confirm_hits = confirm_hits
+        self.max_misses = max_misses
+        self.iou_min = iou_min
+        self.dist_max = dist_max     # jarak centroid maks, relatif terhadap diagonal box
+        self.q, self.r = q, r
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+
+    def predict(self, t):
+        for tr in self.tracks:
+            tr.predict(t)
+        return self.active()
+
+    def step(self, boxes, t):
+        for tr in self.tracks:
+            tr.predict(t)
+
+        # skor pasangan: IoU dulu; kalau IoU kecil, pakai kedekatan centroid
+        pairs = []
+        for ti, tr in enumerate(self.tracks):
+            pb = tr.box()
+            pcx, pcy = (pb[0]+pb[2])/2, (pb[1]+pb[3])/2
+            diag = ((pb[2]-pb[0])**2 + (pb[3]-pb[1])**2) ** 0.5
+            for di, db in enumerate(boxes):
+                o = iou(pb, db)
+                if o >= self.iou_min:
+                    pairs.append((1.0 + o, ti, di))
+                    continue
+                dcx, dcy = (db[0]+db[2])/2, (db[1]+db[3])/2
+                dist = ((dcx-pcx)**2 + (dcy-pcy)**2) ** 0.5 / max(diag, 1.0)
+                if dist <= self.dist_max:
+                    pairs.append((1.0 - dist, ti, di))
+        pairs.sort(reverse=True)
+
+        used_t, used_d = set(), set()
+        for _, ti, di in pairs:
+            if ti in used_t or di in used_d:
+                continue
+            self.tracks[ti].update(boxes[di])
+            used_t.add(ti); used_d.add(di)
+
+        for ti, tr in enumerate(self.tracks):
+            if ti not in used_t:
+                tr.misses += 1
+            if tr.hits >= self.confirm_hits:
+                tr.confirmed = True
+        self.tracks = [tr for tr in self.tracks if tr.misses <= self.max_misses]
+        for di, db in enumerate(boxes):
+            if di not in used_d:
+                tr = Track(next(self._ids), db, t, self.q, self.r)
+                tr.confirmed = self.confirm_hits <= 1
+                self.tracks.append(tr)
+        return self.active()
+
+    def active(self):
+        """Track terkonfirmasi yang masih hidup."""
+        return [tr for tr in self.tracks if tr.confirmed]
@@ -0,0 +1,197 @@
+# ultrasonic.py
+# Ranging HC-SR04 berbasis edge callback (tanpa busy-wait polling).
+# Backend:
+#   lgpio   : callback edge dengan timestamp kernel (ns) -> paling akurat (Pi 5 / Bookworm)
+#   rpigpio : RPi.GPIO add_event_detect(BOTH), timestamp diambil di callback
+#   fake    : simulasi gema dari fungsi jarak(t), untuk uji tanpa perangkat
+# Sampel disaring Hampel (median + MAD) lalu filter alpha-beta untuk jarak dan
+# kecepatan mendekat (m/s, positif = objek makin dekat).
+import time, threading, statistics
+from collections import deque
+
+SOUND_MPS = 343.0
+
+class LgpioBackend:
+    name = "lgpio"
+
+    def __init__(self, trig, echo, chip=0):
+        import lgpio
+        self.lg = lgpio
+        self.trig = trig
+        self.h = lgpio.gpiochip_open(chip)
+        lgpio.gpio_claim_output(self.h, trig, 0)
+        lgpio.gpio_claim_alert(self.h, echo, lgpio.BOTH_EDGES)
+        self.on_edge = None
+        self._cb = lgpio.callback(self.h, echo, lgpio.BOTH_EDGES,
+                                  lambda chip, gpio, level, tick: self.on_edge and level < 2
+                                  and self.on_edge(level, tick / 1e9))
+
+    def trigger(self):
+        self.lg.gpio_write(self.h, self.trig, 1)
+        time.sleep(10e-6)
+        self.lg.gpio_write(self.h, self.trig, 0)
+
+    def close(self):
+        try:
+            self._cb.cancel()
+            self.lg.gpiochip_close(self.h)
+        except Exception:
+            pass
+
+class RpiGpioBackend:
+    name = "rpigpio"
+
+    def __init__(self, trig, echo):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.trig, self.echo = trig, echo
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setwarnings(False)
+        GPIO.setup(trig, GPIO.OUT)
+        GPIO.setup(echo, GPIO.IN)
+        GPIO.output(trig, False)
+        self.on_edge = None
+        GPIO.add_event_detect(echo, GPIO.BOTH, callback=self._edge)
+
+    def _edge(self, ch):
+        t = time.perf_counter()
+        if self.on_edge:
+            self.on_edge(self.GPIO.input(ch), t)
+
+    def trigger(self):
+        self.GPIO.output(self.trig, True)
+        time.sleep(10e-6)
+        self.GPIO.output(self.trig, False)
+
+    def close(self):
+        try:
+            self.GPIO.remove_event_detect(self.echo)
+            self.GPIO.cleanup((self.trig, self.echo))
+        except Exception:
+            pass
+
+class FakeGpioBackend:
+    """distance_fn(t) -> meter atau None (tidak ada gema). Edge dikirim dengan timestamp sintetis."""
+    name = "fake"
+
+    def __init__(self, distance_fn):
+        self.distance_fn = distance_fn
+        self.on_edge = None
+
+    def trigger(self):
+        t0 = time.perf_counter()
+        d = self.distance_fn(t0)
+        if d is None or self.on_edge is None:
+            return
+        t_rise = t0 + 0.0005
+        self.on_edge(1, t_rise)
+        self.on_edge(0, t_rise + 2.0 * d / SOUND_MPS)
+
+    def close(self):
+        pass
+
+def open_backend(kind, trig, echo, fake_distance=1.5):
+    """kind: auto|lgpio|rpigpio|fake. Return backend atau raise kalau tidak ada yang bisa dibuka."""
+    if kind == "fake":
+        return FakeGpioBackend(lambda t: fake_distance)
+    order = ["lgpio", "rpigpio"] if kind == "auto" else [kind]
+    err = None
+    for k in order:
+        try:
+            return LgpioBackend(trig, echo) if k == "lgpio" else RpiGpioBackend(trig, echo)
+        except Exception as e:
+            err = e
+    raise RuntimeError(f"GPIO backend {order} gagal: {err}")
+
+class UltrasonicRanger:
+    def __init__(self, backend, rate_hz=25.0, min_m=0.02, max_m=4.0, window=7,
+                 hampel_k=3.0, alpha=0.5, beta=0.1, on_sample=None):
+        self.backend = backend
+        self.period = 1.0 / max(1.0, rate_hz)
+        self.timeout = min(0.03, self.period)      # 4 m pulang-pergi ~ 23 ms
+        self.min_m, self.max_m = min_m, max_m
+        self.buf = deque(maxlen=window)
+        self.hampel_k = hampel_k
+        self.alpha, self.beta = alpha, beta
+        self.on_sample = on_sample
+        self.lock = threading.Lock()
+        self.distance = None       # m, tersaring
+        self.closing = 0.0         # m/s, positif = mendekat
+        self.t = None
+        self.counts = {"samples": 0, "timeouts": 0, "out_of_range": 0, "outliers": 0}
+        self._t_rise = None
+        self._echo = threading.Event()
+        self._pulse = None
+        self._stop = False
+        backend.on_edge = self._edge
+
+    def _edge(self, level, t):
+        if level == 1:
+            self._t_rise = t
+        elif self._t_rise is not None:
+            self._pulse = t - self._t_rise
+            self._t_rise = None
+            self._echo.set()
+
+    def _accept(self, d, t):
+        """Hampel: buang sampel yang jauh dari median jendela (dalam satuan MAD)."""
+        if len(self.buf) >= 3:
+            med = statistics.median(self.buf)
+            mad = statistics.median(abs(x - med) for x in self.buf) * 1.4826
+            if abs(d - med) > self.hampel_k * max(mad, 0.02):
+                self.buf.append(d)      # tetap masuk jendela supaya perubahan nyata bisa diikuti
+                self.counts["outliers"] += 1
+                return
+        self.buf.append(d)
+        with self.lock:
+            if self.distance is None or self.t is None:
+                self.distance, self.closing = d, 0.0
+            else:
+                dt = max(1e-3, t - self.t)
+                pred = self.distance - self.closing * dt
+                r = d - pred
+                self.distance = pred + self.alpha * r
+                self.closing = self.closing - self.beta * r / dt
+            self.t = t
+            dist, closing = self.distance, self.closing
+        self.counts["samples"] += 1
+        if self.on_sample:
+            self.on_sample(dist, closing, t)
+
+    def measure_once(self):
+        self._echo.clear()
+        self._pulse = None
+        self.backend.trigger()
+        if not self._echo.wait(self.timeout):
+            self.counts["timeouts"] += 1
+            return None
+        return self.feed(self._pulse * SOUND_MPS / 2.0, time.perf_counter())
+
+    def feed(self, d, t):
+        """Masukkan satu jarak mentah (m) pada waktu t; dipakai measure_once dan replay trace."""
+        if not (self.min_m <= d <= self.max_m):
+            self.counts["out_of_range"] += 1
+            return None
+        self._accept(d, t)
+        return d
+
+    def run(self):
+        while not self._stop:
+            t0 = time.perf_counter()
+            try:
+                self.measure_once()
+            except Exception:
+                self.counts["timeouts"] += 1
+            time.sleep(max(0.0, self.period - (time.perf_counter() - t0)))
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def state(self):
+        with self.lock:
+            return self.distance, self.closing, self.t
+
+    def close(self):
+        self._stop = True
+        self.backend.close()